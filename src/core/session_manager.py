@@ -1,34 +1,73 @@
 """Gestionnaire de sessions Telegram avec chiffrement automatique."""
+import asyncio
+import atexit
 import json
+import os
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from utils.config import get_config
+from utils.constants import (
+    CONNECTION_POLICIES,
+    CONNECTION_POLICY_ALWAYS,
+    DEFAULT_IDLE_TIMEOUT_MINUTES
+)
 from utils.logger import get_logger
 from utils.paths import get_sessions_dir
 
+# Délai de regroupement des écritures de l'index (secondes)
+INDEX_SAVE_DELAY = 0.5
 
-class SessionManager:
-    """Gère les sessions Telegram avec un système de chiffrement optionnel."""
 
-    def __init__(self):
-        """Initialise le gestionnaire de sessions."""
-        self.config = get_config()
-        self.logger = get_logger()
-        # CORRECTION : Utiliser get_sessions_dir() pour compatibilité PyInstaller
-        self.sessions_dir = get_sessions_dir()
-        self.sessions_dir.mkdir(parents=True, exist_ok=True)
+class SessionIndex:
+    """
+    Index des sessions partagé par tout le processus.
 
-        self.index_file = self.sessions_dir / "sessions_index.json"
-        self.sessions_index = self._load_index()
+    Le fichier n'est relu que si sa date de modification change ; les
+    écritures sont regroupées (INDEX_SAVE_DELAY) et atomiques (fichier
+    temporaire puis renommage).
+    """
 
-        # CORRECTION : Utiliser uniquement le chiffrement natif de Telethon
-        # Telethon chiffre déjà les sessions SQLite, pas besoin de chiffrement supplémentaire
-        self.encryption = None
-        self.logger.info("Utilisation du chiffrement natif de Telethon pour les sessions")
-    
-    def _load_index(self) -> Dict:
+    def __init__(self, index_file: Path):
+        """
+        Initialise l'index (chargé à la première lecture).
+
+        Args:
+            index_file: Chemin de sessions_index.json
+        """
+        self.index_file = index_file
+        self.logger = get_logger()
+        self._data: Dict = {}
+        self._signature: Optional[Tuple[int, int]] = None  # (mtime_ns, taille) du dernier état connu
+        self._loaded = False
+        self._dirty = False
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.RLock()
+        atexit.register(self.flush)
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        """Signature (mtime_ns, taille) du fichier, None s'il n'existe pas."""
+        try:
+            stat = self.index_file.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @property
+    def data(self) -> Dict:
+        """Contenu de l'index (relu seulement si le fichier a changé)."""
+        with self._lock:
+            signature = self._file_signature()
+            if not self._loaded or (signature != self._signature and not self._dirty):
+                self._data = self._read()
+                self._signature = signature
+                self._loaded = True
+            return self._data
+
+    def _read(self) -> Dict:
         """Charge l'index des sessions depuis le fichier JSON."""
         if not self.index_file.exists():
             return {}
@@ -40,18 +79,98 @@ class SessionManager:
             self.logger.error(f"Erreur chargement index sessions: {e}")
             return {}
 
+    def save(self) -> None:
+        """
+        Enregistre une modification de l'index.
+
+        L'écriture est différée pour regrouper les rafales (immédiate hors
+        boucle asyncio).
+        """
+        with self._lock:
+            self._dirty = True
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+
+            if loop is None:
+                self.flush()
+            elif self._flush_handle is None or self._flush_loop is not loop:
+                # Nouvelle boucle : l'écriture programmée sur l'ancienne ne s'exécutera pas
+                if self._flush_handle is not None:
+                    self._flush_handle.cancel()
+                self._flush_loop = loop
+                self._flush_handle = loop.call_later(INDEX_SAVE_DELAY, self.flush)
+
+    def flush(self) -> None:
+        """Écrit l'index sur disque s'il a été modifié (fichier temporaire puis renommage)."""
+        with self._lock:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+                self._flush_handle = None
+            if not self._dirty:
+                return
+
+            tmp_file = self.index_file.with_name(self.index_file.name + ".tmp")
+            try:
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(self._data, f, ensure_ascii=False, separators=(',', ':'))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.index_file)
+                self._signature = self._file_signature()
+                self._dirty = False
+            except Exception as e:
+                self.logger.error(f"Erreur sauvegarde index sessions: {e}")
+
+
+# Instance globale (singleton)
+_session_index_instance: Optional[SessionIndex] = None
+
+
+def get_session_index() -> SessionIndex:
+    """
+    Récupère l'index des sessions partagé par le processus.
+
+    Returns:
+        SessionIndex: Instance de l'index
+    """
+    global _session_index_instance
+
+    if _session_index_instance is None:
+        sessions_dir = get_sessions_dir()
+        sessions_dir.mkdir(parents=True, exist_ok=True)
+        _session_index_instance = SessionIndex(sessions_dir / "sessions_index.json")
+        # CORRECTION : Utiliser uniquement le chiffrement natif de Telethon
+        # Telethon chiffre déjà les sessions SQLite, pas besoin de chiffrement supplémentaire
+        get_logger().info("Utilisation du chiffrement natif de Telethon pour les sessions")
+
+    return _session_index_instance
+
+
+class SessionManager:
+    """Gère les sessions Telegram avec un système de chiffrement optionnel."""
+
+    def __init__(self):
+        """Initialise le gestionnaire de sessions (index partagé, voir get_session_index)."""
+        self.config = get_config()
+        self.logger = get_logger()
+        self.index = get_session_index()
+        # CORRECTION : Utiliser get_sessions_dir() pour compatibilité PyInstaller
+        self.sessions_dir = self.index.index_file.parent
+        self.index_file = self.index.index_file
+
+        # Chiffrement natif de Telethon uniquement (voir get_session_index)
+        self.encryption = None
+
+    @property
+    def sessions_index(self) -> Dict:
+        """Index des sessions (partagé, relu seulement si le fichier a changé)."""
+        return self.index.data
+
     def _save_index(self) -> None:
-        """Sauvegarde l'index des sessions dans le fichier JSON."""
-        try:
-            with open(self.index_file, 'w', encoding='utf-8') as f:
-                json.dump(
-                    self.sessions_index,
-                    f,
-                    indent=2,
-                    ensure_ascii=False
-                )
-        except Exception as e:
-            self.logger.error(f"Erreur sauvegarde index sessions: {e}")
+        """Sauvegarde l'index des sessions (écriture groupée et atomique)."""
+        self.index.save()
     
     def create_session_entry(
         self,
@@ -207,13 +326,47 @@ class SessionManager:
             )
         self._save_index()
     
+    def update_connection_policy(
+        self,
+        session_id: str,
+        policy: str,
+        idle_timeout_minutes: Optional[int] = None
+    ) -> bool:
+        """
+        Met à jour la politique de connexion d'un compte.
+
+        Args:
+            session_id: ID de la session.
+            policy: "always", "on_demand" ou "idle".
+            idle_timeout_minutes: Délai avant mise en veille (politique "idle").
+
+        Returns:
+            bool: True si réussi, False si la session ou la politique est inconnue.
+        """
+        if session_id not in self.sessions_index or policy not in CONNECTION_POLICIES:
+            return False
+
+        self.sessions_index[session_id]["connection_policy"] = policy
+        if idle_timeout_minutes is not None:
+            self.sessions_index[session_id]["idle_timeout_minutes"] = max(
+                1, int(idle_timeout_minutes)
+            )
+        self._save_index()
+        return True
+
     def get_account_settings(self, session_id: str) -> Dict:
         """Récupère les paramètres prédéfinis d'un compte."""
         session = self.sessions_index.get(session_id, {})
         return {
             "default_message": session.get("default_message", ""),
             "default_schedules": session.get("default_schedules", []),
-            "is_master": session.get("is_master", False)
+            "is_master": session.get("is_master", False),
+            "connection_policy": session.get(
+                "connection_policy", CONNECTION_POLICY_ALWAYS
+            ),
+            "idle_timeout_minutes": session.get(
+                "idle_timeout_minutes", DEFAULT_IDLE_TIMEOUT_MINUTES
+            )
         }
 
     def get_master_account(self) -> Optional[str]:
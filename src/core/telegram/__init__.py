@@ -4,6 +4,7 @@ Module de gestion Telegram.
 from .account import TelegramAccount
 from .manager import TelegramManager
 from .credentials import get_api_credentials
+from .send_result import SendResult, SendStatus
 
-__all__ = ['TelegramAccount', 'TelegramManager', 'get_api_credentials']
+__all__ = ['TelegramAccount', 'TelegramManager', 'get_api_credentials', 'SendResult', 'SendStatus']
 
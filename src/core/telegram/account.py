@@ -1,30 +1,110 @@
 """Classe représentant un compte Telegram connecté."""
 import asyncio
+import re
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Dict, Final, FrozenSet, List, Optional, Sequence, Tuple
 
 from telethon import TelegramClient
 from telethon.errors import (
     FloodWaitError,
+    ForbiddenError,
+    MessageIdInvalidError,
+    MessageNotModifiedError,
     PhoneCodeInvalidError,
-    SessionPasswordNeededError
+    RPCError,
+    SessionPasswordNeededError,
+    SlowModeWaitError
 )
 from telethon.tl.functions.messages import (
     DeleteScheduledMessagesRequest,
-    GetScheduledHistoryRequest
+    EditMessageRequest,
+    GetScheduledHistoryRequest,
+    GetScheduledMessagesRequest
 )
-from telethon.tl.types import Channel, Chat
+from telethon.tl.types import (
+    Channel,
+    ChannelForbidden,
+    Chat,
+    ChatForbidden,
+    MessageMediaDocument,
+    MessageMediaPhoto
+)
+from telethon.tl.types.messages import MessagesNotModified
 
 from core.session_manager import SessionManager
+from core.telegram.entity_cache import EntityCache
+from core.telegram.send_result import PERMISSION_RPC_ERRORS, SEND_OK, SendResult, SendStatus
+from database.async_db import get_async_db
+from database.timestamps import as_datetime, to_epoch_ms
 from utils.constants import (
+    TELEGRAM_DIALOGS_REFRESH_INTERVAL,
+    TELEGRAM_MAX_CAPTION_LENGTH,
+    TELEGRAM_MAX_IDS_PER_REQUEST,
+    TELEGRAM_MAX_MESSAGE_LENGTH,
     TELEGRAM_MAX_SCHEDULED_MESSAGES_FETCH,
-    TELEGRAM_MIN_DELAY_PER_CHAT
+    TELEGRAM_SCHEDULED_EDIT_CONCURRENCY,
+    TELEGRAM_SCHEDULED_SCAN_CONCURRENCY
 )
 from utils.logger import get_logger
+from utils.rate_limiter import get_rate_limiter
 
 logger = get_logger()
 
+_HASH_MASK = 0xFFFFFFFFFFFFFFFF
+
+# Erreurs RPC d'une modification refusée sur place alors qu'un envoi identique
+# passerait : seuls cas où le message programmé est supprimé puis recréé
+EDIT_IN_PLACE_RPC_ERRORS: Final[FrozenSet[str]] = frozenset({
+    'MESSAGE_EDIT_TIME_EXPIRED',
+    'MEDIA_PREV_INVALID',
+})
+
+
+def scheduled_history_hash(messages: Sequence) -> int:
+    """
+    Calcule le hash Telegram d'une liste de messages programmés.
+    
+    Algorithme de hash de l'API (entiers 64 bits) appliqué à id, date et
+    edit_date de chaque message, dans l'ordre de la réponse. Un hash faux
+    n'a pas d'autre effet qu'une réponse complète.
+    
+    Args:
+        messages: Messages renvoyés par GetScheduledHistoryRequest
+    
+    Returns:
+        int: Hash signé (paramètre hash de GetScheduledHistoryRequest)
+    """
+    acc = 0
+    for msg in messages:
+        edit_date = getattr(msg, 'edit_date', None)
+        for value in (
+            msg.id,
+            int(msg.date.timestamp()) if msg.date else 0,
+            int(edit_date.timestamp()) if edit_date else 0,
+        ):
+            acc ^= acc >> 21
+            acc ^= (acc << 35) & _HASH_MASK
+            acc ^= acc >> 4
+            acc = (acc + value) & _HASH_MASK
+    return acc - (1 << 64) if acc >= (1 << 63) else acc
+
+
+@lru_cache(maxsize=None)
+def _rpc_class_name(error_class: type) -> Optional[str]:
+    """Nom Telegram d'une classe d'erreur générée (ChatWriteForbiddenError → CHAT_WRITE_FORBIDDEN)."""
+    if not error_class.__module__.endswith('rpcerrorlist'):
+        return None
+    return re.sub(r'(?<!^)(?=[A-Z])', '_', error_class.__name__[:-len('Error')]).upper()
+
+
+def rpc_error_name(error: RPCError) -> str:
+    """Nom Telegram d'une erreur RPC (les erreurs inconnues le portent dans message)."""
+    return _rpc_class_name(type(error)) or error.message or type(error).__name__
+
 
 class TelegramAccount:
     """Représente un compte Telegram connecté avec ses fonctionnalités."""
@@ -53,10 +133,19 @@ class TelegramAccount:
         self.api_hash = api_hash
         self.account_name = account_name or phone
         self.client: Optional[TelegramClient] = None
+        # Compte autorisé et utilisable (la connexion peut être en veille, voir park)
         self.is_connected = False
+        self.is_parked = False
+        self.last_used = 0.0  # Horodatage (time.time) de la dernière utilisation
+        self._usage = 0  # Opérations longues en cours (voir in_use)
+        self._connect_lock = asyncio.Lock()
         self.session_manager = SessionManager()
-        # Cache des entités pour éviter get_input_entity
-        self._entity_cache: Dict[int, any] = {}
+        # Pairs résolus (mémoire + base locale) pour éviter get_input_entity
+        self.entities = EntityCache(session_id)
+        # Groupes/canaux servis depuis la base locale (voir get_dialogs)
+        self._dialogs_lock = asyncio.Lock()
+        self._dialogs_refresh_task: Optional[asyncio.Task] = None
+        self._dialogs_refreshed_at = 0.0
     
     async def connect(self, session_file: Optional[str] = None) -> bool:
         """
@@ -88,6 +177,8 @@ class TelegramAccount:
                 return False
 
             self.is_connected = True
+            self.is_parked = False
+            self.last_used = time.time()
             self.session_manager.update_last_used(self.session_id)
             logger.info(f"Compte {self.account_name} connecté avec succès")
             return True
@@ -109,6 +200,90 @@ class TelegramAccount:
             finally:
                 self.client = None
                 self.is_connected = False
+                self.is_parked = False
+    
+    @property
+    def is_live(self) -> bool:
+        """Connexion réseau ouverte (False si le compte est en veille ou déconnecté)."""
+        return self.client is not None and self.client.is_connected()
+    
+    async def ensure_connected(self) -> bool:
+        """
+        Garantit une connexion ouverte, en réveillant le compte s'il est en veille.
+        
+        Returns:
+            bool: True si le compte est autorisé et connecté
+        """
+        self.last_used = time.time()
+        if self.is_live:
+            return self.is_connected
+        if not self.is_connected:
+            return False
+        
+        async with self._connect_lock:
+            if self.is_live:
+                return True
+            if self.client is None:
+                return await self.connect()
+            
+            # Même client : les gestionnaires d'événements restent enregistrés
+            try:
+                await self.client.connect()
+                if not await self.client.is_user_authorized():
+                    logger.warning(f"Compte {self.account_name} non autorisé au réveil")
+                    await self.disconnect()
+                    self.session_manager.update_session_status(self.session_id, "unauthorized")
+                    return False
+            except Exception as e:
+                logger.error(f"Erreur réveil compte {self.account_name}: {e}")
+                return False
+            
+            self.is_parked = False
+            self.last_used = time.time()
+            logger.info(f"Compte {self.account_name} réveillé")
+            return True
+    
+    async def park(self) -> bool:
+        """
+        Met le compte en veille : ferme la connexion (sockets, mises à jour,
+        session SQLite) sans le déconnecter de l'application.
+        
+        Returns:
+            bool: True si le compte a été mis en veille
+        """
+        if self._usage or not self.is_connected or not self.is_live:
+            return False
+        
+        async with self._connect_lock:
+            try:
+                await self.client.disconnect()
+            except Exception as e:
+                logger.warning(f"Erreur mise en veille de {self.account_name}: {e}")
+                return False
+        
+        self.is_parked = True
+        logger.info(f"Compte {self.account_name} mis en veille")
+        return True
+    
+    @asynccontextmanager
+    async def in_use(self):
+        """
+        Garde le compte connecté pendant une opération longue (scan, campagne).
+        
+        Yields:
+            bool: True si le compte est autorisé et connecté
+        """
+        self._usage += 1
+        try:
+            yield await self.ensure_connected()
+        finally:
+            self._usage -= 1
+            self.last_used = time.time()
+    
+    @property
+    def is_busy(self) -> bool:
+        """Une opération longue utilise le compte (pas de mise en veille)."""
+        return self._usage > 0
     
     async def send_code_request(self) -> bool:
         """
@@ -178,59 +353,155 @@ class TelegramAccount:
             logger.error(f"Erreur authentification: {e}")
             return False, str(e)
     
-    async def get_dialogs(self) -> List[Dict]:
+    async def get_dialogs(self, full_refresh: bool = False) -> List[Dict]:
         """
-        Récupère la liste des dialogues (groupes, canaux, conversations).
+        Récupère la liste des groupes et canaux du compte.
+        
+        Servie depuis la base locale ; seuls le premier appel et full_refresh
+        parcourent toute la liste des dialogues. Sinon un rafraîchissement
+        incrémental est lancé en arrière-plan (voir refresh_dialogs).
+        
+        Args:
+            full_refresh: Resynchronisation complète avant de répondre
         
         Returns:
             List[Dict]: Liste des dialogues
         """
+        db = get_async_db()
         try:
-            if not self.client.is_connected():
-                await self.client.connect()
+            if not full_refresh:
+                dialogs = await db.get_dialogs(self.session_id)
+                if dialogs:
+                    self._schedule_dialogs_refresh()
+                    return self._sort_dialogs(dialogs)
+            
+            await self.refresh_dialogs(full=True)
+            return self._sort_dialogs(await db.get_dialogs(self.session_id))
+            
+        except Exception as e:
+            logger.error(f"Erreur récupération dialogues: {e}")
+            return []
+    
+    async def refresh_dialogs(self, full: bool = False) -> int:
+        """
+        Met à jour la table des groupes depuis Telegram.
+        
+        iter_dialogs renvoie les dialogues du plus récent au plus ancien :
+        en mode incrémental, le parcours s'arrête au premier dialogue non
+        épinglé plus ancien que le plus récent déjà connu. Les groupes
+        quittés ou dont le compte a été exclu sont marqués (is_member = 0) ;
+        en mode complet, les groupes absents de la liste le sont aussi.
+        
+        Args:
+            full: Parcourir tous les dialogues
+        
+        Returns:
+            int: Nombre de dialogues mis à jour
+        """
+        async with self._dialogs_lock, self.in_use() as connected:
+            if not connected:
+                return 0
+            
+            db = get_async_db()
+            known_top = None if full else await db.get_dialogs_top_date(self.session_id)
             
             dialogs = []
+            entities = []
+            left_ids = []
             
             async for dialog in self.client.iter_dialogs():
                 entity = dialog.entity
                 
+                if (
+                    known_top is not None and not dialog.pinned
+                    and dialog.date is not None and to_epoch_ms(dialog.date) < known_top
+                ):
+                    break
+                
                 # Récupérer uniquement les groupes et canaux
-                if isinstance(entity, (Channel, Chat)):
-                    # CACHER l'entité avec TOUTES les formes d'ID possibles
-                    # Les channels/megagroupes ont des IDs avec le préfixe -100
-                    entity_id = entity.id
-                    self._entity_cache[entity_id] = entity  # ID positif
-                    
-                    # Pour les channels/megagroupes, cacher aussi avec l'ID négatif
-                    if isinstance(entity, Channel) and (entity.megagroup or entity.broadcast):
-                        negative_id = -1000000000000 - entity_id  # Format -100XXXXXXXXX
-                        self._entity_cache[negative_id] = entity
-                    
-                    dialog_info = {
-                        "id": entity.id,
-                        "title": dialog.title,
-                        "type": "channel" if isinstance(entity, Channel) else "group",
-                        "username": getattr(entity, 'username', None),
-                        "can_send": self._can_send_messages(entity),
-                        "participants_count": getattr(entity, 'participants_count', 0),
-                        "is_broadcast": getattr(entity, 'broadcast', False),
-                        "is_megagroup": getattr(entity, 'megagroup', False),
-                        "is_member": not getattr(entity, 'left', False) and not getattr(entity, 'kicked', False),
-                        "is_admin": getattr(entity, 'admin_rights', None) is not None or getattr(entity, 'creator', False)
-                    }
-                    dialogs.append(dialog_info)
-            
-            # Trier par type et taille
-            dialogs.sort(key=lambda x: (
-                0 if x["type"] == "group" else 1,
-                -x["participants_count"]
-            ))
+                if isinstance(entity, (ChannelForbidden, ChatForbidden)):
+                    left_ids.append(entity.id)
+                elif isinstance(entity, (Channel, Chat)):
+                    entities.append(entity)
+                    dialogs.append(self._dialog_info(dialog))
             
-            return dialogs
+            # Enregistrer les pairs (toutes les formes d'ID se résolvent ensuite sans réseau)
+            await self.entities.remember(entities)
             
-        except Exception as e:
-            logger.error(f"Erreur récupération dialogues: {e}")
-            return []
+            await db.save_dialogs(self.session_id, dialogs)
+            await db.mark_dialogs_left(self.session_id, left_ids)
+            if full:
+                await db.mark_dialogs_left(self.session_id, [d["id"] for d in dialogs], keep_only=True)
+            
+            self._dialogs_refreshed_at = time.monotonic()
+            logger.debug(
+                f"Dialogues {self.account_name} : {len(dialogs)} mis à jour, "
+                f"{len(left_ids)} quitté(s) ({'complet' if full else 'incrémental'})"
+            )
+            return len(dialogs)
+    
+    def _schedule_dialogs_refresh(self) -> None:
+        """Lance un rafraîchissement incrémental en arrière-plan (au plus un à la fois)."""
+        if self._dialogs_refresh_task is not None and not self._dialogs_refresh_task.done():
+            return
+        if time.monotonic() - self._dialogs_refreshed_at < TELEGRAM_DIALOGS_REFRESH_INTERVAL:
+            return
+        if not self.is_connected:
+            return
+        
+        async def refresh() -> None:
+            try:
+                await self.refresh_dialogs()
+            except Exception as e:
+                logger.warning(f"Rafraîchissement des dialogues {self.account_name} échoué: {e}")
+        
+        self._dialogs_refresh_task = asyncio.create_task(refresh())
+    
+    def _dialog_info(self, dialog) -> Dict:
+        """
+        Convertit un dialogue Telethon (groupe ou canal) en dictionnaire.
+        
+        Args:
+            dialog: Dialogue renvoyé par iter_dialogs
+        
+        Returns:
+            Dict: Informations du dialogue (avec 'date' du dernier message)
+        """
+        entity = dialog.entity
+        return {
+            "id": entity.id,
+            "title": dialog.title,
+            "type": "channel" if isinstance(entity, Channel) else "group",
+            "username": getattr(entity, 'username', None),
+            "can_send": self._can_send_messages(entity),
+            "participants_count": getattr(entity, 'participants_count', 0) or 0,
+            "is_broadcast": getattr(entity, 'broadcast', False),
+            "is_megagroup": getattr(entity, 'megagroup', False),
+            "is_member": not getattr(entity, 'left', False) and not getattr(entity, 'kicked', False),
+            "is_admin": getattr(entity, 'admin_rights', None) is not None or getattr(entity, 'creator', False),
+            "date": dialog.date,
+        }
+    
+    @staticmethod
+    def _sort_dialogs(dialogs: List[Dict]) -> List[Dict]:
+        """Trie les dialogues par type (groupes d'abord) puis par taille."""
+        dialogs.sort(key=lambda x: (
+            0 if x["type"] == "group" else 1,
+            -x["participants_count"]
+        ))
+        return dialogs
+    
+    async def get_input_peer(self, chat_id: int):
+        """
+        Résout le pair d'un chat sans appel réseau s'il a déjà été vu.
+        
+        Args:
+            chat_id: ID du chat (brut, -ID ou -100ID)
+            
+        Returns:
+            InputPeer: Pair utilisable dans les requêtes
+        """
+        return await self.entities.resolve(self.client, chat_id)
     
     def _can_send_messages(self, entity) -> bool:
         """
@@ -258,7 +529,7 @@ class TelegramAccount:
         schedule_date: datetime,
         file_path: Optional[str] = None,
         uploaded_file = None
-    ) -> Tuple[bool, str]:
+    ) -> SendResult:
         """
         Planifie un message dans un groupe/canal.
         
@@ -270,27 +541,24 @@ class TelegramAccount:
             uploaded_file: Fichier déjà uploadé (optimisé)
             
         Returns:
-            Tuple[bool, str]: (success, error_message)
+            SendResult: Statut, attente imposée (FloodWait) et erreur RPC éventuelle
         """
-        if not self.is_connected:
-            return False, "Compte non connecté"
+        if not await self.ensure_connected():
+            return SendResult(SendStatus.NOT_CONNECTED, "Compte non connecté")
         
         try:
             if isinstance(chat_id, str):
                 chat_id = int(chat_id)
             
-            # UTILISER l'entité cachée pour éviter get_input_entity
-            entity = self._entity_cache.get(chat_id)
-            if entity is None:
-                # Si pas en cache, résoudre UNE FOIS (coûte 1 API call)
-                entity = await self.client.get_input_entity(chat_id)
-                self._entity_cache[chat_id] = entity
+            # Pair en cache (mémoire ou base) : get_input_entity seulement si jamais vu
+            entity = await self.get_input_peer(chat_id)
             
             # Vérifier si c'est un envoi immédiat ou programmé
             now = datetime.now()
             time_diff = (schedule_date - now).total_seconds()
             is_immediate = time_diff < 60
             
+            sent = None
             if is_immediate:
                 # Envoi immédiat
                 if uploaded_file:
@@ -303,7 +571,7 @@ class TelegramAccount:
                 # Envoi programmé
                 if uploaded_file:
                     # Utiliser le fichier déjà uploadé (optimisé)
-                    await self.client.send_message(
+                    sent = await self.client.send_message(
                         entity,
                         message,
                         file=uploaded_file,
@@ -328,7 +596,7 @@ class TelegramAccount:
                             mime_type=mime_type,
                             attributes=attributes
                         )
-                        await self.client.send_message(
+                        sent = await self.client.send_message(
                             entity, 
                             message, 
                             file=media,
@@ -337,22 +605,39 @@ class TelegramAccount:
                     except Exception as file_error:
                         # Si l'envoi avec fichier échoue, essayer sans fichier
                         logger.warning(f"Échec envoi fichier programmé, envoi sans fichier: {file_error}")
-                        await self.client.send_message(entity, message, schedule=schedule_date)
+                        sent = await self.client.send_message(entity, message, schedule=schedule_date)
                 else:
                     # Sans fichier
-                    await self.client.send_message(entity, message, schedule=schedule_date)
+                    sent = await self.client.send_message(entity, message, schedule=schedule_date)
+                
+                if sent is not None:
+                    await self.remember_scheduled(chat_id, [sent])
             
-            return True, ""
+            return SEND_OK
             
         except FloodWaitError as e:
             error_msg = f"Rate limit atteint : attendez {e.seconds} secondes"
             logger.error(error_msg)
-            return False, error_msg
+            return SendResult(SendStatus.FLOOD_WAIT, error_msg, e.seconds, rpc_error_name(e))
+            
+        except SlowModeWaitError as e:
+            error_msg = f"Mode lent du groupe : attendez {e.seconds} secondes"
+            logger.warning(error_msg)
+            return SendResult(SendStatus.SLOW_MODE, error_msg, e.seconds, rpc_error_name(e))
+            
+        except RPCError as e:
+            name = rpc_error_name(e)
+            error_msg = f"Erreur planification message: {e}"
+            if isinstance(e, ForbiddenError) or name in PERMISSION_RPC_ERRORS:
+                logger.warning(error_msg)
+                return SendResult(SendStatus.PERMISSION_DENIED, error_msg, rpc_error=name)
+            logger.error(error_msg)
+            return SendResult(SendStatus.ERROR, error_msg, rpc_error=name)
             
         except Exception as e:
             error_msg = f"Erreur planification message: {e}"
             logger.error(error_msg)
-            return False, error_msg
+            return SendResult(SendStatus.ERROR, error_msg)
     
     async def get_me(self) -> Optional[Dict]:
         """
@@ -361,7 +646,7 @@ class TelegramAccount:
         Returns:
             Optional[Dict]: Informations du compte ou None
         """
-        if not self.is_connected:
+        if not await self.ensure_connected():
             return None
         
         try:
@@ -385,7 +670,7 @@ class TelegramAccount:
         Returns:
             Optional[str]: Chemin de la photo ou None
         """
-        if not self.is_connected:
+        if not await self.ensure_connected():
             return None
         
         try:
@@ -420,7 +705,7 @@ class TelegramAccount:
         Returns:
             Tuple[bool, str]: (success, error_message)
         """
-        if not self.is_connected:
+        if not await self.ensure_connected():
             return False, "Compte non connecté"
         
         try:
@@ -447,7 +732,7 @@ class TelegramAccount:
         Returns:
             Tuple[bool, str]: (success, error_message)
         """
-        if not self.is_connected:
+        if not await self.ensure_connected():
             return False, "Compte non connecté"
         
         try:
@@ -467,6 +752,24 @@ class TelegramAccount:
             logger.error(error_msg)
             return False, error_msg
     
+    async def get_local_scheduled_messages(self, chat_id: Optional[int] = None) -> List[Dict]:
+        """
+        Récupère les messages programmés du miroir local (aucun appel réseau).
+        
+        Args:
+            chat_id: Limiter à un groupe (None = tous)
+        
+        Returns:
+            List[Dict]: Messages programmés triés par date (état du dernier scan)
+        """
+        if chat_id is not None:
+            chat_id = EntityCache.raw_id(chat_id)
+        try:
+            return await get_async_db().get_scheduled_messages(self.session_id, chat_id)
+        except Exception as e:
+            logger.warning(f"Lecture des messages programmés locaux impossible: {e}")
+            return []
+    
     async def get_all_scheduled_messages(self) -> List[Dict]:
         """
         Récupère TOUS les messages programmés du compte - VERSION COMPLÈTE.
@@ -479,37 +782,8 @@ class TelegramAccount:
         
         try:
             all_scheduled = []
-            dialogs = await self.get_dialogs()
-            
-            for dialog in dialogs:
-                chat_id = dialog['id']
-                chat_title = dialog['title']
-                
-                try:
-                    # MÉTHODE PRINCIPALE : API bas niveau (plus complète)
-                    peer = await self.client.get_input_entity(chat_id)
-                    result = await self.client(GetScheduledHistoryRequest(peer=peer, hash=0))
-                    
-                    if hasattr(result, 'messages') and result.messages:
-                        for msg in result.messages:
-                            if msg and msg.id:  # Vérification de sécurité
-                                scheduled_info = {
-                                    "message_id": msg.id,
-                                    "chat_id": chat_id,
-                                    "chat_title": chat_title,
-                                    "text": getattr(msg, 'message', None) or getattr(msg, 'text', None) or "[Fichier]",
-                                    "date": msg.date,
-                                    "has_media": hasattr(msg, 'media') and msg.media is not None,
-                                    "media_type": type(msg.media).__name__ if hasattr(msg, 'media') and msg.media else None
-                                }
-                                all_scheduled.append(scheduled_info)
-                    
-                    # Délai minimal pour éviter les rate limits
-                    await asyncio.sleep(0.1)
-                    
-                except Exception as e:
-                    logger.warning(f"Erreur récupération messages pour {chat_title}: {e}")
-                    continue
+            async for _, _, messages in self.iter_scheduled_messages():
+                all_scheduled.extend(messages)
             
             # Trier par date
             all_scheduled.sort(key=lambda x: x['date'])
@@ -519,6 +793,159 @@ class TelegramAccount:
             logger.error(f"Erreur récupération messages programmés: {e}")
             return []
     
+    async def iter_scheduled_messages(
+        self,
+        concurrency: int = TELEGRAM_SCHEDULED_SCAN_CONCURRENCY
+    ) -> AsyncIterator[Tuple[int, int, List[Dict]]]:
+        """
+        Parcourt les messages programmés de tous les groupes, au fil de l'eau.
+        
+        Les groupes sont scannés par un nombre borné de tâches, sous le rate
+        limiter du compte ; chaque résultat est transmis dès qu'il arrive
+        (ordre d'arrivée, non trié). Le miroir local est réconcilié au passage
+        et, en fin de scan complet, purgé des groupes quittés.
+        
+        Args:
+            concurrency: Nombre maximum de requêtes simultanées
+        
+        Yields:
+            Tuple[int, int, List[Dict]]: (groupes scannés, total, messages du groupe)
+        """
+        if not self.is_connected:
+            return
+        
+        dialogs = await self.get_dialogs()
+        total = len(dialogs)
+        if not total:
+            return
+        
+        db = get_async_db()
+        try:
+            known_hashes = await db.get_scheduled_hashes(self.session_id)
+        except Exception as e:
+            logger.warning(f"Lecture des hashes de messages programmés impossible: {e}")
+            known_hashes = {}
+        
+        pending = iter(dialogs)
+        results: asyncio.Queue = asyncio.Queue()
+        
+        async def worker() -> None:
+            # Itérateur partagé : chaque groupe est pris par une seule tâche
+            for dialog in pending:
+                known_hash = known_hashes.get(dialog['id'], 0)
+                await results.put(await self._scan_scheduled_chat(dialog, known_hash))
+        
+        # Compte réveillé si besoin et gardé connecté pendant tout le scan
+        async with self.in_use() as connected:
+            if not connected:
+                return
+            
+            workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, total)))]
+            try:
+                for scanned in range(1, total + 1):
+                    yield scanned, total, await results.get()
+            
+                # Scan complet : les groupes quittés sortent du miroir
+                try:
+                    await db.prune_scheduled_chats(self.session_id, [dialog['id'] for dialog in dialogs])
+                except Exception as e:
+                    logger.warning(f"Purge du miroir des messages programmés impossible: {e}")
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+    
+    async def _scan_scheduled_chat(self, dialog: Dict, known_hash: int = 0) -> List[Dict]:
+        """
+        Récupère les messages programmés d'un groupe et met à jour le miroir local.
+        
+        Le hash de la liste enregistrée est renvoyé : un groupe inchangé
+        répond MessagesNotModified et la liste est relue localement.
+        
+        Args:
+            dialog: Dialogue (voir get_dialogs)
+            known_hash: Hash de la liste du miroir local (0 = inconnu)
+        
+        Returns:
+            List[Dict]: Messages programmés du groupe (miroir local en cas d'erreur)
+        """
+        chat_id = dialog['id']
+        chat_title = dialog['title']
+        db = get_async_db()
+        
+        try:
+            peer = await self.get_input_peer(chat_id)
+            await self._wait_rate_limit('get_scheduled_history')
+            result = await self.client(GetScheduledHistoryRequest(peer=peer, hash=known_hash))
+        except Exception as e:
+            logger.warning(f"Erreur récupération messages pour {chat_title}: {e}")
+            result = None
+        
+        if result is None or isinstance(result, MessagesNotModified):
+            try:
+                messages = await db.get_scheduled_messages(self.session_id, chat_id)
+            except Exception as e:
+                logger.warning(f"Lecture des messages programmés de {chat_title} impossible: {e}")
+                return []
+            return [dict(message, chat_title=chat_title) for message in messages]
+        
+        raw_messages = [msg for msg in getattr(result, 'messages', None) or [] if msg and msg.id]
+        messages = [self._scheduled_info(msg, chat_id, chat_title) for msg in raw_messages]
+        
+        try:
+            await db.replace_scheduled_chat(
+                self.session_id, chat_id, messages, scheduled_history_hash(raw_messages)
+            )
+        except Exception as e:
+            logger.warning(f"Mise à jour du miroir pour {chat_title} impossible: {e}")
+        return messages
+    
+    @staticmethod
+    def _scheduled_info(msg, chat_id: int, chat_title: Optional[str] = None) -> Dict:
+        """
+        Convertit un message programmé Telethon en dictionnaire.
+        
+        Args:
+            msg: Message Telethon
+            chat_id: ID brut du groupe
+            chat_title: Titre du groupe (None = titre du dialogue en base)
+        
+        Returns:
+            Dict: Message (date en heure locale)
+        """
+        media = getattr(msg, 'media', None)
+        return {
+            "message_id": msg.id,
+            "chat_id": chat_id,
+            "chat_title": chat_title,
+            "text": getattr(msg, 'message', None) or getattr(msg, 'text', None) or "[Fichier]",
+            "date": as_datetime(msg.date),
+            "has_media": media is not None,
+            "media_type": type(media).__name__ if media else None
+        }
+    
+    async def remember_scheduled(self, chat_id: int, sent: List) -> None:
+        """Ajoute au miroir local des messages que l'on vient de programmer."""
+        chat_id = EntityCache.raw_id(chat_id)
+        messages = [self._scheduled_info(msg, chat_id) for msg in sent if msg is not None]
+        try:
+            await get_async_db().save_scheduled_messages(self.session_id, messages)
+        except Exception as e:
+            logger.warning(f"Mise à jour du miroir des messages programmés impossible: {e}")
+    
+    async def forget_scheduled(self, chat_id: int, message_ids: Optional[List[int]] = None) -> None:
+        """Retire du miroir local des messages supprimés (None = tout le groupe)."""
+        try:
+            await get_async_db().delete_scheduled_messages(
+                self.session_id, EntityCache.raw_id(chat_id), message_ids
+            )
+        except Exception as e:
+            logger.warning(f"Mise à jour du miroir des messages programmés impossible: {e}")
+    
+    async def _wait_rate_limit(self, action: str) -> None:
+        """Attend qu'une requête de ce type soit autorisée pour le compte."""
+        await get_rate_limiter().acquire(self.session_id, action)
+    
     async def delete_scheduled_messages(
         self,
         chat_id: int,
@@ -534,23 +961,25 @@ class TelegramAccount:
         Returns:
             Tuple[bool, str]: (success, error_message)
         """
-        if not self.is_connected:
+        if not await self.ensure_connected():
             return False, "Compte non connecté"
         
         try:
             if isinstance(chat_id, str):
                 chat_id = int(chat_id)
             
+            peer = await self.get_input_peer(chat_id)
+            
             if message_ids:
                 # Supprimer des messages spécifiques
-                await self.client(DeleteScheduledMessagesRequest(peer=chat_id, id=message_ids))
+                await self._delete_scheduled_batched(peer, message_ids)
             else:
                 # Supprimer tous les messages
-                scheduled_messages = await self.client.get_messages(chat_id, scheduled=True, limit=TELEGRAM_MAX_SCHEDULED_MESSAGES_FETCH)
+                scheduled_messages = await self.client.get_messages(peer, scheduled=True, limit=TELEGRAM_MAX_SCHEDULED_MESSAGES_FETCH)
                 if scheduled_messages:
-                    msg_ids = [msg.id for msg in scheduled_messages]
-                    await self.client(DeleteScheduledMessagesRequest(peer=chat_id, id=msg_ids))
+                    await self._delete_scheduled_batched(peer, [msg.id for msg in scheduled_messages])
             
+            await self.forget_scheduled(chat_id, message_ids or None)
             return True, ""
             
         except Exception as e:
@@ -558,6 +987,14 @@ class TelegramAccount:
             logger.error(error_msg)
             return False, error_msg
     
+    async def _delete_scheduled_batched(self, peer, message_ids: List[int]) -> None:
+        """Supprime des messages programmés : une requête par lot de 100 IDs."""
+        for start in range(0, len(message_ids), TELEGRAM_MAX_IDS_PER_REQUEST):
+            await self._wait_rate_limit('delete_scheduled')
+            await self.client(DeleteScheduledMessagesRequest(
+                peer=peer, id=message_ids[start:start + TELEGRAM_MAX_IDS_PER_REQUEST]
+            ))
+    
     async def edit_scheduled_message(
         self,
         chat_id: int,
@@ -577,60 +1014,274 @@ class TelegramAccount:
         Returns:
             Tuple[bool, str]: (success, error_message)
         """
-        if not self.is_connected:
-            return False, "Compte non connecté"
+        edited, errors = await self.edit_scheduled_messages(
+            chat_id, [message_id], new_text, new_schedule_date
+        )
+        if edited:
+            return True, "Message programmé modifié avec succès"
+        return False, errors[0] if errors else "Message programmé introuvable - Rafraîchissez la liste"
+    
+    async def bulk_edit_scheduled_messages(
+        self,
+        targets: Dict[int, List[int]],
+        new_text: Optional[str] = None,
+        new_schedule_date: Optional[datetime] = None,
+        concurrency: int = TELEGRAM_SCHEDULED_EDIT_CONCURRENCY
+    ) -> Tuple[int, List[str]]:
+        """
+        Modifie des messages programmés de plusieurs groupes.
+        
+        Les groupes sont traités par un nombre borné de tâches, sous le
+        rate limiter du compte.
+        
+        Args:
+            targets: IDs des messages à modifier par chat_id
+            new_text: Nouveau texte (None = garder l'ancien)
+            new_schedule_date: Nouvelle date (None = garder l'ancienne)
+            concurrency: Nombre maximum de groupes traités simultanément
+            
+        Returns:
+            Tuple[int, List[str]]: (messages modifiés, erreurs)
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def edit_chat(chat_id: int, message_ids: List[int]) -> Tuple[int, List[str]]:
+            async with semaphore:
+                return await self.edit_scheduled_messages(chat_id, message_ids, new_text, new_schedule_date)
+        
+        results = await asyncio.gather(*(
+            edit_chat(chat_id, message_ids) for chat_id, message_ids in targets.items()
+        ))
+        
+        edited = sum(count for count, _ in results)
+        errors = [error for _, chat_errors in results for error in chat_errors]
+        return edited, errors
+    
+    async def edit_scheduled_messages(
+        self,
+        chat_id: int,
+        message_ids: List[int],
+        new_text: Optional[str] = None,
+        new_schedule_date: Optional[datetime] = None
+    ) -> Tuple[int, List[str]]:
+        """
+        Modifie des messages programmés d'un groupe (même texte et/ou même date).
+        
+        Chaque message est modifié sur place (EditMessageRequest avec
+        schedule_date) : une requête par message et le média est conservé.
+        Seuls les messages qui refusent la modification sur place sont
+        supprimés (par lots de 100) puis recréés.
+        
+        Args:
+            chat_id: ID du chat
+            message_ids: IDs des messages à modifier
+            new_text: Nouveau texte (None = garder l'ancien)
+            new_schedule_date: Nouvelle date (None = garder l'ancienne)
+            
+        Returns:
+            Tuple[int, List[str]]: (messages modifiés, erreurs)
+        """
+        if not await self.ensure_connected():
+            return 0, ["Compte non connecté"]
+        if not message_ids:
+            return 0, []
         
         try:
             if isinstance(chat_id, str):
                 chat_id = int(chat_id)
+            peer = await self.get_input_peer(chat_id)
             
-            # Récupérer le message actuel pour obtenir ses propriétés
-            entity = self._entity_cache.get(chat_id)
-            if entity is None:
-                entity = await self.client.get_input_entity(chat_id)
-                self._entity_cache[chat_id] = entity
-            
-            # MÉTHODE SIMPLE : Suppression + Recréation (100% fiable)
-            # 1. Récupérer le message actuel avec la même méthode que get_all_scheduled_messages
-            peer = await self.client.get_input_entity(chat_id)
-            result = await self.client(GetScheduledHistoryRequest(peer=peer, hash=0))
-            
-            current_message = None
-            if hasattr(result, 'messages') and result.messages:
-                for msg in result.messages:
-                    if msg and msg.id == message_id:
-                        current_message = msg
-                        break
-            
-            if not current_message:
-                return False, "Message programmé introuvable - Rafraîchissez la liste"
-            
-            # 2. Déterminer les nouvelles valeurs
-            text_to_use = new_text if new_text is not None else (getattr(current_message, 'message', None) or getattr(current_message, 'text', None) or "")
-            schedule_to_use = new_schedule_date if new_schedule_date is not None else current_message.date
-            
-            # 3. Supprimer l'ancien message
-            await self.client(DeleteScheduledMessagesRequest(peer=entity, id=[message_id]))
-            
-            # 4. Recréer le message
-            await self.client.send_message(
-                entity=entity,
-                message=text_to_use,
-                schedule=schedule_to_use
+            # schedule_date désigne un message programmé : la date actuelle est requise
+            dates = {}
+            if new_schedule_date is None:
+                dates = await self._scheduled_dates(chat_id, peer, message_ids)
+        except Exception as e:
+            logger.error(f"Erreur modification messages du chat {chat_id}: {e}")
+            return 0, [f"Chat {chat_id}: {self._edit_error_message(e)}"]
+        
+        edited: List[int] = []
+        fallback: List[int] = []
+        errors: List[str] = []
+        
+        for message_id in message_ids:
+            schedule_date = new_schedule_date or dates.get(message_id)
+            if schedule_date is None:
+                errors.append(f"Message {message_id}: introuvable")
+                continue
+            
+            try:
+                await self._wait_rate_limit('edit_scheduled')
+                if new_text is None:
+                    await self.client(EditMessageRequest(
+                        peer=peer, id=message_id, schedule_date=schedule_date
+                    ))
+                else:
+                    await self.client.edit_message(peer, message_id, new_text, schedule=schedule_date)
+                edited.append(message_id)
+            except MessageNotModifiedError:
+                edited.append(message_id)
+            except RPCError as e:
+                if rpc_error_name(e) in EDIT_IN_PLACE_RPC_ERRORS:
+                    logger.warning(f"Modification sur place impossible ({message_id}), recréation: {e}")
+                    fallback.append(message_id)
+                    continue
+                # Erreur de saisie, FloodWait... : l'original est laissé intact
+                logger.error(f"Erreur modification message {message_id}: {e}")
+                errors.append(f"Message {message_id}: {self._edit_error_message(e)}")
+            except Exception as e:
+                logger.error(f"Erreur modification message {message_id}: {e}")
+                errors.append(f"Message {message_id}: {self._edit_error_message(e)}")
+        
+        if edited:
+            try:
+                await get_async_db().update_scheduled_messages(
+                    self.session_id, EntityCache.raw_id(chat_id), edited, new_text, new_schedule_date
+                )
+            except Exception as e:
+                logger.warning(f"Mise à jour du miroir des messages programmés impossible: {e}")
+        
+        recreated = 0
+        if fallback:
+            recreated, fallback_errors = await self._recreate_scheduled_messages(
+                chat_id, peer, fallback, new_text, new_schedule_date
+            )
+            errors.extend(fallback_errors)
+        
+        return len(edited) + recreated, errors
+    
+    async def _scheduled_dates(self, chat_id: int, peer, message_ids: List[int]) -> Dict[int, datetime]:
+        """
+        Récupère la date de programmation actuelle de messages.
+        
+        Le miroir local suffit en général ; les messages absents sont lus
+        sur Telegram (GetScheduledMessages, une requête par lot de 100).
+        
+        Returns:
+            Dict[int, datetime]: Date (avec fuseau) par message_id
+        """
+        wanted = set(message_ids)
+        dates = {
+            msg['message_id']: msg['date'].astimezone()
+            for msg in await self.get_local_scheduled_messages(chat_id)
+            if msg['message_id'] in wanted
+        }
+        
+        missing = [message_id for message_id in message_ids if message_id not in dates]
+        for start in range(0, len(missing), TELEGRAM_MAX_IDS_PER_REQUEST):
+            result = await self.client(GetScheduledMessagesRequest(
+                peer=peer, id=missing[start:start + TELEGRAM_MAX_IDS_PER_REQUEST]
+            ))
+            for msg in getattr(result, 'messages', None) or []:
+                if msg and msg.id and getattr(msg, 'date', None):
+                    dates[msg.id] = msg.date
+        return dates
+    
+    async def _recreate_scheduled_messages(
+        self,
+        chat_id: int,
+        peer,
+        message_ids: List[int],
+        new_text: Optional[str],
+        new_schedule_date: Optional[datetime]
+    ) -> Tuple[int, List[str]]:
+        """
+        Repli : supprime puis recrée des messages non modifiables sur place.
+        
+        Les photos et documents sont renvoyés avec le message. Un message
+        dont le remplaçant ne peut pas être construit n'est pas supprimé.
+        
+        Returns:
+            Tuple[int, List[str]]: (messages recréés, erreurs)
+        """
+        errors: List[str] = []
+        try:
+            result = await self.client(GetScheduledMessagesRequest(peer=peer, id=message_ids))
+            current = {
+                msg.id: msg for msg in getattr(result, 'messages', None) or []
+                if msg and msg.id and getattr(msg, 'date', None)
+            }
+            errors.extend(
+                f"Message {message_id}: introuvable"
+                for message_id in message_ids if message_id not in current
             )
             
-            return True, "Message programmé modifié avec succès"
+            replacements = {}
+            for message_id, msg in current.items():
+                try:
+                    replacements[message_id] = self._scheduled_replacement(msg, new_text, new_schedule_date)
+                except ValueError as e:
+                    errors.append(f"Message {message_id}: {e}")
+            if not replacements:
+                return 0, errors
             
+            await self._delete_scheduled_batched(peer, list(replacements))
+            await self.forget_scheduled(chat_id, list(replacements))
         except Exception as e:
-            logger.error(f"Erreur modification message {message_id}: {e}")
+            logger.error(f"Erreur suppression avant recréation (chat {chat_id}): {e}")
+            return 0, errors + [f"Chat {chat_id}: {self._edit_error_message(e)}"]
+        
+        sent = []
+        for message_id, (text, media, schedule_date) in replacements.items():
+            try:
+                await self._wait_rate_limit('edit_scheduled')
+                sent.append(await self.client.send_message(
+                    peer, text, file=media, schedule=schedule_date
+                ))
+            except Exception as e:
+                logger.error(f"Erreur recréation message {message_id}: {e}")
+                errors.append(f"Message {message_id}: {self._edit_error_message(e)}")
+        
+        if sent:
+            await self.remember_scheduled(chat_id, sent)
+        return len(sent), errors
+    
+    @staticmethod
+    def _scheduled_replacement(
+        msg,
+        new_text: Optional[str],
+        new_schedule_date: Optional[datetime]
+    ) -> Tuple[str, Optional[object], datetime]:
+        """
+        Construit et vérifie le remplaçant d'un message programmé (avant suppression).
+        
+        Args:
+            msg: Message programmé actuel
+            new_text: Nouveau texte (None = garder l'ancien)
+            new_schedule_date: Nouvelle date (None = garder l'ancienne)
             
-            # Messages d'erreur simplifiés
-            if "not found" in str(e).lower():
-                return False, "Message programmé introuvable - Rafraîchissez la liste"
-            elif "flood" in str(e).lower():
-                return False, "Trop de requêtes - Attendez quelques secondes"
-            else:
-                return False, f"Erreur: {str(e)}"
+        Returns:
+            Tuple: (texte, média ou None, date de programmation)
+            
+        Raises:
+            ValueError: Remplaçant impossible à envoyer (message conservé)
+        """
+        text = new_text if new_text is not None else (getattr(msg, 'message', None) or "")
+        media = None
+        if isinstance(msg.media, (MessageMediaPhoto, MessageMediaDocument)):
+            media = msg.media
+        elif msg.media is not None and type(msg.media).__name__ != 'MessageMediaWebPage':
+            raise ValueError(f"média {type(msg.media).__name__} impossible à renvoyer")
+        
+        limit = TELEGRAM_MAX_CAPTION_LENGTH if media is not None else TELEGRAM_MAX_MESSAGE_LENGTH
+        if len(text) > limit:
+            raise ValueError(f"texte trop long ({len(text)} > {limit} caractères)")
+        if not text.strip() and media is None:
+            raise ValueError("message vide")
+        
+        schedule_date = new_schedule_date or msg.date
+        now = datetime.now(schedule_date.tzinfo) if schedule_date.tzinfo else datetime.now()
+        if schedule_date <= now:
+            raise ValueError("date de programmation passée")
+        return text, media, schedule_date
+    
+    @staticmethod
+    def _edit_error_message(error: Exception) -> str:
+        """Message d'erreur simplifié pour l'interface."""
+        if isinstance(error, MessageIdInvalidError) or "not found" in str(error).lower():
+            return "Message programmé introuvable - Rafraîchissez la liste"
+        if isinstance(error, FloodWaitError) or "flood" in str(error).lower():
+            return "Trop de requêtes - Attendez quelques secondes"
+        return f"Erreur: {error}"
     
     async def resolve_username(self, username: str) -> Optional[Dict]:
         """
@@ -642,7 +1293,7 @@ class TelegramAccount:
         Returns:
             Optional[Dict]: Infos de l'entité (id, title, type, username) ou None
         """
-        if not self.is_connected:
+        if not await self.ensure_connected():
             return None
         
         try:
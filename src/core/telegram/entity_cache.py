@@ -0,0 +1,248 @@
+"""Cache persistant des pairs Telegram (InputPeer) d'un compte."""
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from telethon import utils
+from telethon.tl.types import (
+    InputPeerChannel, InputPeerChat, InputPeerUser, PeerChannel, PeerChat
+)
+
+from database.async_db import get_async_db
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# Nombre maximum de pairs gardés en mémoire par compte
+ENTITY_CACHE_SIZE = 5000
+
+InputPeer = Union[InputPeerChannel, InputPeerChat, InputPeerUser]
+
+
+class EntityCache:
+    """
+    Résolution des pairs sans appel réseau une fois le dialogue vu.
+
+    Un InputPeer ne contient que l'ID et le access_hash : ils sont
+    enregistrés (table entities) lors du parcours des dialogues et relus
+    après redémarrage. Ordre de résolution : LRU en mémoire, base locale,
+    puis get_input_entity (réseau) en dernier recours.
+
+    Les pairs sont indexés par ID marqué (utils.get_peer_id) : un
+    utilisateur et un groupe de même ID brut restent distincts. Un ID
+    positif désigne d'abord l'utilisateur, puis le groupe ou le canal de
+    même ID brut (les dialogues de l'interface portent l'ID brut).
+    """
+
+    def __init__(self, session_id: str, max_size: int = ENTITY_CACHE_SIZE):
+        """
+        Initialise un cache vide.
+
+        Args:
+            session_id: ID de la session
+            max_size: Nombre maximum de pairs en mémoire
+        """
+        self.session_id = session_id
+        self.max_size = max_size
+        self._peers: "OrderedDict[int, InputPeer]" = OrderedDict()
+        self._warmed = False
+
+        # Métriques
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    # ==================== CONVERSIONS ====================
+
+    @staticmethod
+    def raw_id(chat_id: Union[int, str]) -> int:
+        """
+        Normalise un ID de chat (brut, -ID ou -100ID) en ID brut positif.
+
+        Args:
+            chat_id: ID tel que reçu de l'interface ou de Telethon
+
+        Returns:
+            int: ID brut
+        """
+        chat_id = int(chat_id)
+        if chat_id < 0:
+            return utils.resolve_id(chat_id)[0]
+        return chat_id
+
+    @staticmethod
+    def peer_key(peer) -> int:
+        """
+        Clé d'un pair dans le cache : son ID marqué.
+
+        Args:
+            peer: InputPeer, ou ID marqué (un ID positif est un utilisateur)
+
+        Returns:
+            int: ID marqué (ID utilisateur, -ID groupe, -100ID canal)
+        """
+        if isinstance(peer, str):
+            peer = int(peer)
+        return utils.get_peer_id(peer)
+
+    @staticmethod
+    def _candidate_keys(chat_id: Union[int, str]) -> List[int]:
+        """Clés possibles d'un ID : la sienne, plus groupe et canal pour un ID brut."""
+        chat_id = int(chat_id)
+        if chat_id < 0:
+            return [chat_id]
+        return [chat_id, utils.get_peer_id(PeerChat(chat_id)), utils.get_peer_id(PeerChannel(chat_id))]
+
+    @classmethod
+    def _row_from_peer(cls, peer, username: Optional[str] = None) -> Optional[Tuple]:
+        """Convertit un InputPeer en ligne (peer_id marqué, peer_type, access_hash, username)."""
+        if isinstance(peer, InputPeerChannel):
+            return cls.peer_key(peer), 'channel', peer.access_hash, username
+        if isinstance(peer, InputPeerChat):
+            return cls.peer_key(peer), 'chat', None, username
+        if isinstance(peer, InputPeerUser):
+            return cls.peer_key(peer), 'user', peer.access_hash, username
+        return None
+
+    @staticmethod
+    def _peer_from_row(row: Dict) -> InputPeer:
+        """Reconstruit un InputPeer depuis une ligne de la table entities."""
+        raw_id = utils.resolve_id(row['peer_id'])[0]
+        if row['peer_type'] == 'channel':
+            return InputPeerChannel(raw_id, row['access_hash'])
+        if row['peer_type'] == 'chat':
+            return InputPeerChat(raw_id)
+        return InputPeerUser(raw_id, row['access_hash'])
+
+    def _put(self, key: int, peer: InputPeer) -> None:
+        """Ajoute un pair au LRU (évince le moins récemment utilisé)."""
+        self._peers[key] = peer
+        self._peers.move_to_end(key)
+        while len(self._peers) > self.max_size:
+            self._peers.popitem(last=False)
+
+    # ==================== API ====================
+
+    def get_cached(self, chat_id: Union[int, str]) -> Optional[InputPeer]:
+        """
+        Récupère un pair déjà en mémoire (aucune E/S).
+
+        Args:
+            chat_id: ID du chat
+
+        Returns:
+            Optional[InputPeer]: Pair ou None
+        """
+        for key in self._candidate_keys(chat_id):
+            peer = self._peers.get(key)
+            if peer is not None:
+                self._peers.move_to_end(key)
+                return peer
+        return None
+
+    async def warm(self) -> int:
+        """
+        Charge en mémoire les pairs enregistrés les plus récents (une fois).
+
+        Returns:
+            int: Nombre de pairs chargés
+        """
+        if self._warmed:
+            return 0
+        self._warmed = True
+
+        try:
+            rows = await get_async_db().get_entities(self.session_id, self.max_size)
+        except Exception as e:
+            logger.warning(f"Préchargement des entités impossible ({self.session_id}): {e}")
+            return 0
+
+        # Du plus ancien au plus récent : les plus récents restent en tête du LRU
+        for row in reversed(rows):
+            self._put(row['peer_id'], self._peer_from_row(row))
+        return len(rows)
+
+    async def remember(self, entities: Iterable) -> int:
+        """
+        Enregistre des entités complètes (User, Chat, Channel) reçues de Telegram.
+
+        Args:
+            entities: Entités (par exemple dialog.entity de iter_dialogs)
+
+        Returns:
+            int: Nombre de pairs enregistrés
+        """
+        rows = []
+        for entity in entities:
+            try:
+                peer = utils.get_input_peer(entity, allow_self=False)
+            except TypeError:
+                continue
+            row = self._row_from_peer(peer, getattr(entity, 'username', None))
+            if row is not None:
+                self._put(row[0], peer)
+                rows.append(row)
+
+        if rows:
+            try:
+                await get_async_db().save_entities(self.session_id, rows)
+            except Exception as e:
+                logger.warning(f"Sauvegarde des entités impossible ({self.session_id}): {e}")
+        return len(rows)
+
+    async def resolve(self, client, chat_id: Union[int, str]) -> InputPeer:
+        """
+        Résout un pair : mémoire, puis base locale, puis réseau.
+
+        Args:
+            client: Client Telethon connecté (utilisé seulement en dernier recours)
+            chat_id: ID du chat
+
+        Returns:
+            InputPeer: Pair utilisable dans les requêtes
+
+        Raises:
+            ValueError: Pair inconnu de Telegram (voir get_input_entity)
+        """
+        peer = self.get_cached(chat_id)
+        if peer is not None:
+            self.hits += 1
+            return peer
+
+        for key in self._candidate_keys(chat_id):
+            try:
+                row = await get_async_db().get_entity(self.session_id, key)
+            except Exception as e:
+                logger.warning(f"Lecture de l'entité {key} impossible: {e}")
+                row = None
+
+            if row is not None:
+                self.db_hits += 1
+                peer = self._peer_from_row(row)
+                self._put(key, peer)
+                return peer
+
+        # Jamais vu : un appel réseau, puis plus jamais
+        self.misses += 1
+        peer = await client.get_input_entity(chat_id)
+        row = self._row_from_peer(peer)
+        if row is not None:
+            self._put(row[0], peer)
+            try:
+                await get_async_db().save_entities(self.session_id, [row])
+            except Exception as e:
+                logger.warning(f"Sauvegarde de l'entité {row[0]} impossible: {e}")
+        return peer
+
+    def get_stats(self) -> Dict:
+        """
+        Récupère les métriques du cache.
+
+        Returns:
+            Dict: Taille et répartition des résolutions
+        """
+        return {
+            'size': len(self._peers),
+            'hits': self.hits,
+            'db_hits': self.db_hits,
+            'misses': self.misses,
+        }
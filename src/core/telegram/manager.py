@@ -1,15 +1,27 @@
 """
 Gestionnaire central des comptes Telegram.
 """
+import asyncio
+import time
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
 from telethon import TelegramClient
 
 from core.session_manager import SessionManager
 from .account import TelegramAccount
 from .credentials import get_api_credentials
+from database.async_db import get_async_db
+from utils.constants import (
+    CONNECTION_POLICY_ALWAYS,
+    CONNECTION_POLICY_IDLE,
+    CONNECTION_POLICY_ON_DEMAND,
+    IDLE_CHECK_INTERVAL_SECONDS,
+    ON_DEMAND_IDLE_SECONDS,
+    TELEGRAM_SESSION_LOAD_CONCURRENCY
+)
 from utils.logger import get_logger
+from utils.rate_limiter import get_rate_limiter
 
 logger = get_logger()
 
@@ -21,6 +33,10 @@ class TelegramManager:
         """Initialise le gestionnaire de comptes Telegram."""
         self.accounts: Dict[str, TelegramAccount] = {}
         self.session_manager = SessionManager()
+        # Étape différée du démarrage : nom Telegram et photo de profil
+        self._details_task: Optional[asyncio.Task] = None
+        # Mise en veille des comptes inactifs (politiques "on_demand" et "idle")
+        self._idle_task: Optional[asyncio.Task] = None
     
     async def add_account(
         self,
@@ -121,12 +137,23 @@ class TelegramManager:
         """Charge les sessions existantes depuis le disque."""
         await self.load_existing_sessions_with_progress(None)
     
-    async def load_existing_sessions_with_progress(self, progress_callback=None) -> None:
+    async def load_existing_sessions_with_progress(
+        self,
+        progress_callback=None,
+        on_first_connected: Optional[Callable[[], Awaitable[None]]] = None,
+        concurrency: int = TELEGRAM_SESSION_LOAD_CONCURRENCY
+    ) -> None:
         """
         Charge les sessions existantes depuis le disque avec callback de progression.
         
+        Les comptes sont connectés en parallèle (nombre borné) et la
+        progression avance à chaque connexion terminée. Le nom Telegram et
+        la photo de profil sont récupérés ensuite, en arrière-plan.
+        
         Args:
             progress_callback: Fonction callback(progress: int, message: str)
+            on_first_connected: Coroutine appelée dès le premier compte connecté
+            concurrency: Nombre maximum de connexions simultanées
         """
         sessions = self.session_manager.list_sessions()
         
@@ -137,92 +164,241 @@ class TelegramManager:
         
         api_id, api_hash = get_api_credentials()
         total = len(sessions)
-        
-        for idx, session_info in enumerate(sessions):
-            try:
-                session_id = session_info["session_id"]
-                account_name = session_info.get("account_name", session_info.get("phone", "Compte"))
-                
-                # Calculer la progression (10% à 90%, le 100% sera fait après)
-                progress = 10 + int((idx / total) * 80)
-                if progress_callback:
-                    progress_callback(progress, f"Connexion à {account_name}...")
-                
-                # Vérifier si le fichier de session existe (chiffré ou non)
-                # Note: TelegramClient ajoute .session, donc on cherche plusieurs variantes
-                session_base = self.session_manager.sessions_dir / session_id
-                possible_files = [
-                    session_base.with_suffix('.enc.session'),  # Chiffré par Telethon
-                    session_base.with_suffix('.enc'),           # Chiffré pur
-                    session_base.with_suffix('.session'),       # Non chiffré
-                ]
-                
-                # Vérifier si au moins un fichier existe
-                session_exists = any(f.exists() for f in possible_files)
-                
-                if not session_exists:
-                    self.session_manager.delete_session(session_id)
-                    continue
-                
-                # SÉCURITÉ : Toujours utiliser les credentials depuis .env
-                # Ne JAMAIS lire depuis session_info (legacy)
-                _api_id = api_id
-                _api_hash = api_hash
-                
-                account = TelegramAccount(
-                    session_id,
-                    session_info["phone"],
-                    _api_id,
-                    _api_hash,
-                    session_info.get("account_name")
-                )
-                
-                # Créer le client avec le chemin de session (déchiffré automatiquement si nécessaire)
-                session_file_str = self.session_manager.get_session_for_client(session_id)
-                account.client = TelegramClient(session_file_str, account.api_id, account.api_hash)
-                
-                # Tenter de se connecter
-                connected = await account.connect()
-                if connected:
-                    self.accounts[session_id] = account
-                    
-                    # Récupérer et mettre à jour le nom Telegram + photo de profil
+        done = 0
+        connected_accounts: List[TelegramAccount] = []
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def load(session_info: Dict) -> Tuple[Optional[TelegramAccount], str]:
+            async with semaphore:
+                return await self._load_session(session_info, api_id, api_hash)
+        
+        tasks = [asyncio.create_task(load(session_info)) for session_info in sessions]
+        for next_done in asyncio.as_completed(tasks):
+            account, message = await next_done
+            done += 1
+            
+            # Progression de 10% à 90%, le 100% sera fait après
+            progress = 10 + int((done / total) * 80)
+            if progress_callback:
+                progress_callback(progress, message)
+            
+            if account and account.is_connected:
+                connected_accounts.append(account)
+                if len(connected_accounts) == 1 and on_first_connected:
                     try:
-                        me = await account.get_me()
-                        if me:
-                            telegram_name = me.get("full_name", account_name)
-                            if telegram_name != account_name:
-                                account.account_name = telegram_name
-                                self.session_manager.update_account_name(session_id, telegram_name)
-                        
-                        # Télécharger la photo de profil en arrière-plan
-                        try:
-                            await account.get_profile_photo_path()
-                        except Exception as photo_error:
-                            # Ne pas bloquer le chargement si la photo échoue
-                            logger.warning(f"Impossible de télécharger la photo de profil pour {account.account_name}: {photo_error}")
+                        await on_first_connected()
                     except Exception as e:
-                        logger.error(f"Erreur récupération infos Telegram: {e}")
-                    
-                    if progress_callback:
-                        progress_callback(progress, f"{account.account_name} connecté")
-                else:
-                    # Garder dans les comptes mais marquer comme non autorisé
-                    account.is_connected = False
-                    self.accounts[session_id] = account
-                    self.session_manager.update_session_status(session_id, "unauthorized")
-                    if progress_callback:
-                        progress_callback(progress, f"{account_name} non autorisé")
-                    
-            except Exception as e:
-                logger.error(f"Erreur chargement session {session_info.get('phone', 'unknown')}: {e}")
-                if progress_callback:
-                    progress_callback(progress, f"Erreur: {session_info.get('account_name', 'Compte')}")
+                        logger.error(f"Erreur affichage après la première connexion: {e}")
+        
+        # Étape différée : ne retarde ni les connexions ni l'interface
+        live_accounts = [account for account in connected_accounts if account.is_live]
+        if live_accounts:
+            self._details_task = asyncio.create_task(
+                self._load_accounts_details(live_accounts, concurrency)
+            )
+        self.start_idle_monitor()
         
         # Progression finale
         if progress_callback:
             progress_callback(90, "Finalisation...")
     
+    async def _load_session(
+        self,
+        session_info: Dict,
+        api_id: int,
+        api_hash: str
+    ) -> Tuple[Optional[TelegramAccount], str]:
+        """
+        Connecte une session enregistrée (sans appel get_me ni photo).
+        
+        Args:
+            session_info: Entrée de l'index des sessions
+            api_id: ID de l'API Telegram
+            api_hash: Hash de l'API Telegram
+            
+        Returns:
+            Tuple[Optional[TelegramAccount], str]: (compte ou None, message de progression)
+        """
+        account_name = session_info.get("account_name", session_info.get("phone", "Compte"))
+        try:
+            session_id = session_info["session_id"]
+            
+            # Vérifier si le fichier de session existe (chiffré ou non)
+            # Note: TelegramClient ajoute .session, donc on cherche plusieurs variantes
+            session_base = self.session_manager.sessions_dir / session_id
+            possible_files = [
+                session_base.with_suffix('.enc.session'),  # Chiffré par Telethon
+                session_base.with_suffix('.enc'),           # Chiffré pur
+                session_base.with_suffix('.session'),       # Non chiffré
+            ]
+            
+            # Vérifier si au moins un fichier existe
+            session_exists = any(f.exists() for f in possible_files)
+            
+            if not session_exists:
+                self.session_manager.delete_session(session_id)
+                return None, f"Session introuvable : {account_name}"
+            
+            # SÉCURITÉ : Toujours utiliser les credentials depuis .env
+            # Ne JAMAIS lire depuis session_info (legacy)
+            account = TelegramAccount(
+                session_id,
+                session_info["phone"],
+                api_id,
+                api_hash,
+                session_info.get("account_name")
+            )
+            
+            # Créer le client avec le chemin de session (déchiffré automatiquement si nécessaire)
+            session_file_str = self.session_manager.get_session_for_client(session_id)
+            account.client = TelegramClient(session_file_str, account.api_id, account.api_hash)
+            
+            # À la demande : compte autorisé laissé en veille jusqu'à sa première utilisation
+            policy = self.session_manager.get_account_settings(session_id)["connection_policy"]
+            if policy == CONNECTION_POLICY_ON_DEMAND and session_info.get("status") == "active":
+                account.is_connected = True
+                account.is_parked = True
+                self.accounts[session_id] = account
+                return account, f"{account.account_name} en veille (connexion à la demande)"
+            
+            # Tenter de se connecter
+            connected = await account.connect()
+            self.accounts[session_id] = account
+            if connected:
+                return account, f"{account.account_name} connecté"
+            
+            # Garder dans les comptes mais marquer comme non autorisé
+            account.is_connected = False
+            self.session_manager.update_session_status(session_id, "unauthorized")
+            return account, f"{account_name} non autorisé"
+            
+        except Exception as e:
+            logger.error(f"Erreur chargement session {session_info.get('phone', 'unknown')}: {e}")
+            return None, f"Erreur: {session_info.get('account_name', 'Compte')}"
+    
+    async def _load_accounts_details(self, accounts: List[TelegramAccount], concurrency: int) -> None:
+        """
+        Récupère le nom Telegram et la photo de profil des comptes connectés.
+        
+        Args:
+            accounts: Comptes connectés au démarrage
+            concurrency: Nombre maximum de comptes traités simultanément
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def load_details(account: TelegramAccount) -> None:
+            async with semaphore:
+                try:
+                    me = await account.get_me()
+                    if me:
+                        telegram_name = me.get("full_name", account.account_name)
+                        if telegram_name != account.account_name:
+                            account.account_name = telegram_name
+                            self.session_manager.update_account_name(account.session_id, telegram_name)
+                    
+                    try:
+                        await account.get_profile_photo_path()
+                    except Exception as photo_error:
+                        # Ne pas bloquer les autres comptes si la photo échoue
+                        logger.warning(f"Impossible de télécharger la photo de profil pour {account.account_name}: {photo_error}")
+                except Exception as e:
+                    logger.error(f"Erreur récupération infos Telegram: {e}")
+        
+        await asyncio.gather(*(load_details(account) for account in accounts))
+    
+    # ==================== POLITIQUE DE CONNEXION ====================
+    
+    def _idle_timeout(self, session_id: str) -> Optional[float]:
+        """
+        Délai d'inactivité avant mise en veille d'un compte.
+        
+        Returns:
+            Optional[float]: Secondes, ou None si le compte reste toujours connecté
+        """
+        settings = self.session_manager.get_account_settings(session_id)
+        policy = settings["connection_policy"]
+        if policy == CONNECTION_POLICY_ON_DEMAND:
+            return ON_DEMAND_IDLE_SECONDS
+        if policy == CONNECTION_POLICY_IDLE:
+            return settings["idle_timeout_minutes"] * 60
+        return None
+    
+    async def set_connection_policy(
+        self,
+        session_id: str,
+        policy: str,
+        idle_timeout_minutes: Optional[int] = None
+    ) -> bool:
+        """
+        Change la politique de connexion d'un compte.
+        
+        Args:
+            session_id: ID de la session
+            policy: "always", "on_demand" ou "idle"
+            idle_timeout_minutes: Délai avant mise en veille (politique "idle")
+            
+        Returns:
+            bool: True si réussi
+        """
+        if not self.session_manager.update_connection_policy(session_id, policy, idle_timeout_minutes):
+            return False
+        
+        # Toujours connecté : réveiller tout de suite un compte en veille
+        account = self.accounts.get(session_id)
+        if account and policy == CONNECTION_POLICY_ALWAYS and account.is_parked:
+            await account.ensure_connected()
+        return True
+    
+    def start_idle_monitor(self) -> None:
+        """Lance la mise en veille périodique des comptes inactifs (une seule tâche)."""
+        if self._idle_task is None or self._idle_task.done():
+            self._idle_task = asyncio.create_task(self._idle_monitor_loop())
+    
+    async def _idle_monitor_loop(self) -> None:
+        """Boucle de mise en veille (voir park_idle_accounts)."""
+        while True:
+            await asyncio.sleep(IDLE_CHECK_INTERVAL_SECONDS)
+            try:
+                await self.park_idle_accounts()
+            except Exception as e:
+                logger.error(f"Erreur mise en veille des comptes inactifs: {e}")
+    
+    async def park_idle_accounts(self) -> int:
+        """
+        Met en veille les comptes inactifs au-delà de leur délai.
+        
+        Un compte utilisé par une opération longue (scan, campagne) n'est
+        jamais mis en veille.
+        
+        Returns:
+            int: Nombre de comptes mis en veille
+        """
+        now = time.time()
+        parked = 0
+        for session_id, account in list(self.accounts.items()):
+            timeout = self._idle_timeout(session_id)
+            if timeout is None or not account.is_live or account.is_busy:
+                continue
+            if now - account.last_used >= timeout and await account.park():
+                parked += 1
+        return parked
+    
+    def get_connection_stats(self) -> Dict:
+        """
+        Compte les connexions ouvertes et les comptes en veille.
+        
+        Returns:
+            Dict: live (connexion ouverte), parked (en veille), offline (non autorisés), total
+        """
+        live = sum(1 for account in self.accounts.values() if account.is_live)
+        parked = sum(1 for account in self.accounts.values() if account.is_connected and not account.is_live)
+        return {
+            'live': live,
+            'parked': parked,
+            'offline': len(self.accounts) - live - parked,
+            'total': len(self.accounts),
+        }
+    
     def get_account(self, session_id: str) -> Optional[TelegramAccount]:
         """
         Récupère un compte par son ID.
@@ -235,26 +411,24 @@ class TelegramManager:
         """
         return self.accounts.get(session_id)
     
-    def list_accounts(self, reload_settings: bool = True) -> List[Dict]:
+    def list_accounts(self) -> List[Dict]:
         """
         Liste tous les comptes.
         
-        Args:
-            reload_settings: Si True, recharge les settings depuis le fichier
+        Les settings viennent de l'index partagé, relu seulement si le
+        fichier a changé.
         
         Returns:
             List[Dict]: Liste des comptes avec leurs informations
         """
-        # Recharger l'index si demandé pour avoir les settings à jour
-        if reload_settings:
-            self.session_manager.sessions_index = self.session_manager._load_index()
-        
         return [
             {
                 "session_id": acc.session_id,
                 "account_name": acc.account_name,
                 "phone": acc.phone,
                 "is_connected": acc.is_connected,
+                "is_live": acc.is_live,
+                "last_used": acc.last_used,
                 "settings": self.session_manager.get_account_settings(acc.session_id)
             }
             for acc in self.accounts.values()
@@ -284,9 +458,19 @@ class TelegramManager:
             del self.accounts[session_id]
         
         self.session_manager.delete_session(session_id)
+        get_rate_limiter().forget_account(session_id)
+        
+        # Cache local du compte (fichier supprimé en stockage par compte)
+        try:
+            await get_async_db().delete_session(session_id)
+        except Exception as e:
+            logger.error(f"Erreur suppression du cache de {session_id}: {e}")
     
     async def disconnect_all(self) -> None:
         """Déconnecte tous les comptes."""
+        for task in (self._details_task, self._idle_task):
+            if task and not task.done():
+                task.cancel()
         for account in self.accounts.values():
             await account.disconnect()
     
@@ -0,0 +1,56 @@
+"""
+Résultat structuré d'un envoi de message Telegram.
+"""
+from dataclasses import dataclass
+from enum import Enum
+from typing import Final, FrozenSet, Optional
+
+
+class SendStatus(Enum):
+    """Issue d'un envoi."""
+    OK = "ok"
+    PERMISSION_DENIED = "permission_denied"  # Écriture interdite : groupe à exclure
+    FLOOD_WAIT = "flood_wait"  # FloodWait sur le compte (méthode d'envoi)
+    SLOW_MODE = "slow_mode"  # Mode lent : attente limitée au groupe
+    NOT_CONNECTED = "not_connected"
+    ERROR = "error"
+
+
+# Erreurs RPC signifiant que le compte ne peut pas écrire dans le groupe
+PERMISSION_RPC_ERRORS: Final[FrozenSet[str]] = frozenset({
+    'CHAT_WRITE_FORBIDDEN',
+    'CHAT_ADMIN_REQUIRED',
+    'CHAT_RESTRICTED',
+    'CHAT_SEND_PLAIN_FORBIDDEN',
+    'CHAT_SEND_MEDIA_FORBIDDEN',
+    'CHAT_SEND_PHOTOS_FORBIDDEN',
+    'CHAT_SEND_DOCS_FORBIDDEN',
+    'CHAT_GUEST_SEND_FORBIDDEN',
+    'CHANNEL_PRIVATE',
+    'USER_BANNED_IN_CHANNEL',
+    'TOPIC_CLOSED',
+})
+
+
+@dataclass(frozen=True)
+class SendResult:
+    """
+    Résultat d'un envoi : statut, attente imposée par Telegram et nom de
+    l'erreur RPC, pour classer les échecs sans analyser le message d'erreur.
+    """
+    status: SendStatus
+    error: str = ""
+    wait_seconds: int = 0
+    rpc_error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return self.status is SendStatus.OK
+
+    @property
+    def is_flood(self) -> bool:
+        """Attente imposée (compte ou groupe) : l'envoi peut être réessayé."""
+        return self.status in (SendStatus.FLOOD_WAIT, SendStatus.SLOW_MODE)
+
+
+SEND_OK: Final[SendResult] = SendResult(SendStatus.OK)
@@ -0,0 +1,512 @@
+"""
+Façade asynchrone de la base de données locale.
+
+Les écritures sont exécutées par un thread écrivain unique, propriétaire de
+la connexion d'écriture, qui consomme une file de requêtes. Les lectures
+passent par un petit pool de connexions WAL en lecture seule. Aucun appel
+SQLite ne bloque donc la boucle d'événements NiceGUI/Telethon.
+
+En mode par compte (cache.storage_mode = "sharded"), le store est un
+ShardedTelegramDatabase qui possède un écrivain par compte : la façade lui
+délègue alors l'aiguillage des écritures (voir database.sharded_db).
+"""
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from database.telegram_db import TelegramDatabase, get_telegram_db
+from utils.config import get_config
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# Nombre de connexions en lecture seule du pool
+DEFAULT_READ_POOL_SIZE = 3
+
+
+class DatabaseWriter(threading.Thread):
+    """Thread unique qui exécute, dans l'ordre, les écritures soumises."""
+
+    def __init__(self):
+        """Initialise le thread écrivain (démarré par l'appelant)."""
+        super().__init__(name="telegram-db-writer", daemon=True)
+        self._queue: queue.Queue = queue.Queue()
+
+    def run(self) -> None:
+        """Boucle de traitement de la file (s'arrête sur None)."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            func, args, kwargs, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """
+        Place un appel dans la file du thread écrivain.
+
+        Args:
+            func: Fonction à exécuter sur le thread écrivain
+            *args: Arguments positionnels
+            **kwargs: Arguments nommés
+
+        Returns:
+            Future: Résultat de l'appel
+        """
+        future: Future = Future()
+        self._queue.put((func, args, kwargs, future))
+        return future
+
+    def is_current_thread(self) -> bool:
+        """True si l'appelant s'exécute sur le thread écrivain."""
+        return threading.current_thread() is self
+
+    def pending(self) -> int:
+        """Nombre approximatif de requêtes en attente."""
+        return self._queue.qsize()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Vide la file puis arrête le thread."""
+        self._queue.put(None)
+        self.join(timeout)
+
+
+class AsyncTelegramDatabase:
+    """
+    Façade awaitable de TelegramDatabase.
+
+    L'API synchrone de TelegramDatabase reste utilisable : une fois le thread
+    écrivain attaché, ses appels sont eux aussi sérialisés par la file, ce qui
+    permet une migration progressive des appelants.
+    """
+
+    def __init__(
+        self,
+        store: TelegramDatabase,
+        read_pool_size: int = DEFAULT_READ_POOL_SIZE
+    ):
+        """
+        Initialise la façade et démarre le thread écrivain.
+
+        Args:
+            store: Base de données propriétaire de la connexion d'écriture
+                   (ou ShardedTelegramDatabase, qui gère ses propres écrivains)
+            read_pool_size: Nombre de connexions de lecture (0 = lectures sur l'écrivain)
+        """
+        self.store = store
+        self.is_sharded = getattr(store, 'is_sharded', False)
+
+        self._writer: Optional[DatabaseWriter] = None
+        self._readers: queue.Queue = queue.Queue()
+        self._read_executor: Optional[ThreadPoolExecutor] = None
+        # Fin des migrations de schéma : les lectures du pool l'attendent
+        self._migrated: Optional[Future] = None
+
+        if self.is_sharded:
+            # Lectures multi-comptes sur la connexion ATTACH du routeur,
+            # lectures d'un compte sur l'écrivain de ce compte
+            self._read_executor = ThreadPoolExecutor(
+                max_workers=max(read_pool_size, 1),
+                thread_name_prefix="telegram-db-reader"
+            )
+            self._migrated = store.migrated
+            logger.info("Base de données asynchrone prête (une base par compte)")
+            return
+
+        self._writer = DatabaseWriter()
+        self._writer.start()
+        store.attach_writer(self._writer)
+
+        # Migrations de schéma en tête de file : exécutées hors boucle
+        # d'événements, les écritures suivantes attendent leur fin et
+        # les lectures du pool aussi (schéma à moitié migré sinon)
+        self._migrated = self._writer.submit(store.migrate)
+        self._migrated.add_done_callback(self._on_migrated)
+
+        # Une base en mémoire n'est pas partageable : tout passe par l'écrivain
+        if read_pool_size > 0 and not store.is_memory:
+            for _ in range(read_pool_size):
+                self._readers.put(TelegramDatabase(str(store.db_path), read_only=True))
+            self._read_executor = ThreadPoolExecutor(
+                max_workers=read_pool_size,
+                thread_name_prefix="telegram-db-reader"
+            )
+
+        logger.info(f"Base de données asynchrone prête ({read_pool_size} lecteur(s))")
+
+    @staticmethod
+    def _on_migrated(future: Future) -> None:
+        """Journalise l'échec éventuel des migrations."""
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Erreur migration du schéma : {error}")
+
+    # ==================== EXÉCUTION ====================
+
+    async def _write(self, method: str, *args, **kwargs):
+        """Exécute une méthode du store sur le thread écrivain."""
+        if self.is_sharded:
+            return await asyncio.wrap_future(self.store.submit(method, *args, **kwargs))
+
+        future = self._writer.submit(getattr(self.store, method), *args, **kwargs)
+        return await asyncio.wrap_future(future)
+
+    async def _read(self, method: str, *args, **kwargs):
+        """Exécute une méthode de lecture sur une connexion du pool."""
+        if self._read_executor is None:
+            return await self._write(method, *args, **kwargs)
+
+        if self._migrated is not None and not self._migrated.done():
+            try:
+                await asyncio.wrap_future(self._migrated)
+            except Exception:
+                pass  # Échec déjà journalisé par _on_migrated
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._read_executor,
+            lambda: self._run_read(method, args, kwargs)
+        )
+
+    def _run_read(self, method: str, args: Tuple, kwargs: Dict):
+        """Emprunte un lecteur du pool le temps de la requête."""
+        if self.is_sharded:
+            return getattr(self.store, method)(*args, **kwargs)
+
+        reader = self._readers.get()
+        try:
+            return getattr(reader, method)(*args, **kwargs)
+        finally:
+            self._readers.put(reader)
+
+    # ==================== CONVERSATIONS ====================
+
+    async def get_conversations(
+        self,
+        session_ids: List[str],
+        include_groups: bool = False,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """Voir TelegramDatabase.get_conversations."""
+        return await self._read('get_conversations', session_ids, include_groups, limit)
+
+    async def get_conversation_by_id(self, entity_id: int, session_id: str) -> Optional[Dict]:
+        """Voir TelegramDatabase.get_conversation_by_id."""
+        return await self._read('get_conversation_by_id', entity_id, session_id)
+
+    async def save_conversations(self, session_id: str, conversations: List[Dict]) -> int:
+        """Voir TelegramDatabase.save_conversations."""
+        return await self._write('save_conversations', session_id, conversations)
+
+    async def update_conversation_last_message(
+        self,
+        entity_id: int,
+        session_id: str,
+        message_text: str,
+        message_date: datetime,
+        from_me: bool = False
+    ) -> None:
+        """Voir TelegramDatabase.update_conversation_last_message."""
+        await self._write(
+            'update_conversation_last_message',
+            entity_id, session_id, message_text, message_date, from_me
+        )
+
+    async def mark_conversation_opened(self, entity_id: int, session_id: str) -> None:
+        """Voir TelegramDatabase.mark_conversation_opened."""
+        await self._write('mark_conversation_opened', entity_id, session_id)
+
+    async def mark_history_complete(self, entity_id: int, session_id: str) -> None:
+        """Voir TelegramDatabase.mark_history_complete."""
+        await self._write('mark_history_complete', entity_id, session_id)
+
+    async def is_history_complete(self, entity_id: int, session_id: str) -> bool:
+        """Voir TelegramDatabase.is_history_complete."""
+        return await self._read('is_history_complete', entity_id, session_id)
+
+    # ==================== MESSAGES ====================
+
+    async def get_messages(
+        self,
+        chat_id: int,
+        session_id: str,
+        limit: int = 50,
+        offset: int = 0
+    ) -> List[Dict]:
+        """Voir TelegramDatabase.get_messages."""
+        return await self._read('get_messages', chat_id, session_id, limit, offset)
+
+    async def get_messages_before(
+        self,
+        chat_id: int,
+        session_id: str,
+        before: Optional[Tuple[datetime, int]] = None,
+        limit: int = 50
+    ) -> List[Dict]:
+        """Voir TelegramDatabase.get_messages_before."""
+        return await self._read('get_messages_before', chat_id, session_id, before, limit)
+
+    async def get_messages_after(
+        self,
+        chat_id: int,
+        session_id: str,
+        after: Optional[Tuple[datetime, int]] = None,
+        limit: int = 50
+    ) -> List[Dict]:
+        """Voir TelegramDatabase.get_messages_after."""
+        return await self._read('get_messages_after', chat_id, session_id, after, limit)
+
+    async def get_message_count(self, chat_id: int, session_id: str) -> int:
+        """Voir TelegramDatabase.get_message_count."""
+        return await self._read('get_message_count', chat_id, session_id)
+
+    async def save_messages(self, session_id: str, chat_id: int, messages: List[Dict]) -> int:
+        """Voir TelegramDatabase.save_messages."""
+        return await self._write('save_messages', session_id, chat_id, messages)
+
+    async def apply_chat_updates(self, updates: List) -> List:
+        """Voir TelegramDatabase.apply_chat_updates."""
+        return await self._write('apply_chat_updates', updates)
+
+    # ==================== RÉTENTION ====================
+
+    async def get_retention_candidates(self, keep_messages: int, inactive_before: Optional[int]) -> Dict:
+        """Voir TelegramDatabase.get_retention_candidates."""
+        return await self._read('get_retention_candidates', keep_messages, inactive_before)
+
+    async def prune_chat_messages(self, chat_id: int, session_id: str, keep: int, batch_size: int) -> int:
+        """Voir TelegramDatabase.prune_chat_messages."""
+        return await self._write('prune_chat_messages', chat_id, session_id, keep, batch_size)
+
+    async def incremental_vacuum(self, pages: int) -> int:
+        """Voir TelegramDatabase.incremental_vacuum."""
+        return await self._write('incremental_vacuum', pages)
+
+    async def is_auto_vacuum_pending(self) -> bool:
+        """Voir TelegramDatabase.is_auto_vacuum_pending."""
+        return await self._read('is_auto_vacuum_pending')
+
+    async def convert_auto_vacuum(self) -> bool:
+        """Voir TelegramDatabase.convert_auto_vacuum."""
+        return await self._write('convert_auto_vacuum')
+
+    async def get_storage_stats(self) -> Dict:
+        """Voir TelegramDatabase.get_storage_stats."""
+        return await self._read('get_storage_stats')
+
+    # ==================== RECHERCHE ====================
+
+    async def search(
+        self,
+        query: str,
+        session_ids: List[str],
+        limit: int = 50,
+        cursor: Optional[int] = None
+    ) -> Dict:
+        """Voir TelegramDatabase.search."""
+        return await self._read('search', query, session_ids, limit, cursor)
+
+    # ==================== GROUPES / CANAUX ====================
+
+    async def save_dialogs(self, session_id: str, dialogs: List[Dict]) -> int:
+        """Voir TelegramDatabase.save_dialogs."""
+        return await self._write('save_dialogs', session_id, dialogs)
+
+    async def get_dialogs(self, session_id: str) -> List[Dict]:
+        """Voir TelegramDatabase.get_dialogs."""
+        return await self._read('get_dialogs', session_id)
+
+    async def get_dialogs_top_date(self, session_id: str) -> Optional[int]:
+        """Voir TelegramDatabase.get_dialogs_top_date."""
+        return await self._read('get_dialogs_top_date', session_id)
+
+    async def mark_dialogs_left(self, session_id: str, chat_ids: List[int], keep_only: bool = False) -> int:
+        """Voir TelegramDatabase.mark_dialogs_left."""
+        return await self._write('mark_dialogs_left', session_id, chat_ids, keep_only)
+
+    # ==================== MESSAGES PROGRAMMÉS ====================
+
+    async def save_scheduled_messages(self, session_id: str, messages: List[Dict]) -> int:
+        """Voir TelegramDatabase.save_scheduled_messages."""
+        return await self._write('save_scheduled_messages', session_id, messages)
+
+    async def replace_scheduled_chat(
+        self,
+        session_id: str,
+        chat_id: int,
+        messages: List[Dict],
+        history_hash: int
+    ) -> int:
+        """Voir TelegramDatabase.replace_scheduled_chat."""
+        return await self._write('replace_scheduled_chat', session_id, chat_id, messages, history_hash)
+
+    async def get_scheduled_messages(self, session_id: str, chat_id: Optional[int] = None) -> List[Dict]:
+        """Voir TelegramDatabase.get_scheduled_messages."""
+        return await self._read('get_scheduled_messages', session_id, chat_id)
+
+    async def update_scheduled_messages(
+        self,
+        session_id: str,
+        chat_id: int,
+        message_ids: List[int],
+        text: Optional[str] = None,
+        date: Optional[datetime] = None
+    ) -> int:
+        """Voir TelegramDatabase.update_scheduled_messages."""
+        return await self._write('update_scheduled_messages', session_id, chat_id, message_ids, text, date)
+
+    async def get_scheduled_hashes(self, session_id: str) -> Dict[int, int]:
+        """Voir TelegramDatabase.get_scheduled_hashes."""
+        return await self._read('get_scheduled_hashes', session_id)
+
+    async def delete_scheduled_messages(
+        self,
+        session_id: str,
+        chat_id: int,
+        message_ids: Optional[List[int]] = None
+    ) -> int:
+        """Voir TelegramDatabase.delete_scheduled_messages."""
+        return await self._write('delete_scheduled_messages', session_id, chat_id, message_ids)
+
+    async def prune_scheduled_chats(self, session_id: str, chat_ids: List[int]) -> int:
+        """Voir TelegramDatabase.prune_scheduled_chats."""
+        return await self._write('prune_scheduled_chats', session_id, chat_ids)
+
+    # ==================== PHOTOS / ENTITÉS / MÉTADONNÉES ====================
+
+    async def get_profile_photo(self, entity_id: int) -> Optional[str]:
+        """Voir TelegramDatabase.get_profile_photo."""
+        return await self._read('get_profile_photo', entity_id)
+
+    async def save_profile_photo(
+        self,
+        entity_id: int,
+        photo_path: str,
+        file_size: Optional[int] = None,
+        file_mtime: Optional[int] = None
+    ) -> None:
+        """Voir TelegramDatabase.save_profile_photo."""
+        await self._write('save_profile_photo', entity_id, photo_path, file_size, file_mtime)
+
+    async def get_profile_photo_records(self) -> List[Tuple[str, Optional[int], Optional[int]]]:
+        """Voir TelegramDatabase.get_profile_photo_records."""
+        return await self._read('get_profile_photo_records')
+
+    async def forget_profile_photo(self, photo_path: str) -> int:
+        """Voir TelegramDatabase.forget_profile_photo."""
+        return await self._write('forget_profile_photo', photo_path)
+
+    async def save_entities(self, session_id: str, entities: List[Tuple]) -> int:
+        """Voir TelegramDatabase.save_entities."""
+        return await self._write('save_entities', session_id, entities)
+
+    async def get_entity(self, session_id: str, peer_id: int) -> Optional[Dict]:
+        """Voir TelegramDatabase.get_entity."""
+        return await self._read('get_entity', session_id, peer_id)
+
+    async def get_entities(self, session_id: str, limit: int) -> List[Dict]:
+        """Voir TelegramDatabase.get_entities."""
+        return await self._read('get_entities', session_id, limit)
+
+    async def get_last_sync_time(self, session_id: str) -> Optional[datetime]:
+        """Voir TelegramDatabase.get_last_sync_time."""
+        return await self._read('get_last_sync_time', session_id)
+
+    async def set_last_sync_time(self, session_id: str, timestamp: datetime) -> None:
+        """Voir TelegramDatabase.set_last_sync_time."""
+        await self._write('set_last_sync_time', session_id, timestamp)
+
+    # ==================== UTILITAIRES ====================
+
+    async def execute_write(self, query: str, params: Tuple = (), session_id: Optional[str] = None) -> int:
+        """Voir TelegramDatabase.execute_write."""
+        return await self._write('execute_write', query, params, session_id)
+
+    async def delete_session(self, session_id: str) -> int:
+        """Voir TelegramDatabase.delete_session (suppression du fichier en mode par compte)."""
+        return await self._write('delete_session', session_id)
+
+    async def get_stats(self) -> Dict:
+        """Voir TelegramDatabase.get_stats."""
+        return await self._read('get_stats')
+
+    async def get_unread_totals(self, session_ids: List[str]) -> Dict[str, int]:
+        """Voir TelegramDatabase.get_unread_totals."""
+        return await self._read('get_unread_totals', session_ids)
+
+    def get_queue_stats(self) -> Dict:
+        """
+        Récupère l'état de la file d'écriture et du pool de lecture.
+
+        Returns:
+            Dict: Statistiques
+        """
+        if self.is_sharded:
+            return {
+                'pending_writes': self.store.pending_writes(),
+                'idle_readers': 0,
+            }
+
+        return {
+            'pending_writes': self._writer.pending(),
+            'idle_readers': self._readers.qsize(),
+        }
+
+    def close(self) -> None:
+        """Vide la file d'écriture, arrête l'écrivain et ferme les lecteurs."""
+        if self.is_sharded:
+            self.store.close()
+        else:
+            self._writer.stop()
+            self.store.attach_writer(None)
+
+        if self._read_executor:
+            self._read_executor.shutdown(wait=True)
+            self._read_executor = None
+
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+
+        logger.info("Base de données asynchrone arrêtée")
+
+
+# Instance globale (singleton)
+_async_db_instance = None
+
+
+def get_async_db() -> AsyncTelegramDatabase:
+    """
+    Récupère l'instance globale de la façade asynchrone.
+
+    Le mode de stockage est lu dans cache.storage_mode : "single" (un seul
+    fichier, défaut) ou "sharded" (un fichier par compte).
+
+    Returns:
+        AsyncTelegramDatabase: Façade liée à get_telegram_db()
+    """
+    global _async_db_instance
+    if _async_db_instance is None:
+        store = get_telegram_db()
+        if get_config().get('cache.storage_mode', 'single') == 'sharded':
+            from database.sharded_db import ShardedTelegramDatabase
+            store = ShardedTelegramDatabase(store)
+        _async_db_instance = AsyncTelegramDatabase(store)
+    return _async_db_instance
+
+
+def close_async_db() -> None:
+    """Arrête proprement la façade globale (à appeler à la fermeture)."""
+    global _async_db_instance
+    if _async_db_instance is not None:
+        _async_db_instance.close()
+        _async_db_instance = None
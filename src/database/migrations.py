@@ -0,0 +1,294 @@
+"""
+Migrations versionnées du schéma de la base locale.
+
+La version appliquée est stockée dans la table metadata (clé
+SCHEMA_VERSION_KEY). Chaque migration est une fonction recevant la
+connexion d'écriture ; elle doit pouvoir être relancée sans effet de bord
+si elle a été interrompue (la version n'est enregistrée qu'à la fin).
+
+Pour ajouter une migration : écrire `_migration_XXX_nom(conn)` et
+l'ajouter à la fin de MIGRATIONS avec le numéro de version suivant.
+"""
+import sqlite3
+from typing import Callable, List, Optional, Tuple
+
+from database.timestamps import to_epoch_ms
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# Clé de la table metadata contenant la version du schéma
+SCHEMA_VERSION_KEY = "schema_version"
+
+# Clé de la table metadata signalant une conversion en auto_vacuum
+# incrémental à faire (VACUUM complet lancé par database.retention)
+AUTO_VACUUM_PENDING_KEY = "auto_vacuum_pending"
+
+# Lignes converties par transaction lors des reprises de données
+MIGRATION_BATCH_SIZE = 5000
+
+
+def _backfill_epoch_ms(
+    conn: sqlite3.Connection,
+    table: str,
+    column: str,
+    default: Optional[int] = None
+) -> int:
+    """
+    Convertit une colonne de dates ISO en millisecondes epoch, par lots.
+
+    Chaque lot est validé séparément : les lecteurs WAL ne sont jamais
+    bloqués et une interruption reprend là où elle s'était arrêtée.
+
+    Args:
+        conn: Connexion d'écriture
+        table: Table à convertir
+        column: Colonne de date
+        default: Valeur des dates illisibles (colonnes NOT NULL)
+
+    Returns:
+        int: Nombre de lignes converties
+    """
+    converted = 0
+    last_rowid = 0
+
+    while True:
+        rows = conn.execute(f"""
+            SELECT rowid, {column} FROM {table}
+            WHERE rowid > ?
+            ORDER BY rowid
+            LIMIT ?
+        """, (last_rowid, MIGRATION_BATCH_SIZE)).fetchall()
+
+        if not rows:
+            break
+
+        last_rowid = rows[-1][0]
+        updates = []
+        for rowid, value in rows:
+            if isinstance(value, str):
+                epoch_ms = to_epoch_ms(value)
+                updates.append((default if epoch_ms is None else epoch_ms, rowid))
+
+        if updates:
+            with conn:
+                conn.executemany(
+                    f"UPDATE {table} SET {column} = ? WHERE rowid = ?",
+                    updates
+                )
+            converted += len(updates)
+
+    return converted
+
+
+def _migration_001_epoch_timestamps(conn: sqlite3.Connection) -> None:
+    """Dates ISO -> millisecondes epoch (conversations et messages)."""
+    conversations = _backfill_epoch_ms(conn, "conversations", "last_message_date")
+    messages = _backfill_epoch_ms(conn, "messages", "date", default=0)
+    logger.info(f"Dates converties : {conversations} conversation(s), {messages} message(s)")
+
+    # Reconstruire les index (pages compactées après réécriture des dates)
+    conn.execute("REINDEX conversations")
+    conn.execute("REINDEX messages")
+    conn.execute("ANALYZE")
+
+
+def _migration_002_composite_indexes(conn: sqlite3.Connection) -> None:
+    """Index composites triés : plus de tri temporaire sur les requêtes chaudes."""
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_conversations_session_type_date
+        ON conversations(session_id, type, last_message_date DESC)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_conversations_session_date
+        ON conversations(session_id, last_message_date DESC)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_chat_date_id
+        ON messages(chat_id, session_id, date DESC, id DESC)
+    """)
+
+    # Index remplacés (préfixes des index composites ou jamais utilisés)
+    for index in (
+        "idx_conversations_session",
+        "idx_conversations_type",
+        "idx_conversations_date",
+        "idx_messages_chat",
+        "idx_messages_date",
+    ):
+        conn.execute(f"DROP INDEX IF EXISTS {index}")
+    conn.execute("ANALYZE")
+
+
+def _migration_003_photo_file_stats(conn: sqlite3.Connection) -> None:
+    """Taille et date des photos de profil (validité sans stat à chaque requête)."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(profile_photos)")}
+    for column in ("file_size", "file_mtime"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE profile_photos ADD COLUMN {column} INTEGER")
+    conn.commit()
+
+
+def _migration_004_counters(conn: sqlite3.Connection) -> None:
+    """Valeurs initiales des compteurs (ensuite tenus à jour par triggers)."""
+    with conn:
+        conn.execute("DELETE FROM counters")
+        conn.execute("""
+            INSERT INTO counters (name, session_id, value)
+            SELECT 'conversations', session_id, COUNT(*) FROM conversations GROUP BY session_id
+            UNION ALL
+            SELECT 'unread', session_id, COALESCE(SUM(unread_count), 0) FROM conversations GROUP BY session_id
+            UNION ALL
+            SELECT 'messages', session_id, COUNT(*) FROM messages GROUP BY session_id
+            UNION ALL
+            SELECT 'photos', '', COUNT(*) FROM profile_photos
+            UNION ALL
+            SELECT 'photo_bytes', '', COALESCE(SUM(file_size), 0) FROM profile_photos
+        """)
+
+
+def _migration_005_retention(conn: sqlite3.Connection) -> None:
+    """Date d'ouverture des conversations et auto_vacuum incrémental."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(conversations)")}
+    if "last_opened_at" not in columns:
+        conn.execute("ALTER TABLE conversations ADD COLUMN last_opened_at INTEGER")
+    conn.commit()
+
+    # Le mode auto_vacuum d'une base existante ne change qu'après un VACUUM
+    # complet : trop long pour le démarrage, il est seulement noté ici et
+    # fait par le job de rétention quand l'écrivain est inactif
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO metadata (key, value) VALUES (?, '1')",
+                (AUTO_VACUUM_PENDING_KEY,)
+            )
+        logger.info("Passage en auto_vacuum incrémental programmé (job de rétention)")
+
+
+def _migration_006_scheduled_mirror(conn: sqlite3.Connection) -> None:
+    """Index de lecture du miroir des messages programmés (tables créées à l'ouverture)."""
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_scheduled_session_date
+        ON scheduled_messages(session_id, date)
+    """)
+    conn.commit()
+
+
+def _migration_007_fts_rebuild(conn: sqlite3.Connection) -> None:
+    """Index plein texte des lignes déjà présentes (tables FTS créées à l'ouverture)."""
+    existing = {
+        row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('messages_fts', 'conversations_fts')"
+        )
+    }
+
+    # SQLite sans FTS5 : pas d'index, la recherche se replie sur LIKE
+    with conn:
+        if 'messages_fts' in existing:
+            conn.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+        if 'conversations_fts' in existing:
+            conn.execute("INSERT INTO conversations_fts(conversations_fts) VALUES ('rebuild')")
+
+
+def _migration_008_marked_peer_ids(conn: sqlite3.Connection) -> None:
+    """
+    Pairs enregistrés par ID marqué (-ID groupe, -100ID canal) : un
+    utilisateur et un groupe de même ID brut ne se remplacent plus.
+    """
+    # Les ID bruts sont positifs : relancer la migration est sans effet
+    with conn:
+        conn.execute("""
+            UPDATE entities SET peer_id = CASE peer_type
+                WHEN 'chat' THEN -peer_id
+                WHEN 'channel' THEN -1000000000000 - peer_id
+            END
+            WHERE peer_id > 0 AND peer_type IN ('chat', 'channel')
+        """)
+
+
+def _migration_009_deferrable_fts_triggers(conn: sqlite3.Connection) -> None:
+    """
+    Triggers plein texte des conversations suspendables pendant les gros
+    lots : supprimés ici, recréés par TelegramDatabase.migrate.
+    """
+    conn.execute("DROP TRIGGER IF EXISTS conversations_fts_ai")
+    conn.execute("DROP TRIGGER IF EXISTS conversations_fts_au")
+    conn.commit()
+
+
+def _migration_010_history_complete(conn: sqlite3.Connection) -> None:
+    """Début de l'historique en cache : plus d'appel API pour les conversations courtes."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(conversations)")}
+    if "history_complete" not in columns:
+        conn.execute("ALTER TABLE conversations ADD COLUMN history_complete BOOLEAN DEFAULT 0")
+    conn.commit()
+
+
+# Migrations ordonnées : (version, description, fonction)
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "dates en millisecondes epoch", _migration_001_epoch_timestamps),
+    (2, "index composites triés", _migration_002_composite_indexes),
+    (3, "taille et date des photos de profil", _migration_003_photo_file_stats),
+    (4, "compteurs tenus par triggers", _migration_004_counters),
+    (5, "rétention du cache et auto_vacuum incrémental", _migration_005_retention),
+    (6, "miroir des messages programmés", _migration_006_scheduled_mirror),
+    (7, "index plein texte des lignes existantes", _migration_007_fts_rebuild),
+    (8, "ID marqués des pairs enregistrés", _migration_008_marked_peer_ids),
+    (9, "triggers plein texte suspendables", _migration_009_deferrable_fts_triggers),
+    (10, "début de l'historique en cache", _migration_010_history_complete),
+]
+
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """
+    Lit la version du schéma appliquée.
+
+    Args:
+        conn: Connexion à la base
+
+    Returns:
+        int: Version (0 pour une base jamais migrée)
+    """
+    row = conn.execute(
+        "SELECT value FROM metadata WHERE key = ?", (SCHEMA_VERSION_KEY,)
+    ).fetchone()
+
+    if not row:
+        return 0
+
+    try:
+        return int(row[0])
+    except (TypeError, ValueError):
+        logger.warning(f"Version de schéma invalide : {row[0]!r}")
+        return 0
+
+
+def run_migrations(conn: sqlite3.Connection) -> int:
+    """
+    Applique, dans l'ordre, les migrations non encore appliquées.
+
+    Args:
+        conn: Connexion d'écriture
+
+    Returns:
+        int: Nombre de migrations appliquées
+    """
+    current = get_schema_version(conn)
+    pending = [m for m in MIGRATIONS if m[0] > current]
+
+    for version, description, migration in pending:
+        logger.info(f"Migration du schéma v{version} : {description}...")
+        migration(conn)
+
+        with conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO metadata (key, value, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+            """, (SCHEMA_VERSION_KEY, str(version)))
+
+        logger.info(f"Schéma migré en v{version}")
+
+    return len(pending)
@@ -0,0 +1,139 @@
+"""
+Index en mémoire des photos de profil présentes sur disque.
+
+Remplace les os.path.exists() faits pour chaque conversation affichée :
+le dossier des photos est parcouru une seule fois au démarrage (refresh),
+puis l'index est tenu à jour par les téléchargements (add). Une photo
+disparue n'est détectée qu'au moment où elle ne peut pas être affichée
+(discard).
+"""
+import os
+import threading
+from pathlib import Path
+from typing import Iterable, Optional, Set, Tuple, Union
+
+from utils.logger import get_logger
+
+logger = get_logger()
+
+PathLike = Union[str, Path]
+
+# (chemin, taille en octets, mtime en millisecondes epoch) tels que stockés en base
+PhotoRecord = Tuple[str, Optional[int], Optional[int]]
+
+
+def photo_file_stats(path: PathLike) -> Tuple[int, int]:
+    """
+    Lit la taille et la date de modification d'une photo.
+
+    Args:
+        path: Chemin du fichier
+
+    Returns:
+        Tuple[int, int]: (taille en octets, mtime en millisecondes epoch)
+
+    Raises:
+        OSError: Fichier absent ou illisible
+    """
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns // 1_000_000
+
+
+class PhotoIndex:
+    """Ensemble thread-safe des fichiers photo connus comme présents."""
+
+    def __init__(self):
+        """Initialise un index vide (voir refresh)."""
+        self._present: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path: PathLike) -> str:
+        """Normalise un chemin (sans accès disque)."""
+        return os.path.normcase(os.path.abspath(str(path)))
+
+    def __contains__(self, path: Optional[PathLike]) -> bool:
+        """True si la photo est connue comme présente (aucun accès disque)."""
+        if not path:
+            return False
+        return self._key(path) in self._present
+
+    def __len__(self) -> int:
+        """Nombre de photos connues comme présentes."""
+        return len(self._present)
+
+    def add(self, path: PathLike) -> None:
+        """Marque une photo comme présente (après téléchargement)."""
+        with self._lock:
+            self._present.add(self._key(path))
+
+    def discard(self, path: PathLike) -> None:
+        """Marque une photo comme absente (échec d'affichage)."""
+        with self._lock:
+            self._present.discard(self._key(path))
+
+    def refresh(self, photos_dir: PathLike, records: Iterable[PhotoRecord]) -> int:
+        """
+        Reconstruit l'index par un seul parcours du dossier des photos.
+
+        Un fichier dont la taille ou la date ne correspondent plus à celles
+        enregistrées au téléchargement (remplacé, tronqué) est exclu : il
+        sera téléchargé à nouveau. Les anciennes entrées sans taille sont
+        acceptées sur simple présence.
+
+        Args:
+            photos_dir: Dossier des photos
+            records: Photos enregistrées en base
+
+        Returns:
+            int: Nombre de photos présentes
+        """
+        expected = {self._key(path): (size, mtime) for path, size, mtime in records}
+        present = set()
+        stale = 0
+
+        try:
+            entries = list(os.scandir(photos_dir))
+        except OSError as e:
+            logger.warning(f"Dossier photos illisible ({photos_dir}) : {e}")
+            entries = []
+
+        for entry in entries:
+            try:
+                if not entry.is_file():
+                    continue
+                key = self._key(entry.path)
+                size, mtime = expected.get(key, (None, None))
+                if size is not None:
+                    stat = entry.stat()
+                    if stat.st_size != size or (
+                        mtime is not None and stat.st_mtime_ns // 1_000_000 != mtime
+                    ):
+                        stale += 1
+                        continue
+                present.add(key)
+            except OSError:
+                continue
+
+        with self._lock:
+            self._present = present
+
+        logger.debug(f"Index photos : {len(present)} présente(s), {stale} périmée(s)")
+        return len(present)
+
+
+# Instance globale (singleton), partagée par les connexions de lecture
+_photo_index_instance = None
+
+
+def get_photo_index() -> PhotoIndex:
+    """
+    Récupère l'index global des photos.
+
+    Returns:
+        PhotoIndex: Index (vide tant que refresh() n'a pas été appelé)
+    """
+    global _photo_index_instance
+    if _photo_index_instance is None:
+        _photo_index_instance = PhotoIndex()
+    return _photo_index_instance
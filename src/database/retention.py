@@ -0,0 +1,292 @@
+"""
+Politique de rétention du cache local et récupération d'espace.
+
+Sans purge, la table messages grossit indéfiniment (et le fichier mappé
+en mémoire avec elle). Le job de rétention, lancé en tâche de fond :
+- vide les conversations non ouvertes depuis cache.retention_inactive_days
+- ne garde que les cache.retention_messages_per_chat derniers messages
+  de chaque conversation
+Les conversations épinglées ne sont jamais purgées.
+
+Les suppressions sont faites par lots (un lot par requête du thread
+écrivain), puis les pages libérées sont rendues au système par
+PRAGMA incremental_vacuum, par petites étapes, quand la file d'écriture
+est vide. Une base créée avant la migration v5 est d'abord passée en
+auto_vacuum incrémental par un VACUUM unique, lui aussi lancé quand
+l'écrivain est inactif (ou à la demande, voir convert_auto_vacuum).
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from database.async_db import AsyncTelegramDatabase, get_async_db
+from database.timestamps import to_epoch_ms
+from utils.config import get_config
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# Valeurs par défaut (surchargées par la section "cache" de la configuration)
+DEFAULT_MESSAGES_PER_CHAT = 5000
+DEFAULT_INACTIVE_DAYS = 180
+
+# Messages supprimés par lot (une transaction du thread écrivain)
+PRUNE_BATCH_SIZE = 2000
+
+# Pages rendues au système par étape d'incremental_vacuum
+VACUUM_STEP_PAGES = 256
+
+# Pause entre deux lots/étapes et attente d'une file d'écriture vide
+STEP_PAUSE_SECONDS = 0.05
+IDLE_WAIT_SECONDS = 1.0
+
+# Intervalle des messages de progression pendant le VACUUM de conversion
+CONVERSION_LOG_SECONDS = 10.0
+
+# Premier passage après le démarrage, puis intervalle entre deux passages
+FIRST_RUN_DELAY_SECONDS = 120
+RUN_INTERVAL_HOURS = 24
+
+
+class RetentionJob:
+    """Job périodique de purge du cache et de récupération d'espace."""
+
+    def __init__(
+        self,
+        db: AsyncTelegramDatabase,
+        messages_per_chat: Optional[int] = None,
+        inactive_days: Optional[int] = None
+    ):
+        """
+        Initialise le job (démarré par start()).
+
+        Args:
+            db: Façade asynchrone de la base
+            messages_per_chat: Messages conservés par conversation
+                               (None = configuration, 0 = illimité)
+            inactive_days: Jours sans ouverture avant purge
+                           (None = configuration, 0 = désactivé)
+        """
+        self.db = db
+
+        config = get_config()
+        if messages_per_chat is None:
+            messages_per_chat = config.get('cache.retention_messages_per_chat', DEFAULT_MESSAGES_PER_CHAT)
+        if inactive_days is None:
+            inactive_days = config.get('cache.retention_inactive_days', DEFAULT_INACTIVE_DAYS)
+
+        self.messages_per_chat = messages_per_chat
+        self.inactive_days = inactive_days
+
+        self._task: Optional[asyncio.Task] = None
+
+        # Métriques du dernier passage
+        self._last_run: Optional[datetime] = None
+        self._last_duration_s = 0.0
+        self._messages_deleted = 0
+        self._chats_pruned = 0
+        self._pages_reclaimed = 0
+        self._bytes_reclaimed = 0
+        self._total_messages_deleted = 0
+        self._total_bytes_reclaimed = 0
+
+    # ==================== PLANIFICATION ====================
+
+    def start(self) -> None:
+        """Démarre les passages périodiques (à appeler depuis la boucle d'événements)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Interrompt le passage en cours (le lot en cours est terminé par l'écrivain)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        """Lance un passage après le démarrage puis à intervalle régulier."""
+        await asyncio.sleep(FIRST_RUN_DELAY_SECONDS)
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erreur rétention du cache : {e}")
+            await asyncio.sleep(RUN_INTERVAL_HOURS * 3600)
+
+    # ==================== PASSAGE ====================
+
+    async def run_once(self) -> Dict:
+        """
+        Applique la politique de rétention puis récupère l'espace libéré.
+
+        Returns:
+            Dict: Métriques du passage (voir get_stats)
+        """
+        start = time.perf_counter()
+
+        inactive_before = None
+        if self.inactive_days > 0:
+            inactive_before = to_epoch_ms(datetime.now() - timedelta(days=self.inactive_days))
+
+        candidates = await self.db.get_retention_candidates(self.messages_per_chat, inactive_before)
+
+        deleted = 0
+        for chat_id, session_id in candidates['inactive']:
+            deleted += await self._prune(chat_id, session_id, keep=0)
+        for chat_id, session_id in candidates['oversized']:
+            deleted += await self._prune(chat_id, session_id, keep=self.messages_per_chat)
+
+        await self.convert_auto_vacuum()
+        pages, page_size = await self._reclaim()
+
+        self._last_run = datetime.now()
+        self._last_duration_s = time.perf_counter() - start
+        self._messages_deleted = deleted
+        self._chats_pruned = len(candidates['inactive']) + len(candidates['oversized'])
+        self._pages_reclaimed = pages
+        self._bytes_reclaimed = pages * page_size
+        self._total_messages_deleted += deleted
+        self._total_bytes_reclaimed += self._bytes_reclaimed
+
+        stats = await self.get_stats()
+        logger.info(
+            f"Rétention du cache : {deleted} message(s) supprimé(s) dans "
+            f"{self._chats_pruned} conversation(s), "
+            f"{self._bytes_reclaimed / (1024 * 1024):.1f} Mo récupéré(s), "
+            f"base {stats['db_size_mb']:.1f} Mo ({self._last_duration_s:.1f}s)"
+        )
+        return stats
+
+    async def _prune(self, chat_id: int, session_id: str, keep: int) -> int:
+        """Supprime par lots les messages hors rétention d'une conversation."""
+        deleted = 0
+        while True:
+            count = await self.db.prune_chat_messages(chat_id, session_id, keep, PRUNE_BATCH_SIZE)
+            deleted += count
+            if count < PRUNE_BATCH_SIZE:
+                return deleted
+            await asyncio.sleep(STEP_PAUSE_SECONDS)
+
+    async def _wait_idle(self) -> None:
+        """Attend que la file d'écriture soit vide (personne d'autre n'écrit)."""
+        while self.db.get_queue_stats()['pending_writes'] > 0:
+            await asyncio.sleep(IDLE_WAIT_SECONDS)
+
+    async def convert_auto_vacuum(self, wait_idle: bool = True) -> bool:
+        """
+        Fait la conversion en auto_vacuum incrémental programmée par la
+        migration v5 (VACUUM complet, une seule fois).
+
+        Args:
+            wait_idle: Attendre une file d'écriture vide (False = action
+                       de l'utilisateur, lancée tout de suite)
+
+        Returns:
+            bool: True si la base a été réécrite
+        """
+        if not await self.db.is_auto_vacuum_pending():
+            return False
+
+        if wait_idle:
+            await self._wait_idle()
+
+        before = await self.db.get_storage_stats()
+        logger.info(
+            f"Passage en auto_vacuum incrémental : VACUUM de "
+            f"{before['db_size_mb']:.1f} Mo en cours..."
+        )
+        start = time.perf_counter()
+
+        # Le VACUUM bloque l'écrivain : progression journalisée pendant l'attente
+        conversion = asyncio.ensure_future(self.db.convert_auto_vacuum())
+        while not conversion.done():
+            await asyncio.wait({conversion}, timeout=CONVERSION_LOG_SECONDS)
+            if not conversion.done():
+                logger.info(f"VACUUM en cours ({time.perf_counter() - start:.0f}s)...")
+        converted = conversion.result()
+
+        after = await self.db.get_storage_stats()
+        logger.info(
+            f"Passage en auto_vacuum incrémental terminé en "
+            f"{time.perf_counter() - start:.1f}s : "
+            f"{before['db_size_mb']:.1f} Mo -> {after['db_size_mb']:.1f} Mo"
+        )
+        return converted
+
+    async def _reclaim(self) -> Tuple[int, int]:
+        """
+        Rend les pages libres au système, par étapes, pendant l'inactivité.
+
+        Returns:
+            Tuple[int, int]: (pages libérées, taille d'une page en octets)
+        """
+        storage = await self.db.get_storage_stats()
+        reclaimed = 0
+
+        while True:
+            # N'occuper l'écrivain que lorsque personne d'autre n'écrit
+            await self._wait_idle()
+
+            pages = await self.db.incremental_vacuum(VACUUM_STEP_PAGES)
+            reclaimed += pages
+            if pages < VACUUM_STEP_PAGES:
+                return reclaimed, storage['page_size']
+            await asyncio.sleep(STEP_PAUSE_SECONDS)
+
+    # ==================== MÉTRIQUES ====================
+
+    async def get_stats(self) -> Dict:
+        """
+        Récupère la taille de la base et les quantités purgées/récupérées.
+
+        Returns:
+            Dict: Statistiques (tailles en Mo)
+        """
+        storage = await self.db.get_storage_stats()
+        return {
+            'db_size_mb': storage['db_size_mb'],
+            'free_mb': storage['free_mb'],
+            'last_run': self._last_run.isoformat() if self._last_run else None,
+            'last_duration_s': round(self._last_duration_s, 2),
+            'messages_deleted': self._messages_deleted,
+            'chats_pruned': self._chats_pruned,
+            'pages_reclaimed': self._pages_reclaimed,
+            'reclaimed_mb': self._bytes_reclaimed / (1024 * 1024),
+            'total_messages_deleted': self._total_messages_deleted,
+            'total_reclaimed_mb': self._total_bytes_reclaimed / (1024 * 1024),
+        }
+
+
+# Instance globale (singleton)
+_retention_job_instance = None
+
+
+def get_retention_job() -> RetentionJob:
+    """
+    Récupère l'instance globale du job de rétention.
+
+    Returns:
+        RetentionJob: Job lié à get_async_db()
+    """
+    global _retention_job_instance
+    if _retention_job_instance is None:
+        _retention_job_instance = RetentionJob(get_async_db())
+    return _retention_job_instance
+
+
+def start_retention_job() -> None:
+    """Démarre le job de rétention global (au démarrage de l'application)."""
+    get_retention_job().start()
+
+
+async def stop_retention_job() -> None:
+    """Arrête le job de rétention global (à la fermeture, avant close_async_db)."""
+    if _retention_job_instance is not None:
+        await _retention_job_instance.stop()
@@ -0,0 +1,608 @@
+"""
+Stockage par compte : un fichier SQLite par session_id.
+
+ShardedTelegramDatabase garde l'API de TelegramDatabase et aiguille chaque
+appel :
+- conversations et messages d'un compte -> base du compte (shard), avec
+  son propre thread écrivain : une synchronisation lourde sur un compte
+  ne bloque plus les écritures des autres
+- photos de profil, pairs résolus et métadonnées -> base principale
+  (telegram.db)
+- lectures multi-comptes -> connexion de lecture qui attache (ATTACH) les
+  bases des comptes ; chaque lot de bases attachées est lu en une requête
+  UNION ALL dont les branches sont déjà triées, puis les lots sont
+  fusionnés (heapq.merge) sur la date
+
+Supprimer un compte revient à supprimer son fichier.
+"""
+import heapq
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from database.async_db import DatabaseWriter
+from database.photo_index import get_photo_index
+from database.telegram_db import TelegramDatabase
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# Nombre de bases attachées si la limite SQLite n'est pas lisible (défaut de SQLite)
+DEFAULT_MAX_ATTACHED = 10
+
+# Méthodes propres à un compte : position de l'argument session_id
+_SESSION_ARG = {
+    'save_conversations': 0,
+    'get_conversation_by_id': 1,
+    'update_conversation_last_message': 1,
+    'mark_conversation_opened': 1,
+    'mark_history_complete': 1,
+    'is_history_complete': 1,
+    'save_messages': 0,
+    'get_messages': 1,
+    'get_messages_before': 1,
+    'get_messages_after': 1,
+    'get_message_count': 1,
+    'prune_chat_messages': 1,
+    'save_dialogs': 0,
+    'get_dialogs': 0,
+    'get_dialogs_top_date': 0,
+    'mark_dialogs_left': 0,
+    'save_scheduled_messages': 0,
+    'replace_scheduled_chat': 0,
+    'get_scheduled_messages': 0,
+    'get_scheduled_hashes': 0,
+    'update_scheduled_messages': 0,
+    'delete_scheduled_messages': 0,
+    'prune_scheduled_chats': 0,
+}
+
+# Méthodes servies par la base principale
+_MAIN_METHODS = {
+    'save_profile_photo',
+    'get_profile_photo',
+    'has_profile_photo',
+    'get_profile_photo_records',
+    'forget_profile_photo',
+    'set_metadata',
+    'get_metadata',
+    'is_auto_vacuum_pending',
+    'convert_auto_vacuum',
+    'get_last_sync_time',
+    'set_last_sync_time',
+    'save_entities',
+    'get_entity',
+    'get_entities',
+}
+
+# Méthodes propres au routeur exécutées hors de la boucle d'événements
+_FANOUT_METHODS = {
+    'apply_chat_updates',
+    'execute_write',
+    'delete_session',
+    'incremental_vacuum',
+    'migrate',
+    'vacuum',
+}
+
+
+def _gather(futures: List[Future], combine: Callable[[List], object]) -> Future:
+    """
+    Regroupe plusieurs Future en un seul.
+
+    Args:
+        futures: Résultats attendus
+        combine: Fonction recevant la liste des résultats
+
+    Returns:
+        Future: Résultat combiné (première exception sinon)
+    """
+    result: Future = Future()
+    if not futures:
+        result.set_result(combine([]))
+        return result
+
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def on_done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        errors = [f.exception() for f in futures if f.exception() is not None]
+        if errors:
+            result.set_exception(errors[0])
+        else:
+            result.set_result(combine([f.result() for f in futures]))
+
+    for future in futures:
+        future.add_done_callback(on_done)
+    return result
+
+
+class ShardedTelegramDatabase:
+    """
+    Routeur vers une base SQLite par compte.
+
+    Utilisé par AsyncTelegramDatabase à la place d'un TelegramDatabase
+    unique (voir is_sharded et submit).
+    """
+
+    is_sharded = True
+
+    def __init__(self, main: TelegramDatabase, shards_dir: Optional[str] = None):
+        """
+        Initialise le routeur (les bases des comptes sont ouvertes à la demande).
+
+        Args:
+            main: Base principale (photos de profil, métadonnées)
+            shards_dir: Dossier des bases par compte (défaut : <dossier de main>/shards)
+        """
+        if main.is_memory:
+            raise ValueError("Le stockage par compte nécessite une base principale sur disque")
+
+        self.main = main
+        self.shards_dir = Path(shards_dir) if shards_dir else main.db_path.parent / "shards"
+        self.shards_dir.mkdir(parents=True, exist_ok=True)
+
+        self._main_writer = DatabaseWriter()
+        self._main_writer.start()
+        main.attach_writer(self._main_writer)
+        # Les lectures de la façade asynchrone attendent ces migrations
+        self.migrated: Future = self._main_writer.submit(main.migrate)
+
+        self._shards: Dict[str, Tuple[TelegramDatabase, DatabaseWriter]] = {}
+        self._shards_lock = threading.Lock()
+
+        # Méthodes qui attendent plusieurs écrivains (delete_session, migrate...)
+        self._coordinator = ThreadPoolExecutor(max_workers=2, thread_name_prefix="telegram-db-router")
+
+        # Lectures multi-comptes : main en lecture seule + bases attachées (LRU)
+        self._reader = sqlite3.connect(
+            f"{main.db_path.resolve().as_uri()}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+            timeout=60.0
+        )
+        self._reader.execute("PRAGMA busy_timeout=60000")
+        self._reader.row_factory = sqlite3.Row
+        self._reader_lock = threading.Lock()
+        self._attached: "OrderedDict[str, str]" = OrderedDict()  # session_id -> schéma
+        self._schema_counter = 0
+
+        try:
+            self.max_attached = self._reader.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        except AttributeError:  # Python < 3.11
+            self.max_attached = DEFAULT_MAX_ATTACHED
+
+        logger.info(f"Stockage par compte : {self.shards_dir} ({len(self.session_ids())} compte(s))")
+
+    # ==================== BASES DES COMPTES ====================
+
+    def shard_path(self, session_id: str) -> Path:
+        """Chemin de la base d'un compte (nom de fichier réversible)."""
+        return self.shards_dir / f"{quote(session_id, safe='')}.db"
+
+    def session_ids(self) -> List[str]:
+        """Comptes disposant d'une base (ouverte ou sur disque)."""
+        on_disk = {unquote(path.stem) for path in self.shards_dir.glob("*.db")}
+        return sorted(on_disk | set(self._shards))
+
+    def _shard(self, session_id: str) -> Tuple[TelegramDatabase, DatabaseWriter]:
+        """Ouvre (ou crée) la base d'un compte avec son thread écrivain."""
+        entry = self._shards.get(session_id)
+        if entry is not None:
+            return entry
+
+        with self._shards_lock:
+            entry = self._shards.get(session_id)
+            if entry is None:
+                shard = TelegramDatabase(str(self.shard_path(session_id)), migrate=False)
+                writer = DatabaseWriter()
+                writer.name = f"telegram-db-writer-{session_id}"
+                writer.start()
+                shard.attach_writer(writer)
+                writer.submit(shard.migrate)
+                entry = (shard, writer)
+                self._shards[session_id] = entry
+        return entry
+
+    def shard(self, session_id: str) -> TelegramDatabase:
+        """
+        Récupère la base d'un compte.
+
+        Args:
+            session_id: ID de la session
+
+        Returns:
+            TelegramDatabase: Base du compte (écritures sur son thread écrivain)
+        """
+        return self._shard(session_id)[0]
+
+    def _existing(self, session_ids: List[str]) -> List[str]:
+        """Filtre les comptes qui ont une base (une lecture ne crée pas de fichier)."""
+        return [
+            session_id for session_id in dict.fromkeys(session_ids)
+            if session_id in self._shards or self.shard_path(session_id).exists()
+        ]
+
+    # ==================== AIGUILLAGE ====================
+
+    @staticmethod
+    def _session_of(method: str, args: Tuple, kwargs: Dict) -> str:
+        """Extrait le session_id des arguments d'une méthode par compte."""
+        if 'session_id' in kwargs:
+            return kwargs['session_id']
+        return args[_SESSION_ARG[method]]
+
+    def submit(self, method: str, *args, **kwargs) -> Future:
+        """
+        Place un appel dans la file de l'écrivain concerné.
+
+        Les écritures d'un même compte restent ordonnées ; celles de comptes
+        différents s'exécutent en parallèle.
+
+        Args:
+            method: Nom de la méthode de TelegramDatabase
+            *args: Arguments positionnels
+            **kwargs: Arguments nommés
+
+        Returns:
+            Future: Résultat de l'appel
+        """
+        if method in _SESSION_ARG:
+            shard, writer = self._shard(self._session_of(method, args, kwargs))
+            return writer.submit(getattr(shard, method), *args, **kwargs)
+
+        if method in _MAIN_METHODS:
+            return self._main_writer.submit(getattr(self.main, method), *args, **kwargs)
+
+        if method == 'apply_chat_updates':
+            return self._submit_chat_updates(*args, **kwargs)
+
+        if method == 'execute_write':
+            return self._submit_execute_write(*args, **kwargs)
+
+        if method == 'incremental_vacuum':
+            return self._submit_all('incremental_vacuum', sum, *args, **kwargs)
+
+        return self._coordinator.submit(getattr(self, method), *args, **kwargs)
+
+    def _submit_all(self, method: str, combine: Callable[[List], object], *args, **kwargs) -> Future:
+        """Soumet un appel à l'écrivain de chaque compte ouvert ou sur disque."""
+        futures = []
+        for session_id in self.session_ids():
+            shard, writer = self._shard(session_id)
+            futures.append(writer.submit(getattr(shard, method), *args, **kwargs))
+        return _gather(futures, combine)
+
+    def _submit_chat_updates(self, updates: List) -> Future:
+        """Répartit les mises à jour groupées par compte (une transaction par compte)."""
+        by_session: Dict[str, List] = {}
+        for update in updates:
+            by_session.setdefault(update.session_id, []).append(update)
+
+        futures = []
+        for session_id, session_updates in by_session.items():
+            shard, writer = self._shard(session_id)
+            futures.append(writer.submit(shard.apply_chat_updates, session_updates))
+        return _gather(futures, lambda results: [update for failed in results for update in failed])
+
+    def _submit_execute_write(self, query: str, params: Tuple = (), session_id: Optional[str] = None) -> Future:
+        """Requête d'écriture : sur la base du compte, ou sur toutes à défaut."""
+        if session_id is not None:
+            shard, writer = self._shard(session_id)
+            return writer.submit(shard.execute_write, query, params)
+        return self._submit_all('execute_write', sum, query, params)
+
+    def __getattr__(self, name: str):
+        """API synchrone de TelegramDatabase pour les méthodes aiguillées."""
+        if name in _SESSION_ARG:
+            def call(*args, **kwargs):
+                return getattr(self.shard(self._session_of(name, args, kwargs)), name)(*args, **kwargs)
+            return call
+
+        if name in _MAIN_METHODS:
+            return getattr(self.main, name)
+
+        raise AttributeError(name)
+
+    def apply_chat_updates(self, updates: List) -> List:
+        """Voir TelegramDatabase.apply_chat_updates."""
+        return self._submit_chat_updates(updates).result()
+
+    def execute_write(self, query: str, params: Tuple = (), session_id: Optional[str] = None) -> int:
+        """Voir TelegramDatabase.execute_write (toutes les bases sans session_id)."""
+        return self._submit_execute_write(query, params, session_id).result()
+
+    def incremental_vacuum(self, pages: int) -> int:
+        """Voir TelegramDatabase.incremental_vacuum (chaque base des comptes)."""
+        return self._submit_all('incremental_vacuum', sum, pages).result()
+
+    def vacuum(self) -> None:
+        """Voir TelegramDatabase.vacuum (chaque base des comptes)."""
+        self._submit_all('vacuum', lambda results: None).result()
+
+    def migrate(self) -> int:
+        """Applique les migrations de la base principale et des bases des comptes."""
+        main = self._main_writer.submit(self.main.migrate)
+        return self._submit_all('migrate', sum).result() + main.result()
+
+    # ==================== LECTURES MULTI-COMPTES ====================
+
+    def _attached_batches(self, session_ids: List[str]) -> List[List[Tuple[str, str]]]:
+        """
+        Découpe les comptes en lots de bases attachables ensemble.
+
+        Args:
+            session_ids: Comptes disposant d'une base
+
+        Returns:
+            List: Lots de (schéma, session_id)
+        """
+        batches = []
+        for start in range(0, len(session_ids), self.max_attached):
+            batches.append(session_ids[start:start + self.max_attached])
+        return batches
+
+    def _attach(self, batch: List[str]) -> List[Tuple[str, str]]:
+        """
+        Attache les bases d'un lot (appelant : _reader_lock tenu).
+
+        Les bases attachées le moins récemment sont détachées si besoin.
+
+        Returns:
+            List[Tuple[str, str]]: (schéma, session_id) pour chaque compte du lot
+        """
+        for session_id in batch:
+            if session_id in self._attached:
+                self._attached.move_to_end(session_id)
+
+        missing = [session_id for session_id in batch if session_id not in self._attached]
+        while self._attached and len(self._attached) + len(missing) > self.max_attached:
+            session_id, schema = next(
+                (sid, schema) for sid, schema in self._attached.items() if sid not in batch
+            )
+            self._reader.execute(f"DETACH DATABASE {schema}")
+            del self._attached[session_id]
+
+        for session_id in missing:
+            # La base doit exister (schéma créé) avant d'être attachée en lecture seule
+            self._shard(session_id)
+            self._schema_counter += 1
+            schema = f"shard_{self._schema_counter}"
+            self._reader.execute(
+                "ATTACH DATABASE ? AS " + schema,
+                (f"{self.shard_path(session_id).resolve().as_uri()}?mode=ro",)
+            )
+            self._attached[session_id] = schema
+
+        return [(self._attached[session_id], session_id) for session_id in batch]
+
+    def _detach(self, session_id: str) -> None:
+        """Détache la base d'un compte de la connexion de lecture."""
+        with self._reader_lock:
+            schema = self._attached.pop(session_id, None)
+            if schema is not None:
+                self._reader.execute(f"DETACH DATABASE {schema}")
+
+    def get_conversations(
+        self,
+        session_ids: List[str],
+        include_groups: bool = False,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Voir TelegramDatabase.get_conversations.
+
+        Une requête UNION ALL par lot de bases attachées (branches lues dans
+        l'ordre de leur index), puis fusion des lots triés sur la date.
+        """
+        if limit is not None and (not isinstance(limit, int) or limit < 0):
+            logger.warning(f"Limite invalide ignorée: {limit}")
+            limit = None
+
+        session_ids = self._existing(session_ids)
+        if not session_ids:
+            return []
+
+        batches = []
+        with self._reader_lock:
+            for batch in self._attached_batches(session_ids):
+                arms = self._attach(batch)
+                query = TelegramDatabase._conversations_sql(
+                    [schema for schema, _ in arms], include_groups, bool(limit)
+                )
+                params = TelegramDatabase._conversations_params(
+                    [session_id for _, session_id in arms], include_groups, limit
+                )
+                batches.append(self._reader.execute(query, params).fetchall())
+
+        # Fusion k-voies : dates décroissantes, conversations sans date à la fin
+        merged = heapq.merge(
+            *batches,
+            key=lambda row: (row['last_message_date'] is None, -(row['last_message_date'] or 0))
+        )
+
+        photo_index = get_photo_index()
+        conversations = []
+        for row in merged:
+            if limit and len(conversations) >= limit:
+                break
+            conversations.append(TelegramDatabase._conversation_from_row(row, photo_index))
+
+        logger.debug(f"Récupéré {len(conversations)} conversations depuis {len(session_ids)} base(s)")
+        return conversations
+
+    def get_unread_totals(self, session_ids: List[str]) -> Dict[str, int]:
+        """Voir TelegramDatabase.get_unread_totals."""
+        totals = dict.fromkeys(session_ids, 0)
+        existing = self._existing(session_ids)
+
+        with self._reader_lock:
+            for batch in self._attached_batches(existing):
+                arms = self._attach(batch)
+                query = " UNION ALL ".join(
+                    f"SELECT session_id, value FROM {schema}.counters "
+                    f"WHERE name = 'unread' AND session_id = ?"
+                    for schema, _ in arms
+                )
+                totals.update(self._reader.execute(query, [sid for _, sid in arms]).fetchall())
+
+        return totals
+
+    def search(
+        self,
+        query: str,
+        session_ids: List[str],
+        limit: int = 50,
+        cursor: Optional[int] = None
+    ) -> Dict:
+        """
+        Voir TelegramDatabase.search.
+
+        Chaque compte classe ses résultats (bm25), les listes sont fusionnées
+        sur le rang puis la page demandée est découpée.
+        """
+        if not isinstance(limit, int) or limit <= 0:
+            logger.warning(f"Limite invalide ignorée: {limit}")
+            limit = 50
+        offset = cursor if isinstance(cursor, int) and cursor > 0 else 0
+        window = offset + limit + 1
+
+        futures = []
+        for session_id in self._existing(session_ids):
+            shard, writer = self._shard(session_id)
+            futures.append(writer.submit(shard.search, query, [session_id], window, None))
+
+        merged = list(heapq.merge(
+            *(future.result()['hits'] for future in futures),
+            key=lambda hit: hit['rank']
+        ))
+
+        hits = merged[offset:offset + limit]
+        next_cursor = offset + limit if len(merged) > offset + limit else None
+        return {'hits': hits, 'next_cursor': next_cursor}
+
+    def get_retention_candidates(self, keep_messages: int, inactive_before: Optional[int]) -> Dict:
+        """Voir TelegramDatabase.get_retention_candidates (tous les comptes)."""
+        candidates = {'inactive': [], 'oversized': []}
+        futures = []
+        for session_id in self.session_ids():
+            shard, writer = self._shard(session_id)
+            futures.append(writer.submit(shard.get_retention_candidates, keep_messages, inactive_before))
+
+        for future in futures:
+            result = future.result()
+            candidates['inactive'].extend(result['inactive'])
+            candidates['oversized'].extend(result['oversized'])
+        return candidates
+
+    def get_storage_stats(self) -> Dict:
+        """Voir TelegramDatabase.get_storage_stats (somme des bases)."""
+        futures = [self._main_writer.submit(self.main.get_storage_stats)]
+        for session_id in self.session_ids():
+            shard, writer = self._shard(session_id)
+            futures.append(writer.submit(shard.get_storage_stats))
+
+        results = [future.result() for future in futures]
+        return {
+            'page_size': results[0]['page_size'],
+            'page_count': sum(r['page_count'] for r in results),
+            'freelist_count': sum(r['freelist_count'] for r in results),
+            'db_size_mb': sum(r['db_size_mb'] for r in results),
+            'free_mb': sum(r['free_mb'] for r in results),
+            'shards': len(results) - 1,
+        }
+
+    def get_stats(self) -> Dict:
+        """Voir TelegramDatabase.get_stats (compteurs de toutes les bases)."""
+        stats = self.main.get_stats()
+
+        totals = dict.fromkeys(('conversations', 'messages', 'unread'), 0)
+        with self._reader_lock:
+            for batch in self._attached_batches(self.session_ids()):
+                arms = self._attach(batch)
+                query = " UNION ALL ".join(
+                    f"SELECT name, value FROM {schema}.counters "
+                    f"WHERE name IN ('conversations', 'messages', 'unread')"
+                    for schema, _ in arms
+                )
+                for name, value in self._reader.execute(query).fetchall():
+                    totals[name] += value
+
+        stats['conversations_count'] = totals['conversations']
+        stats['messages_count'] = totals['messages']
+        stats['unread_count'] = totals['unread']
+        stats['db_size_mb'] += sum(
+            path.stat().st_size for path in self.shards_dir.glob("*.db")
+        ) / (1024 * 1024)
+        stats['shards'] = len(self.session_ids())
+        return stats
+
+    # ==================== COMPTES ====================
+
+    def delete_session(self, session_id: str) -> int:
+        """
+        Supprime le cache d'un compte : fermeture et suppression de son fichier.
+
+        Args:
+            session_id: ID de la session
+
+        Returns:
+            int: Nombre de fichiers supprimés
+        """
+        self._detach(session_id)
+
+        with self._shards_lock:
+            entry = self._shards.pop(session_id, None)
+        if entry is not None:
+            shard, writer = entry
+            writer.stop()
+            shard.attach_writer(None)
+            shard.close()
+
+        # Métadonnées du compte (dernière synchronisation) dans la base principale
+        self._main_writer.submit(self.main.delete_session, session_id).result()
+
+        path = self.shard_path(session_id)
+        removed = 0
+        for file in (path, path.with_name(path.name + "-wal"), path.with_name(path.name + "-shm")):
+            try:
+                file.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+
+        logger.info(f"Base du compte {session_id} supprimée")
+        return removed
+
+    def pending_writes(self) -> int:
+        """Nombre approximatif d'écritures en attente (tous les écrivains)."""
+        return self._main_writer.pending() + sum(writer.pending() for _, writer in self._shards.values())
+
+    def close(self) -> None:
+        """Vide les files d'écriture, arrête les écrivains et ferme les bases des comptes."""
+        self._coordinator.shutdown(wait=True)
+
+        with self._shards_lock:
+            shards = list(self._shards.values())
+            self._shards.clear()
+        for shard, writer in shards:
+            writer.stop()
+            shard.attach_writer(None)
+            shard.close()
+
+        self._main_writer.stop()
+        self.main.attach_writer(None)
+
+        with self._reader_lock:
+            self._reader.close()
+            self._attached.clear()
+
+        logger.info(f"Stockage par compte fermé ({len(shards)} base(s))")
@@ -4,15 +4,180 @@ Inspiré de l'architecture de Telegram officiel pour des performances optimales.
 """
 import sqlite3
 import json
+import functools
+import heapq
+import re
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 from contextlib import contextmanager
 
+from database.migrations import AUTO_VACUUM_PENDING_KEY, run_migrations
+from database.photo_index import get_photo_index
+from database.timestamps import as_datetime, to_epoch_ms
 from utils.logger import get_logger
 
 logger = get_logger()
 
+# Taille des lots pour les écritures groupées (executemany)
+BULK_BATCH_SIZE = 1000
+
+# Upserts : met à jour la ligne existante au lieu de DELETE + INSERT (REPLACE).
+# Les lignes inchangées ne sont pas réécrites (resync, index FTS).
+_UPSERT_CONVERSATION_SQL = """
+    INSERT INTO conversations (
+        entity_id, session_id, title, type, username,
+        last_message, last_message_date, last_message_from_me,
+        unread_count, pinned, archived,
+        profile_photo_path, has_photo, phone, updated_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(entity_id, session_id) DO UPDATE SET
+        title = excluded.title,
+        type = excluded.type,
+        username = excluded.username,
+        last_message = excluded.last_message,
+        last_message_date = excluded.last_message_date,
+        last_message_from_me = excluded.last_message_from_me,
+        unread_count = excluded.unread_count,
+        pinned = excluded.pinned,
+        archived = excluded.archived,
+        profile_photo_path = excluded.profile_photo_path,
+        has_photo = excluded.has_photo,
+        phone = excluded.phone,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE conversations.title IS NOT excluded.title
+        OR conversations.type IS NOT excluded.type
+        OR conversations.username IS NOT excluded.username
+        OR conversations.last_message IS NOT excluded.last_message
+        OR conversations.last_message_date IS NOT excluded.last_message_date
+        OR conversations.last_message_from_me IS NOT excluded.last_message_from_me
+        OR conversations.unread_count IS NOT excluded.unread_count
+        OR conversations.pinned IS NOT excluded.pinned
+        OR conversations.archived IS NOT excluded.archived
+        OR conversations.profile_photo_path IS NOT excluded.profile_photo_path
+        OR conversations.has_photo IS NOT excluded.has_photo
+        OR conversations.phone IS NOT excluded.phone
+"""
+
+_UPSERT_MESSAGE_SQL = """
+    INSERT INTO messages (
+        id, chat_id, session_id, text, sender_id, sender_name,
+        date, from_me, has_media, media_type, media_path,
+        media_caption, reply_to, edited, views
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id, chat_id, session_id) DO UPDATE SET
+        text = excluded.text,
+        sender_id = excluded.sender_id,
+        sender_name = excluded.sender_name,
+        date = excluded.date,
+        from_me = excluded.from_me,
+        has_media = excluded.has_media,
+        media_type = excluded.media_type,
+        media_path = excluded.media_path,
+        media_caption = excluded.media_caption,
+        reply_to = excluded.reply_to,
+        edited = excluded.edited,
+        views = excluded.views
+    WHERE messages.text IS NOT excluded.text
+        OR messages.sender_id IS NOT excluded.sender_id
+        OR messages.sender_name IS NOT excluded.sender_name
+        OR messages.date IS NOT excluded.date
+        OR messages.from_me IS NOT excluded.from_me
+        OR messages.has_media IS NOT excluded.has_media
+        OR messages.media_type IS NOT excluded.media_type
+        OR messages.media_path IS NOT excluded.media_path
+        OR messages.media_caption IS NOT excluded.media_caption
+        OR messages.reply_to IS NOT excluded.reply_to
+        OR messages.edited IS NOT excluded.edited
+        OR messages.views IS NOT excluded.views
+"""
+
+# Pairs (peer) résolus : seul le access_hash est nécessaire pour adresser un pair
+_UPSERT_ENTITY_SQL = """
+    INSERT INTO entities (session_id, peer_id, peer_type, access_hash, username, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(session_id, peer_id) DO UPDATE SET
+        peer_type = excluded.peer_type,
+        access_hash = excluded.access_hash,
+        username = excluded.username,
+        updated_at = excluded.updated_at
+"""
+
+# Groupes et canaux du compte (étape de sélection des groupes)
+_UPSERT_DIALOG_SQL = """
+    INSERT INTO dialogs (
+        chat_id, session_id, title, type, username, participants_count,
+        can_send, is_admin, is_megagroup, is_broadcast, is_member,
+        top_message_date, last_seen_at
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(session_id, chat_id) DO UPDATE SET
+        title = excluded.title,
+        type = excluded.type,
+        username = excluded.username,
+        participants_count = excluded.participants_count,
+        can_send = excluded.can_send,
+        is_admin = excluded.is_admin,
+        is_megagroup = excluded.is_megagroup,
+        is_broadcast = excluded.is_broadcast,
+        is_member = excluded.is_member,
+        top_message_date = excluded.top_message_date,
+        last_seen_at = excluded.last_seen_at
+"""
+
+# Miroir des messages programmés
+_UPSERT_SCHEDULED_SQL = """
+    INSERT INTO scheduled_messages (
+        session_id, chat_id, message_id, chat_title, text, date, has_media, media_type
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(session_id, chat_id, message_id) DO UPDATE SET
+        chat_title = COALESCE(excluded.chat_title, chat_title),
+        text = excluded.text,
+        date = excluded.date,
+        has_media = excluded.has_media,
+        media_type = excluded.media_type
+"""
+
+# Recherche plein texte : marqueurs de surlignage des extraits
+SEARCH_HIGHLIGHT_START = "["
+SEARCH_HIGHLIGHT_END = "]"
+
+# Nombre maximum de messages candidats classés par requête
+SEARCH_MAX_CANDIDATES = 5000
+
+# Clé de metadata suspendant les triggers plein texte des conversations pendant
+# un gros lot (index reconstruit en une passe, voir _upsert_conversations_rebuilding_fts)
+CONVERSATIONS_FTS_DEFERRED_KEY = "conversations_fts_deferred"
+
+# Un lot d'au moins 1/FTS_REBUILD_RATIO de la table reconstruit l'index plein
+# texte au lieu de passer par les triggers (environ 10x moins cher par ligne)
+FTS_REBUILD_RATIO = 10
+
+# Branches UNION ALL par requête de get_conversations : sous les limites
+# SQLite par défaut (500 SELECT composés, 999 paramètres)
+CONVERSATIONS_MAX_ARMS = 400
+
+# Mots de la requête utilisateur (les opérateurs FTS5 sont ignorés)
+_SEARCH_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def _on_writer(method):
+    """
+    Exécute la méthode sur le thread écrivain s'il est attaché.
+    
+    Garde l'API synchrone historique comme simple façade : un appel depuis
+    un autre thread est placé dans la file du thread écrivain et attend son
+    résultat, ce qui sérialise tous les accès à la connexion d'écriture.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        writer = self._writer
+        if writer is not None and not writer.is_current_thread():
+            return writer.submit(method, self, *args, **kwargs).result()
+        return method(self, *args, **kwargs)
+    return wrapper
+
 
 class TelegramDatabase:
     """
@@ -25,14 +190,41 @@ class TelegramDatabase:
     - Métadonnées optimisées pour recherche rapide
     """
     
-    def __init__(self, db_path: str = "temp/telegram.db"):
+    def __init__(
+        self,
+        db_path: str = "temp/telegram.db",
+        read_only: bool = False,
+        migrate: bool = True
+    ):
         """
         Initialise la base de données.
         
         Args:
             db_path: Chemin vers le fichier de base de données
+            read_only: Ouvre une connexion en lecture seule (pool de lecture WAL)
+            migrate: Applique les migrations de schéma à l'ouverture
+                     (False : l'appelant lance migrate() lui-même)
         """
         self.db_path = Path(db_path)
+        self.read_only = read_only
+        # Thread écrivain (voir database.async_db), None = accès direct
+        self._writer = None
+        
+        if read_only:
+            # Lecteur WAL : ne bloque pas l'écrivain, voit les données validées
+            self.conn = sqlite3.connect(
+                f"{self.db_path.resolve().as_uri()}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+                timeout=60.0
+            )
+            self.conn.execute("PRAGMA busy_timeout=60000")
+            self.conn.row_factory = sqlite3.Row
+            self.has_fts = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'"
+            ).fetchone() is not None
+            return
+        
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         
         # Connexion avec optimisations SQLite
@@ -44,6 +236,7 @@ class TelegramDatabase:
         )
         
         # Optimisations SQLite
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")  # Nouvelle base : pages libérées par étapes
         self.conn.execute("PRAGMA journal_mode=WAL")  # Write-Ahead Logging
         self.conn.execute("PRAGMA synchronous=NORMAL")  # Performance vs sécurité
         self.conn.execute("PRAGMA temp_store=MEMORY")  # Temp en mémoire
@@ -52,11 +245,35 @@ class TelegramDatabase:
         
         self.conn.row_factory = sqlite3.Row  # Accès par nom de colonne
         
+        is_new = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'conversations'"
+        ).fetchone() is None
+        
         self._create_tables()
-        self._create_indexes()
+        if is_new:
+            self._create_indexes()
+        self._create_search_tables()
+        self._create_counters()
+        
+        if migrate:
+            self.migrate()
         
         logger.info(f"Base de données initialisée : {self.db_path}")
     
+    @property
+    def is_memory(self) -> bool:
+        """True si la base est en mémoire (non partageable entre connexions)."""
+        return str(self.db_path) == ":memory:"
+    
+    def attach_writer(self, writer) -> None:
+        """
+        Attache un thread écrivain qui devient propriétaire de la connexion.
+        
+        Args:
+            writer: Thread écrivain (None pour revenir à l'accès direct)
+        """
+        self._writer = writer
+    
     @contextmanager
     def transaction(self):
         """Context manager pour transactions."""
@@ -83,7 +300,7 @@ class TelegramDatabase:
                 type TEXT NOT NULL,
                 username TEXT,
                 last_message TEXT,
-                last_message_date TIMESTAMP,
+                last_message_date INTEGER,  -- millisecondes epoch
                 last_message_from_me BOOLEAN DEFAULT 0,
                 unread_count INTEGER DEFAULT 0,
                 pinned BOOLEAN DEFAULT 0,
@@ -91,6 +308,8 @@ class TelegramDatabase:
                 profile_photo_path TEXT,
                 has_photo BOOLEAN DEFAULT 0,
                 phone TEXT,
+                last_opened_at INTEGER,  -- millisecondes epoch (rétention du cache)
+                history_complete BOOLEAN DEFAULT 0,  -- début de l'historique en cache
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 PRIMARY KEY (entity_id, session_id)
@@ -106,7 +325,7 @@ class TelegramDatabase:
                 text TEXT,
                 sender_id INTEGER,
                 sender_name TEXT,
-                date TIMESTAMP NOT NULL,
+                date INTEGER NOT NULL,  -- millisecondes epoch
                 from_me BOOLEAN DEFAULT 0,
                 has_media BOOLEAN DEFAULT 0,
                 media_type TEXT,
@@ -126,10 +345,71 @@ class TelegramDatabase:
             CREATE TABLE IF NOT EXISTS profile_photos (
                 entity_id INTEGER PRIMARY KEY,
                 photo_path TEXT NOT NULL,
+                file_size INTEGER,  -- octets, relevé au téléchargement
+                file_mtime INTEGER,  -- millisecondes epoch, relevé au téléchargement
                 downloaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
         
+        # Table des pairs résolus (InputPeer sans appel réseau après redémarrage)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS entities (
+                session_id TEXT NOT NULL,
+                peer_id INTEGER NOT NULL,  -- ID marqué : ID utilisateur, -ID groupe, -100ID canal
+                peer_type TEXT NOT NULL,  -- 'user', 'chat' ou 'channel'
+                access_hash INTEGER,  -- NULL pour les groupes simples
+                username TEXT,
+                updated_at INTEGER NOT NULL,  -- millisecondes epoch
+                PRIMARY KEY (session_id, peer_id)
+            ) WITHOUT ROWID
+        """)
+        
+        # Table des groupes/canaux (sélection des groupes sans iter_dialogs)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS dialogs (
+                session_id TEXT NOT NULL,
+                chat_id INTEGER NOT NULL,  -- ID brut (positif) du groupe ou canal
+                title TEXT NOT NULL,
+                type TEXT NOT NULL,  -- 'group' ou 'channel'
+                username TEXT,
+                participants_count INTEGER DEFAULT 0,
+                can_send BOOLEAN DEFAULT 1,
+                is_admin BOOLEAN DEFAULT 0,
+                is_megagroup BOOLEAN DEFAULT 0,
+                is_broadcast BOOLEAN DEFAULT 0,
+                is_member BOOLEAN DEFAULT 1,  -- 0 : quitté, exclu ou absent de la liste
+                top_message_date INTEGER,  -- millisecondes epoch (tri de iter_dialogs)
+                last_seen_at INTEGER NOT NULL,  -- millisecondes epoch
+                PRIMARY KEY (session_id, chat_id)
+            ) WITHOUT ROWID
+        """)
+        
+        # Miroir local des messages programmés (page Messages programmés)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS scheduled_messages (
+                session_id TEXT NOT NULL,
+                chat_id INTEGER NOT NULL,  -- ID brut (positif) du groupe ou canal
+                message_id INTEGER NOT NULL,
+                chat_title TEXT,  -- NULL : titre lu dans dialogs
+                text TEXT,
+                date INTEGER NOT NULL,  -- millisecondes epoch (date de programmation)
+                has_media BOOLEAN DEFAULT 0,
+                media_type TEXT,
+                PRIMARY KEY (session_id, chat_id, message_id)
+            ) WITHOUT ROWID
+        """)
+        
+        # Hash Telegram de la dernière liste reçue par groupe (GetScheduledHistory)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS scheduled_chats (
+                session_id TEXT NOT NULL,
+                chat_id INTEGER NOT NULL,
+                history_hash INTEGER NOT NULL,
+                synced_at INTEGER NOT NULL,  -- millisecondes epoch
+                PRIMARY KEY (session_id, chat_id)
+            ) WITHOUT ROWID
+        """)
+        
         # Table des métadonnées (pour tracking)
         self.conn.execute("""
             CREATE TABLE IF NOT EXISTS metadata (
@@ -143,30 +423,33 @@ class TelegramDatabase:
         logger.debug("Tables créées avec succès")
     
     def _create_indexes(self):
-        """Crée les index pour optimiser les performances."""
+        """
+        Crée les index pour optimiser les performances (nouvelle base).
         
-        # Index pour conversations
-        self.conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_conversations_session 
-            ON conversations(session_id)
-        """)
+        Les bases existantes reçoivent les changements d'index par
+        database.migrations : à garder synchronisé avec la dernière migration.
+        """
+        
+        # Index pour conversations (filtre session/type + tri par date sans tri temporaire)
         self.conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_conversations_type 
-            ON conversations(type)
+            CREATE INDEX IF NOT EXISTS idx_conversations_session_type_date
+            ON conversations(session_id, type, last_message_date DESC)
         """)
         self.conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_conversations_date 
-            ON conversations(last_message_date DESC)
+            CREATE INDEX IF NOT EXISTS idx_conversations_session_date
+            ON conversations(session_id, last_message_date DESC)
         """)
         
-        # Index pour messages
+        # Index pour messages (pagination par curseur (date, id))
         self.conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_messages_chat 
-            ON messages(chat_id, session_id, date DESC)
+            CREATE INDEX IF NOT EXISTS idx_messages_chat_date_id
+            ON messages(chat_id, session_id, date DESC, id DESC)
         """)
+        
+        # Index pour le miroir des messages programmés (lecture triée par date)
         self.conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_messages_date 
-            ON messages(date DESC)
+            CREATE INDEX IF NOT EXISTS idx_scheduled_session_date
+            ON scheduled_messages(session_id, date)
         """)
         
         # Index pour recherche full-text (titre de conversation)
@@ -178,8 +461,214 @@ class TelegramDatabase:
         self.conn.commit()
         logger.debug("Index créés avec succès")
     
+    def _create_search_tables(self):
+        """
+        Crée les index plein texte FTS5 (messages et conversations).
+        
+        Tables à contenu externe : le texte n'est pas dupliqué, les index
+        sont tenus à jour par des triggers sur les tables sources. Les
+        lignes d'une base existante sont indexées par la migration v7.
+        Les triggers d'insertion et de mise à jour des conversations sont
+        suspendus pendant les gros lots (CONVERSATIONS_FTS_DEFERRED_KEY).
+        """
+        deferred = f"NOT EXISTS (SELECT 1 FROM metadata WHERE key = '{CONVERSATIONS_FTS_DEFERRED_KEY}')"
+        try:
+            self.conn.executescript(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                    text, media_caption,
+                    content='messages', content_rowid='rowid',
+                    prefix='2 3 4', tokenize='unicode61 remove_diacritics 2'
+                );
+                
+                CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5(
+                    title, username,
+                    content='conversations', content_rowid='rowid',
+                    prefix='2 3 4', tokenize='unicode61 remove_diacritics 2'
+                );
+                
+                CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+                    INSERT INTO messages_fts(rowid, text, media_caption)
+                    VALUES (new.rowid, new.text, new.media_caption);
+                END;
+                
+                CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+                    INSERT INTO messages_fts(messages_fts, rowid, text, media_caption)
+                    VALUES ('delete', old.rowid, old.text, old.media_caption);
+                END;
+                
+                CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF text, media_caption ON messages
+                WHEN old.text IS NOT new.text OR old.media_caption IS NOT new.media_caption
+                BEGIN
+                    INSERT INTO messages_fts(messages_fts, rowid, text, media_caption)
+                    VALUES ('delete', old.rowid, old.text, old.media_caption);
+                    INSERT INTO messages_fts(rowid, text, media_caption)
+                    VALUES (new.rowid, new.text, new.media_caption);
+                END;
+                
+                CREATE TRIGGER IF NOT EXISTS conversations_fts_ai AFTER INSERT ON conversations
+                WHEN {deferred}
+                BEGIN
+                    INSERT INTO conversations_fts(rowid, title, username)
+                    VALUES (new.rowid, new.title, new.username);
+                END;
+                
+                CREATE TRIGGER IF NOT EXISTS conversations_fts_ad AFTER DELETE ON conversations BEGIN
+                    INSERT INTO conversations_fts(conversations_fts, rowid, title, username)
+                    VALUES ('delete', old.rowid, old.title, old.username);
+                END;
+                
+                CREATE TRIGGER IF NOT EXISTS conversations_fts_au AFTER UPDATE OF title, username ON conversations
+                WHEN (old.title IS NOT new.title OR old.username IS NOT new.username)
+                    AND {deferred}
+                BEGIN
+                    INSERT INTO conversations_fts(conversations_fts, rowid, title, username)
+                    VALUES ('delete', old.rowid, old.title, old.username);
+                    INSERT INTO conversations_fts(rowid, title, username)
+                    VALUES (new.rowid, new.title, new.username);
+                END;
+            """)
+        except sqlite3.OperationalError as e:
+            # SQLite compilé sans FTS5 : la recherche se replie sur LIKE
+            self.has_fts = False
+            logger.warning(f"FTS5 indisponible, recherche dégradée : {e}")
+            return
+        
+        self.has_fts = True
+        
+        self.conn.commit()
+        logger.debug("Index plein texte créés avec succès")
+    
+    def _create_counters(self):
+        """
+        Crée la table des compteurs et les triggers qui la tiennent à jour.
+        
+        Conversations, messages et non lus par session, photos au global
+        (session_id vide) : les statistiques sont lues sans COUNT(*).
+        Les valeurs initiales d'une base existante sont calculées par
+        la migration v4.
+        """
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT NOT NULL,
+                session_id TEXT NOT NULL DEFAULT '',  -- '' : compteur global
+                value INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (name, session_id)
+            ) WITHOUT ROWID;
+            
+            CREATE TRIGGER IF NOT EXISTS counters_conversations_ai AFTER INSERT ON conversations BEGIN
+                INSERT INTO counters (name, session_id, value)
+                VALUES ('conversations', new.session_id, 1),
+                       ('unread', new.session_id, COALESCE(new.unread_count, 0))
+                ON CONFLICT(name, session_id) DO UPDATE SET value = value + excluded.value;
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS counters_conversations_ad AFTER DELETE ON conversations BEGIN
+                INSERT INTO counters (name, session_id, value)
+                VALUES ('conversations', old.session_id, -1),
+                       ('unread', old.session_id, -COALESCE(old.unread_count, 0))
+                ON CONFLICT(name, session_id) DO UPDATE SET value = value + excluded.value;
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS counters_conversations_au AFTER UPDATE OF unread_count ON conversations
+            WHEN old.unread_count IS NOT new.unread_count
+            BEGIN
+                INSERT INTO counters (name, session_id, value)
+                VALUES ('unread', new.session_id,
+                        COALESCE(new.unread_count, 0) - COALESCE(old.unread_count, 0))
+                ON CONFLICT(name, session_id) DO UPDATE SET value = value + excluded.value;
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS counters_messages_ai AFTER INSERT ON messages BEGIN
+                INSERT INTO counters (name, session_id, value)
+                VALUES ('messages', new.session_id, 1)
+                ON CONFLICT(name, session_id) DO UPDATE SET value = value + excluded.value;
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS counters_messages_ad AFTER DELETE ON messages BEGIN
+                INSERT INTO counters (name, session_id, value)
+                VALUES ('messages', old.session_id, -1)
+                ON CONFLICT(name, session_id) DO UPDATE SET value = value + excluded.value;
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS counters_photos_ai AFTER INSERT ON profile_photos BEGIN
+                INSERT INTO counters (name, session_id, value)
+                VALUES ('photos', '', 1),
+                       ('photo_bytes', '', COALESCE(new.file_size, 0))
+                ON CONFLICT(name, session_id) DO UPDATE SET value = value + excluded.value;
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS counters_photos_ad AFTER DELETE ON profile_photos BEGIN
+                INSERT INTO counters (name, session_id, value)
+                VALUES ('photos', '', -1),
+                       ('photo_bytes', '', -COALESCE(old.file_size, 0))
+                ON CONFLICT(name, session_id) DO UPDATE SET value = value + excluded.value;
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS counters_photos_au AFTER UPDATE OF file_size ON profile_photos
+            WHEN old.file_size IS NOT new.file_size
+            BEGIN
+                INSERT INTO counters (name, session_id, value)
+                VALUES ('photo_bytes', '', COALESCE(new.file_size, 0) - COALESCE(old.file_size, 0))
+                ON CONFLICT(name, session_id) DO UPDATE SET value = value + excluded.value;
+            END;
+        """)
+        logger.debug("Compteurs créés avec succès")
+    
+    @_on_writer
+    def migrate(self) -> int:
+        """
+        Applique les migrations de schéma en attente (voir database.migrations).
+        
+        Returns:
+            int: Nombre de migrations appliquées
+        """
+        applied = run_migrations(self.conn)
+        if applied:
+            # Objets supprimés par une migration : recréés dans leur version courante
+            self._create_search_tables()
+        return applied
+    
+    def _bulk_upsert(self, sql: str, rows: List[Tuple], label: str) -> int:
+        """
+        Écrit des lignes par lots avec executemany (une transaction par lot).
+        
+        Si un lot échoue, il est rejoué ligne par ligne pour isoler
+        la ou les lignes invalides sans perdre les autres.
+        
+        Args:
+            sql: Requête d'upsert paramétrée
+            rows: Tuples déjà normalisés
+            label: Nom de l'entité (pour les logs)
+            
+        Returns:
+            int: Nombre de lignes écrites
+        """
+        count = 0
+        
+        # Valider les écritures en attente pour qu'un rollback de lot ne les annule pas
+        self.conn.commit()
+        
+        for start in range(0, len(rows), BULK_BATCH_SIZE):
+            batch = rows[start:start + BULK_BATCH_SIZE]
+            try:
+                with self.conn:
+                    self.conn.executemany(sql, batch)
+                count += len(batch)
+            except sqlite3.Error as e:
+                logger.warning(f"Lot de {len(batch)} {label}(s) rejeté ({e}), repli ligne par ligne")
+                for row in batch:
+                    try:
+                        with self.conn:
+                            self.conn.execute(sql, row)
+                        count += 1
+                    except sqlite3.Error as row_error:
+                        logger.error(f"Erreur sauvegarde {label} {row[0]}: {row_error}")
+        
+        return count
+    
     # ==================== CONVERSATIONS ====================
     
+    @_on_writer
     def save_conversations(self, session_id: str, conversations: List[Dict]) -> int:
         """
         Sauvegarde ou met à jour les conversations.
@@ -194,46 +683,87 @@ class TelegramDatabase:
         if not conversations:
             return 0
         
-        count = 0
-        
+        rows = []
         for conv in conversations:
             try:
-                # Convertir datetime en string ISO pour SQLite
-                last_msg_date = conv.get('last_message_date')
-                if last_msg_date and isinstance(last_msg_date, datetime):
-                    last_msg_date = last_msg_date.isoformat()
-                
-                self.conn.execute("""
-                    INSERT OR REPLACE INTO conversations (
-                        entity_id, session_id, title, type, username,
-                        last_message, last_message_date, last_message_from_me,
-                        unread_count, pinned, archived,
-                        profile_photo_path, has_photo, phone, updated_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                """, (
-                    conv['entity_id'],
-                    session_id,
-                    conv.get('title', 'Sans nom'),
-                    conv.get('type', 'user'),
-                    conv.get('username'),
-                    conv.get('last_message', ''),
-                    last_msg_date,
-                    conv.get('last_message_from_me', False),
-                    conv.get('unread_count', 0),
-                    conv.get('pinned', False),
-                    conv.get('archived', False),
-                    conv.get('profile_photo'),
-                    conv.get('has_photo', False),
-                    conv.get('phone')
-                ))
-                count += 1
+                rows.append(self._conversation_row(session_id, conv))
             except Exception as e:
                 logger.error(f"Erreur sauvegarde conversation {conv.get('title')}: {e}")
         
-        self.conn.commit()
+        if self.has_fts and len(rows) * FTS_REBUILD_RATIO >= self._conversations_total() + len(rows):
+            count = self._upsert_conversations_rebuilding_fts(rows)
+        else:
+            count = self._bulk_upsert(_UPSERT_CONVERSATION_SQL, rows, "conversation")
         logger.debug(f"Sauvegardé {count} conversations pour session {session_id}")
         return count
     
+    def _conversations_total(self) -> int:
+        """Nombre de conversations, toutes sessions (table counters, sans COUNT(*))."""
+        return self.conn.execute(
+            "SELECT COALESCE(SUM(value), 0) FROM counters WHERE name = 'conversations'"
+        ).fetchone()[0]
+    
+    def _upsert_conversations_rebuilding_fts(self, rows: List[Tuple]) -> int:
+        """
+        Gros lot de conversations : triggers plein texte suspendus, puis
+        index reconstruit en une passe, le tout dans une seule transaction.
+        
+        Si la transaction échoue, repli sur _bulk_upsert (triggers actifs).
+        
+        Args:
+            rows: Tuples de _UPSERT_CONVERSATION_SQL
+            
+        Returns:
+            int: Nombre de conversations écrites
+        """
+        self.conn.commit()
+        
+        try:
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO metadata (key, value) VALUES (?, '1')",
+                    (CONVERSATIONS_FTS_DEFERRED_KEY,)
+                )
+                self.conn.executemany(_UPSERT_CONVERSATION_SQL, rows)
+                self.conn.execute(
+                    "DELETE FROM metadata WHERE key = ?", (CONVERSATIONS_FTS_DEFERRED_KEY,)
+                )
+                self.conn.execute("INSERT INTO conversations_fts(conversations_fts) VALUES ('rebuild')")
+            return len(rows)
+        except sqlite3.Error as e:
+            logger.warning(f"Lot de {len(rows)} conversation(s) rejeté ({e}), repli par lots")
+            return self._bulk_upsert(_UPSERT_CONVERSATION_SQL, rows, "conversation")
+    
+    @staticmethod
+    def _conversation_row(session_id: str, conv: Dict) -> Tuple:
+        """
+        Normalise une conversation en tuple prêt pour executemany.
+        
+        Args:
+            session_id: ID de la session
+            conv: Conversation (format API)
+            
+        Returns:
+            Tuple: Valeurs dans l'ordre de _UPSERT_CONVERSATION_SQL
+        """
+        return (
+            conv['entity_id'],
+            session_id,
+            conv.get('title', 'Sans nom'),
+            conv.get('type', 'user'),
+            conv.get('username'),
+            conv.get('last_message', ''),
+            to_epoch_ms(conv.get('last_message_date')),
+            conv.get('last_message_from_me', False),
+            conv.get('unread_count', 0),
+            conv.get('pinned', False),
+            conv.get('archived', False),
+            conv.get('profile_photo'),
+            conv.get('has_photo', False),
+            conv.get('phone')
+        )
+    
+    @_on_writer
     def get_conversations(
         self,
         session_ids: List[str],
@@ -252,6 +782,7 @@ class TelegramDatabase:
             
         Returns:
             List[Dict]: Liste des conversations avec photos
+                        (last_message_date en millisecondes epoch)
         """
         if not session_ids:
             return []
@@ -262,75 +793,122 @@ class TelegramDatabase:
                 logger.warning(f"Limite invalide ignorée: {limit}")
                 limit = None
         
-        # Construire la requête avec LEFT JOIN sur profile_photos
-        placeholders = ','.join('?' * len(session_ids))
+        unique_session_ids = list(dict.fromkeys(session_ids))
         
-        query = f"""
-            SELECT 
-                c.entity_id, c.session_id, c.title, c.type, c.username,
-                c.last_message, c.last_message_date, c.last_message_from_me,
-                c.unread_count, c.pinned, c.archived,
-                c.profile_photo_path, c.has_photo, c.phone,
-                p.photo_path as cached_photo_path
-            FROM conversations c
-            LEFT JOIN profile_photos p ON c.entity_id = p.entity_id
-            WHERE c.session_id IN ({placeholders})
+        # Une requête par lot de sessions, puis fusion des lots déjà triés
+        batches = []
+        for start in range(0, len(unique_session_ids), CONVERSATIONS_MAX_ARMS):
+            batch = unique_session_ids[start:start + CONVERSATIONS_MAX_ARMS]
+            query = self._conversations_sql(['main'] * len(batch), include_groups, bool(limit))
+            params = self._conversations_params(batch, include_groups, limit)
+            batches.append(self.conn.execute(query, params).fetchall())
+        
+        rows = batches[0] if len(batches) == 1 else heapq.merge(
+            *batches,
+            key=lambda row: (row['last_message_date'] is None, -(row['last_message_date'] or 0))
+        )
+        
+        # Présence des fichiers lue dans l'index mémoire (aucun accès disque)
+        photo_index = get_photo_index()
+        conversations = []
+        for row in rows:
+            if limit and len(conversations) >= limit:
+                break
+            conversations.append(self._conversation_from_row(row, photo_index))
+        
+        logger.debug(f"Récupéré {len(conversations)} conversations depuis DB (avec photos)")
+        return conversations
+    
+    @staticmethod
+    def _conversations_sql(schemas: List[str], include_groups: bool, with_limit: bool) -> str:
         """
+        Construit la requête de get_conversations : une branche par session.
         
-        params = list(session_ids)
+        Chaque branche est lue dans l'ordre de l'index (session, type, date) ;
+        le UNION ALL ... ORDER BY fusionne les branches déjà triées (pas de
+        tri temporaire). Les schémas permettent de viser des bases attachées
+        (voir database.sharded_db) ; profile_photos est lue dans main.
         
-        # Filtrer par type si nécessaire (sécurisé avec paramètre)
-        if not include_groups:
-            query += " AND c.type = ?"
-            params.append('user')
+        Args:
+            schemas: Schéma SQLite de chaque branche (une par session)
+            include_groups: Inclure les groupes/canaux
+            with_limit: Ajouter un paramètre LIMIT
+            
+        Returns:
+            str: Requête (paramètres : voir _conversations_params)
+        """
+        arms = []
+        for schema in schemas:
+            arm = f"""
+                SELECT 
+                    c.entity_id, c.session_id, c.title, c.type, c.username,
+                    c.last_message, c.last_message_date, c.last_message_from_me,
+                    c.unread_count, c.pinned, c.archived,
+                    c.profile_photo_path, c.has_photo, c.phone,
+                    p.photo_path as cached_photo_path
+                FROM {schema}.conversations c
+                LEFT JOIN main.profile_photos p ON c.entity_id = p.entity_id
+                WHERE c.session_id = ?
+            """
+            # Filtrer par type si nécessaire (sécurisé avec paramètre)
+            if not include_groups:
+                arm += " AND c.type = ?"
+            arms.append(arm)
         
         # Tri par date
-        query += " ORDER BY c.last_message_date DESC"
+        query = " UNION ALL ".join(arms) + " ORDER BY last_message_date DESC"
         
         # Limite (sécurisé avec paramètre)
-        if limit:
+        if with_limit:
             query += " LIMIT ?"
+        return query
+    
+    @staticmethod
+    def _conversations_params(session_ids: List[str], include_groups: bool, limit: Optional[int]) -> List:
+        """Paramètres de la requête construite par _conversations_sql."""
+        params = []
+        for session_id in session_ids:
+            params.append(session_id)
+            if not include_groups:
+                params.append('user')
+        if limit:
             params.append(limit)
+        return params
+    
+    @staticmethod
+    def _conversation_from_row(row: sqlite3.Row, photo_index) -> Dict:
+        """
+        Convertit une ligne de get_conversations au format API.
         
-        cursor = self.conn.execute(query, params)
-        rows = cursor.fetchall()
-        
-        conversations = []
-        for row in rows:
-            # Convertir Row en dict
-            conv = dict(row)
+        Args:
+            row: Ligne SQLite
+            photo_index: Index des photos présentes (database.photo_index)
             
-            # Convertir les dates ISO en datetime
-            if conv.get('last_message_date'):
-                try:
-                    conv['last_message_date'] = datetime.fromisoformat(conv['last_message_date'])
-                except:
-                    conv['last_message_date'] = None
-            
-            # Utiliser le cache de photo en priorité
-            cached_photo = conv.pop('cached_photo_path', None)
-            db_photo = conv.pop('profile_photo_path', None)
-            
-            # Priorité : cache > db_photo
-            photo_path = cached_photo or db_photo
-            
-            # Vérifier que le fichier existe vraiment
-            if photo_path:
-                import os
-                if os.path.exists(photo_path):
-                    conv['profile_photo'] = photo_path
-                    conv['has_photo'] = True
-                else:
-                    conv['profile_photo'] = None
-                    conv['has_photo'] = False
+        Returns:
+            Dict: Conversation (profile_photo None si le fichier n'est pas connu)
+        """
+        conv = dict(row)
+        
+        # Utiliser le cache de photo en priorité
+        cached_photo = conv.pop('cached_photo_path', None)
+        db_photo = conv.pop('profile_photo_path', None)
+        
+        # Priorité : cache > db_photo
+        photo_path = cached_photo or db_photo
+        
+        if photo_path:
+            if photo_path in photo_index:
+                conv['profile_photo'] = photo_path
+                conv['has_photo'] = True
             else:
                 conv['profile_photo'] = None
-            
-            conversations.append(conv)
+                conv['has_photo'] = False
+        else:
+            conv['profile_photo'] = None
         
-        logger.debug(f"Récupéré {len(conversations)} conversations depuis DB (avec photos)")
-        return conversations
+        return conv
     
+    @_on_writer
     def get_conversation_by_id(self, entity_id: int, session_id: str) -> Optional[Dict]:
         """
         Récupère une conversation spécifique.
@@ -357,17 +935,10 @@ class TelegramDatabase:
             return None
         
         conv = dict(row)
-        
-        # Convertir date
-        if conv.get('last_message_date'):
-            try:
-                conv['last_message_date'] = datetime.fromisoformat(conv['last_message_date'])
-            except:
-                conv['last_message_date'] = None
-        
         conv['profile_photo'] = conv.pop('profile_photo_path', None)
         return conv
     
+    @_on_writer
     def update_conversation_last_message(
         self,
         entity_id: int,
@@ -393,10 +964,65 @@ class TelegramDatabase:
                 last_message_from_me = ?,
                 updated_at = CURRENT_TIMESTAMP
             WHERE entity_id = ? AND session_id = ?
-        """, (message_text, message_date.isoformat(), from_me, entity_id, session_id))
+        """, (message_text, to_epoch_ms(message_date), from_me, entity_id, session_id))
+        self.conn.commit()
+    
+    @_on_writer
+    def mark_conversation_opened(self, entity_id: int, session_id: str):
+        """
+        Enregistre l'ouverture d'une conversation (voir database.retention).
+        
+        Args:
+            entity_id: ID de l'entité
+            session_id: ID de la session
+        """
+        self.conn.execute("""
+            UPDATE conversations
+            SET last_opened_at = ?
+            WHERE entity_id = ? AND session_id = ?
+        """, (to_epoch_ms(datetime.now()), entity_id, session_id))
+        self.conn.commit()
+    
+    @_on_writer
+    def mark_history_complete(self, entity_id: int, session_id: str):
+        """
+        Enregistre que le début de l'historique d'une conversation est en cache.
+        
+        Les pages plus anciennes ne sont alors plus demandées à l'API
+        (remis à zéro par prune_chat_messages).
+        
+        Args:
+            entity_id: ID de l'entité
+            session_id: ID de la session
+        """
+        self.conn.execute("""
+            UPDATE conversations
+            SET history_complete = 1
+            WHERE entity_id = ? AND session_id = ?
+        """, (entity_id, session_id))
+        self.conn.commit()
+    
+    @_on_writer
+    def is_history_complete(self, entity_id: int, session_id: str) -> bool:
+        """
+        Indique si le début de l'historique d'une conversation est en cache.
+        
+        Args:
+            entity_id: ID de l'entité
+            session_id: ID de la session
+            
+        Returns:
+            bool: True si l'API n'a plus de messages plus anciens
+        """
+        row = self.conn.execute("""
+            SELECT history_complete FROM conversations
+            WHERE entity_id = ? AND session_id = ?
+        """, (entity_id, session_id)).fetchone()
+        return bool(row and row['history_complete'])
     
     # ==================== MESSAGES ====================
     
+    @_on_writer
     def save_messages(self, session_id: str, chat_id: int, messages: List[Dict]) -> int:
         """
         Sauvegarde les messages d'une conversation.
@@ -412,46 +1038,89 @@ class TelegramDatabase:
         if not messages:
             return 0
         
-        count = 0
-        
+        rows = []
         for msg in messages:
             try:
-                # Convertir datetime
-                msg_date = msg.get('date')
-                if msg_date and isinstance(msg_date, datetime):
-                    msg_date = msg_date.isoformat()
-                
-                self.conn.execute("""
-                    INSERT OR REPLACE INTO messages (
-                        id, chat_id, session_id, text, sender_id, sender_name,
-                        date, from_me, has_media, media_type, media_path,
-                        media_caption, reply_to, edited, views
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    msg['id'],
-                    chat_id,
-                    session_id,
-                    msg.get('text', ''),
-                    msg.get('sender_id'),
-                    msg.get('sender_name', 'Inconnu'),
-                    msg_date,
-                    msg.get('from_me', False),
-                    msg.get('has_media', False),
-                    msg.get('media_type'),
-                    msg.get('media_data'),  # media_path dans la DB
-                    msg.get('media_caption', ''),
-                    msg.get('reply_to'),
-                    msg.get('edited', False),
-                    msg.get('views')
-                ))
-                count += 1
+                rows.append(self._message_row(session_id, chat_id, msg))
             except Exception as e:
                 logger.error(f"Erreur sauvegarde message {msg.get('id')}: {e}")
         
-        self.conn.commit()
+        count = self._bulk_upsert(_UPSERT_MESSAGE_SQL, rows, "message")
         logger.debug(f"Sauvegardé {count} messages pour chat {chat_id}")
         return count
     
+    @staticmethod
+    def _message_row(session_id: str, chat_id: int, msg: Dict) -> Tuple:
+        """
+        Normalise un message en tuple prêt pour executemany.
+        
+        Args:
+            session_id: ID de la session
+            chat_id: ID du chat
+            msg: Message (format API)
+            
+        Returns:
+            Tuple: Valeurs dans l'ordre de _UPSERT_MESSAGE_SQL
+        """
+        return (
+            msg['id'],
+            chat_id,
+            session_id,
+            msg.get('text', ''),
+            msg.get('sender_id'),
+            msg.get('sender_name', 'Inconnu'),
+            to_epoch_ms(msg.get('date')),
+            msg.get('from_me', False),
+            msg.get('has_media', False),
+            msg.get('media_type'),
+            msg.get('media_data'),  # media_path dans la DB
+            msg.get('media_caption', ''),
+            msg.get('reply_to'),
+            msg.get('edited', False),
+            msg.get('views')
+        )
+    
+    _MESSAGE_COLUMNS = """
+        id, text, sender_id, sender_name, date, from_me,
+        has_media, media_type, media_path, media_caption,
+        reply_to, edited, views
+    """
+    
+    @staticmethod
+    def _row_to_message(row: sqlite3.Row) -> Dict:
+        """
+        Convertit une ligne de la table messages au format API.
+        
+        La date reste en millisecondes epoch : la conversion en datetime
+        (database.timestamps.as_datetime) est faite à l'affichage.
+        
+        Args:
+            row: Ligne SQLite
+            
+        Returns:
+            Dict: Message
+        """
+        msg = dict(row)
+        
+        # Renommer media_path en media_data pour compatibilité
+        msg['media_data'] = msg.pop('media_path', None)
+        return msg
+    
+    @staticmethod
+    def _message_cursor(cursor: Tuple[datetime, int]) -> Tuple[int, int]:
+        """
+        Normalise un curseur (date, id) dans le format stocké en base.
+        
+        Args:
+            cursor: Date (datetime ou millisecondes epoch) et ID du message de référence
+            
+        Returns:
+            Tuple[int, int]: (millisecondes epoch, id)
+        """
+        cursor_date, cursor_id = cursor
+        return to_epoch_ms(cursor_date), cursor_id
+    
+    @_on_writer
     def get_messages(
         self,
         chat_id: int,
@@ -460,52 +1129,125 @@ class TelegramDatabase:
         offset: int = 0
     ) -> List[Dict]:
         """
-        Récupère les messages d'une conversation.
+        Récupère les messages les plus récents d'une conversation.
+        
+        Préférer get_messages_before / get_messages_after : le coût d'un
+        OFFSET croît avec la profondeur de la page.
         
         Args:
             chat_id: ID du chat
             session_id: ID de la session
             limit: Nombre maximum de messages
-            offset: Décalage pour pagination
+            offset: Décalage pour pagination (depuis le plus récent)
             
         Returns:
-            List[Dict]: Liste des messages
+            List[Dict]: Liste des messages (ordre chronologique)
         """
-        cursor = self.conn.execute("""
-            SELECT 
-                id, text, sender_id, sender_name, date, from_me,
-                has_media, media_type, media_path, media_caption,
-                reply_to, edited, views
+        cursor = self.conn.execute(f"""
+            SELECT {self._MESSAGE_COLUMNS}
             FROM messages
             WHERE chat_id = ? AND session_id = ?
-            ORDER BY date ASC
+            ORDER BY date DESC, id DESC
             LIMIT ? OFFSET ?
         """, (chat_id, session_id, limit, offset))
         
-        rows = cursor.fetchall()
-        
-        messages = []
-        for row in rows:
-            msg = dict(row)
-            
-            # Convertir date
-            if msg.get('date'):
-                try:
-                    msg['date'] = datetime.fromisoformat(msg['date'])
-                except:
-                    msg['date'] = None
-            
-            # Renommer media_path en media_data pour compatibilité
-            msg['media_data'] = msg.pop('media_path', None)
-            
-            messages.append(msg)
+        messages = [self._row_to_message(row) for row in reversed(cursor.fetchall())]
         
         logger.debug(f"Récupéré {len(messages)} messages pour chat {chat_id}")
         return messages
     
-    def get_message_count(self, chat_id: int, session_id: str) -> int:
-        """
-        Compte le nombre de messages d'une conversation.
+    @_on_writer
+    def get_messages_before(
+        self,
+        chat_id: int,
+        session_id: str,
+        before: Optional[Tuple[datetime, int]] = None,
+        limit: int = 50
+    ) -> List[Dict]:
+        """
+        Récupère une page de messages antérieurs à un curseur (keyset).
+        
+        Le coût est constant quelle que soit la profondeur dans l'historique :
+        la page est lue directement sur l'index idx_messages_chat_date_id.
+        
+        Args:
+            chat_id: ID du chat
+            session_id: ID de la session
+            before: Curseur (date, id) du plus ancien message déjà affiché,
+                    None pour la page la plus récente
+            limit: Nombre maximum de messages
+            
+        Returns:
+            List[Dict]: Liste des messages (ordre chronologique)
+        """
+        query = f"""
+            SELECT {self._MESSAGE_COLUMNS}
+            FROM messages
+            WHERE chat_id = ? AND session_id = ?
+        """
+        params: List = [chat_id, session_id]
+        
+        if before is not None:
+            cursor_date, cursor_id = self._message_cursor(before)
+            # date <= ? borne la recherche dans l'index, id départage les égalités
+            query += " AND date <= ? AND (date < ? OR id < ?)"
+            params.extend([cursor_date, cursor_date, cursor_id])
+        
+        query += " ORDER BY date DESC, id DESC LIMIT ?"
+        params.append(limit)
+        
+        rows = self.conn.execute(query, params).fetchall()
+        messages = [self._row_to_message(row) for row in reversed(rows)]
+        
+        logger.debug(f"Récupéré {len(messages)} messages antérieurs pour chat {chat_id}")
+        return messages
+    
+    @_on_writer
+    def get_messages_after(
+        self,
+        chat_id: int,
+        session_id: str,
+        after: Optional[Tuple[datetime, int]] = None,
+        limit: int = 50
+    ) -> List[Dict]:
+        """
+        Récupère une page de messages postérieurs à un curseur (keyset).
+        
+        Args:
+            chat_id: ID du chat
+            session_id: ID de la session
+            after: Curseur (date, id) du plus récent message déjà affiché,
+                   None pour la page la plus ancienne
+            limit: Nombre maximum de messages
+            
+        Returns:
+            List[Dict]: Liste des messages (ordre chronologique)
+        """
+        query = f"""
+            SELECT {self._MESSAGE_COLUMNS}
+            FROM messages
+            WHERE chat_id = ? AND session_id = ?
+        """
+        params: List = [chat_id, session_id]
+        
+        if after is not None:
+            cursor_date, cursor_id = self._message_cursor(after)
+            query += " AND date >= ? AND (date > ? OR id > ?)"
+            params.extend([cursor_date, cursor_date, cursor_id])
+        
+        query += " ORDER BY date ASC, id ASC LIMIT ?"
+        params.append(limit)
+        
+        rows = self.conn.execute(query, params).fetchall()
+        messages = [self._row_to_message(row) for row in rows]
+        
+        logger.debug(f"Récupéré {len(messages)} messages postérieurs pour chat {chat_id}")
+        return messages
+    
+    @_on_writer
+    def get_message_count(self, chat_id: int, session_id: str) -> int:
+        """
+        Compte le nombre de messages d'une conversation.
         
         Args:
             chat_id: ID du chat
@@ -521,23 +1263,333 @@ class TelegramDatabase:
         
         return cursor.fetchone()[0]
     
+    # ==================== MISES À JOUR GROUPÉES ====================
+    
+    @_on_writer
+    def apply_chat_updates(self, updates: List) -> List:
+        """
+        Applique en une seule transaction des mises à jour fusionnées.
+        
+        Utilisé par database.write_buffer : nouveaux messages, éditions,
+        derniers messages, compteurs de non lus, titres et photos. Si la
+        transaction échoue, chaque conversation est rejouée dans sa propre
+        transaction pour isoler celles en cause sans perdre les autres.
+        
+        Args:
+            updates: Liste de PendingChatUpdate (une entrée par conversation)
+            
+        Returns:
+            List: Mises à jour non écrites (à réessayer)
+        """
+        # Valider les écritures en attente pour qu'un rollback ne les annule pas
+        self.conn.commit()
+        
+        try:
+            self._write_chat_updates(updates)
+            return []
+        except sqlite3.Error as e:
+            if len(updates) == 1:
+                logger.error(f"Erreur écriture chat {updates[0].chat_id} ({updates[0].session_id}): {e}")
+                return list(updates)
+            logger.warning(f"Lot de {len(updates)} conversation(s) rejeté ({e}), repli conversation par conversation")
+        
+        failed = []
+        for update in updates:
+            try:
+                self._write_chat_updates([update])
+            except sqlite3.Error as e:
+                logger.error(f"Erreur écriture chat {update.chat_id} ({update.session_id}): {e}")
+                failed.append(update)
+        return failed
+    
+    def _write_chat_updates(self, updates: List) -> None:
+        """Écrit des mises à jour fusionnées dans une transaction (voir apply_chat_updates)."""
+        message_rows = []
+        edit_rows = []
+        title_rows = []
+        photo_rows = []
+        last_message_rows = []
+        unread_rows = []
+        
+        for update in updates:
+            key = (update.chat_id, update.session_id)
+            
+            for msg in update.messages.values():
+                try:
+                    message_rows.append(self._message_row(update.session_id, update.chat_id, msg))
+                except Exception as e:
+                    logger.error(f"Erreur sauvegarde message {msg.get('id')}: {e}")
+            
+            for message_id, text in update.edits.items():
+                edit_rows.append((text, message_id, *key))
+            
+            if update.title is not None:
+                title_rows.append((update.title, *key))
+            
+            if update.photo_changed:
+                photo_rows.append(key)
+            
+            if update.last_message is not None:
+                text, date, from_me = update.last_message
+                last_message_rows.append((text, to_epoch_ms(date), from_me, *key))
+            
+            if update.reset_unread or update.unread_delta:
+                unread_rows.append((update.reset_unread, update.unread_delta, *key))
+        
+        with self.conn:
+            if message_rows:
+                self.conn.executemany(_UPSERT_MESSAGE_SQL, message_rows)
+            if edit_rows:
+                self.conn.executemany("""
+                    UPDATE messages
+                    SET text = ?, edited = 1
+                    WHERE id = ? AND chat_id = ? AND session_id = ?
+                """, edit_rows)
+            if title_rows:
+                self.conn.executemany("""
+                    UPDATE conversations
+                    SET title = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE entity_id = ? AND session_id = ?
+                """, title_rows)
+            if photo_rows:
+                # La nouvelle photo sera téléchargée lors du prochain affichage
+                self.conn.executemany("""
+                    UPDATE conversations
+                    SET profile_photo_path = NULL, has_photo = 1
+                    WHERE entity_id = ? AND session_id = ?
+                """, photo_rows)
+            if last_message_rows:
+                self.conn.executemany("""
+                    UPDATE conversations
+                    SET last_message = ?,
+                        last_message_date = ?,
+                        last_message_from_me = ?,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE entity_id = ? AND session_id = ?
+                """, last_message_rows)
+            if unread_rows:
+                self.conn.executemany("""
+                    UPDATE conversations
+                    SET unread_count = CASE WHEN ? THEN 0 ELSE unread_count END + ?
+                    WHERE entity_id = ? AND session_id = ?
+                """, unread_rows)
+        
+        logger.debug(
+            f"Mises à jour groupées : {len(updates)} conversation(s), "
+            f"{len(message_rows)} message(s), {len(edit_rows)} édition(s)"
+        )
+    
+    # ==================== RECHERCHE ====================
+    
+    @staticmethod
+    def _build_match_query(query: str) -> Optional[str]:
+        """
+        Convertit la saisie utilisateur en expression MATCH FTS5 sûre.
+        
+        Chaque mot est cité (pas d'opérateurs ni d'erreur de syntaxe)
+        et recherché en préfixe, les mots sont combinés en ET.
+        
+        Args:
+            query: Texte saisi
+            
+        Returns:
+            Optional[str]: Expression MATCH ou None si aucun mot
+        """
+        tokens = _SEARCH_TOKEN_PATTERN.findall(query or "")
+        if not tokens:
+            return None
+        return " ".join(f'"{token}"*' for token in tokens)
+    
+    @_on_writer
+    def search(
+        self,
+        query: str,
+        session_ids: List[str],
+        limit: int = 50,
+        cursor: Optional[int] = None
+    ) -> Dict:
+        """
+        Recherche plein texte dans les conversations et les messages en cache.
+        
+        Les résultats sont classés par pertinence (bm25) ; chaque résultat
+        contient un extrait avec les termes trouvés entre
+        SEARCH_HIGHLIGHT_START et SEARCH_HIGHLIGHT_END.
+        
+        Args:
+            query: Texte recherché
+            session_ids: Liste des IDs de session
+            limit: Nombre maximum de résultats par page
+            cursor: Curseur de la page (valeur next_cursor d'un appel précédent)
+            
+        Returns:
+            Dict: {'hits': [...], 'next_cursor': Optional[int]}
+                  (dates en millisecondes epoch)
+        """
+        empty = {'hits': [], 'next_cursor': None}
+        
+        if not session_ids:
+            return empty
+        
+        # Validation pour éviter les injections SQL
+        if not isinstance(limit, int) or limit <= 0:
+            logger.warning(f"Limite invalide ignorée: {limit}")
+            limit = 50
+        offset = cursor if isinstance(cursor, int) and cursor > 0 else 0
+        
+        placeholders = ','.join('?' * len(session_ids))
+        
+        if self.has_fts:
+            match = self._build_match_query(query)
+            if not match:
+                return empty
+            
+            # Chaque branche est limitée (tri top-N) avant la fusion par pertinence.
+            # Pour les messages, seuls les SEARCH_MAX_CANDIDATES plus récents
+            # des sessions demandées (date décroissante) sont classés : coût
+            # borné pour les mots courants.
+            window = offset + limit + 1
+            sql = f"""
+                SELECT * FROM (
+                    SELECT * FROM (
+                        SELECT
+                            'conversation' AS kind, c.session_id, c.entity_id AS chat_id,
+                            NULL AS message_id, c.title, c.type, c.last_message_date AS date,
+                            snippet(conversations_fts, -1, ?, ?, '…', 8) AS snippet,
+                            bm25(conversations_fts) AS rank
+                        FROM conversations_fts
+                        JOIN conversations c ON c.rowid = conversations_fts.rowid
+                        WHERE conversations_fts MATCH ? AND c.session_id IN ({placeholders})
+                        ORDER BY rank
+                        LIMIT ?
+                    )
+                    
+                    UNION ALL
+                    
+                    SELECT * FROM (
+                        SELECT
+                            'message' AS kind, m.session_id, m.chat_id,
+                            m.id AS message_id, c.title, c.type, m.date,
+                            snippet(messages_fts, -1, ?, ?, '…', 12) AS snippet,
+                            bm25(messages_fts) AS rank
+                        FROM messages_fts
+                        JOIN messages m ON m.rowid = messages_fts.rowid
+                        LEFT JOIN conversations c
+                            ON c.entity_id = m.chat_id AND c.session_id = m.session_id
+                        WHERE messages_fts MATCH ?
+                            AND messages_fts.rowid IN (
+                                SELECT candidate.rowid FROM messages_fts
+                                JOIN messages candidate ON candidate.rowid = messages_fts.rowid
+                                WHERE messages_fts MATCH ?
+                                    AND candidate.session_id IN ({placeholders})
+                                ORDER BY candidate.date DESC
+                                LIMIT ?
+                            )
+                        ORDER BY rank
+                        LIMIT ?
+                    )
+                )
+                ORDER BY rank
+                LIMIT ? OFFSET ?
+            """
+            highlight = (SEARCH_HIGHLIGHT_START, SEARCH_HIGHLIGHT_END)
+            params = [
+                *highlight, match, *session_ids, window,
+                *highlight, match, match, *session_ids, SEARCH_MAX_CANDIDATES, window,
+                limit + 1, offset
+            ]
+        else:
+            # Repli sans FTS5 : titres uniquement
+            text = (query or "").strip()
+            if not text:
+                return empty
+            
+            sql = f"""
+                SELECT
+                    'conversation' AS kind, session_id, entity_id AS chat_id,
+                    NULL AS message_id, title, type, last_message_date AS date,
+                    title AS snippet, 0 AS rank
+                FROM conversations
+                WHERE title LIKE ? AND session_id IN ({placeholders})
+                ORDER BY last_message_date DESC
+                LIMIT ? OFFSET ?
+            """
+            params = [f"%{text}%", *session_ids, limit + 1, offset]
+        
+        rows = self.conn.execute(sql, params).fetchall()
+        
+        hits = [dict(row) for row in rows[:limit]]
+        
+        next_cursor = offset + limit if len(rows) > limit else None
+        
+        logger.debug(f"Recherche '{query}' : {len(hits)} résultat(s)")
+        return {'hits': hits, 'next_cursor': next_cursor}
+    
     # ==================== PHOTOS DE PROFIL ====================
     
-    def save_profile_photo(self, entity_id: int, photo_path: str):
+    @_on_writer
+    def save_profile_photo(
+        self,
+        entity_id: int,
+        photo_path: str,
+        file_size: Optional[int] = None,
+        file_mtime: Optional[int] = None
+    ):
         """
         Sauvegarde le chemin d'une photo de profil.
         
         Args:
             entity_id: ID de l'entité
             photo_path: Chemin vers la photo
+            file_size: Taille du fichier en octets (voir photo_index.photo_file_stats)
+            file_mtime: Date de modification du fichier (millisecondes epoch)
         """
+        # Upsert (pas REPLACE) : le DELETE implicite ne déclencherait pas les compteurs
         self.conn.execute("""
-            INSERT OR REPLACE INTO profile_photos (entity_id, photo_path, downloaded_at)
-            VALUES (?, ?, CURRENT_TIMESTAMP)
-        """, (entity_id, photo_path))
+            INSERT INTO profile_photos (
+                entity_id, photo_path, file_size, file_mtime, downloaded_at
+            )
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(entity_id) DO UPDATE SET
+                photo_path = excluded.photo_path,
+                file_size = excluded.file_size,
+                file_mtime = excluded.file_mtime,
+                downloaded_at = CURRENT_TIMESTAMP
+        """, (entity_id, photo_path, file_size, file_mtime))
+        self.conn.commit()
         
         logger.debug(f"Photo de profil sauvegardée pour entity {entity_id}")
     
+    @_on_writer
+    def get_profile_photo_records(self) -> List[Tuple[str, Optional[int], Optional[int]]]:
+        """
+        Récupère les photos enregistrées avec la taille et la date relevées au téléchargement.
+        
+        Returns:
+            List[Tuple]: (chemin, taille en octets, mtime en millisecondes epoch)
+        """
+        cursor = self.conn.execute("""
+            SELECT photo_path, file_size, file_mtime FROM profile_photos
+        """)
+        return [tuple(row) for row in cursor.fetchall()]
+    
+    @_on_writer
+    def forget_profile_photo(self, photo_path: str) -> int:
+        """
+        Supprime les entrées pointant vers une photo introuvable ou illisible.
+        
+        Args:
+            photo_path: Chemin de la photo
+            
+        Returns:
+            int: Nombre d'entrées supprimées
+        """
+        cursor = self.conn.execute("""
+            DELETE FROM profile_photos WHERE photo_path = ?
+        """, (photo_path,))
+        self.conn.commit()
+        return cursor.rowcount
+    
+    @_on_writer
     def get_profile_photo(self, entity_id: int) -> Optional[str]:
         """
         Récupère le chemin d'une photo de profil.
@@ -556,6 +1608,7 @@ class TelegramDatabase:
         row = cursor.fetchone()
         return row['photo_path'] if row else None
     
+    @_on_writer
     def has_profile_photo(self, entity_id: int) -> bool:
         """
         Vérifie si une photo de profil existe en cache.
@@ -573,8 +1626,407 @@ class TelegramDatabase:
         
         return cursor.fetchone() is not None
     
+    # ==================== GROUPES / CANAUX ====================
+    
+    @_on_writer
+    def save_dialogs(self, session_id: str, dialogs: List[Dict]) -> int:
+        """
+        Sauvegarde ou met à jour les groupes et canaux d'un compte.
+        
+        Args:
+            session_id: ID de la session
+            dialogs: Dialogues (format TelegramAccount.get_dialogs, avec 'date')
+            
+        Returns:
+            int: Nombre de dialogues sauvegardés
+        """
+        now = to_epoch_ms(datetime.now())
+        rows = [
+            (
+                dialog['id'],
+                session_id,
+                dialog.get('title') or 'Sans nom',
+                dialog.get('type', 'group'),
+                dialog.get('username'),
+                dialog.get('participants_count') or 0,
+                dialog.get('can_send', True),
+                dialog.get('is_admin', False),
+                dialog.get('is_megagroup', False),
+                dialog.get('is_broadcast', False),
+                dialog.get('is_member', True),
+                to_epoch_ms(dialog.get('date')),
+                now,
+            )
+            for dialog in dialogs
+        ]
+        count = self._bulk_upsert(_UPSERT_DIALOG_SQL, rows, "dialogue")
+        logger.debug(f"Sauvegardé {count} dialogues pour session {session_id}")
+        return count
+    
+    @_on_writer
+    def get_dialogs(self, session_id: str) -> List[Dict]:
+        """
+        Récupère les groupes et canaux dont le compte est membre.
+        
+        Args:
+            session_id: ID de la session
+            
+        Returns:
+            List[Dict]: Dialogues (format TelegramAccount.get_dialogs)
+        """
+        cursor = self.conn.execute("""
+            SELECT
+                chat_id AS id, title, type, username, participants_count,
+                can_send, is_admin, is_megagroup, is_broadcast, is_member
+            FROM dialogs
+            WHERE session_id = ? AND is_member = 1
+        """, (session_id,))
+        
+        dialogs = []
+        for row in cursor.fetchall():
+            dialog = dict(row)
+            for key in ('can_send', 'is_admin', 'is_megagroup', 'is_broadcast', 'is_member'):
+                dialog[key] = bool(dialog[key])
+            dialogs.append(dialog)
+        return dialogs
+    
+    @_on_writer
+    def get_dialogs_top_date(self, session_id: str) -> Optional[int]:
+        """
+        Récupère la date du dernier message le plus récent parmi les dialogues connus.
+        
+        Args:
+            session_id: ID de la session
+            
+        Returns:
+            Optional[int]: Millisecondes epoch (None si aucun dialogue)
+        """
+        row = self.conn.execute("""
+            SELECT MAX(top_message_date) FROM dialogs WHERE session_id = ?
+        """, (session_id,)).fetchone()
+        return row[0]
+    
+    @_on_writer
+    def mark_dialogs_left(self, session_id: str, chat_ids: List[int], keep_only: bool = False) -> int:
+        """
+        Marque des groupes comme quittés (exclu, quitté, absent de la liste).
+        
+        Args:
+            session_id: ID de la session
+            chat_ids: IDs bruts des groupes
+            keep_only: True pour marquer tous les groupes SAUF chat_ids
+                       (resynchronisation complète)
+            
+        Returns:
+            int: Nombre de groupes marqués
+        """
+        if keep_only:
+            # Table temporaire : la liste complète peut dépasser la limite de paramètres
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen_dialogs (chat_id INTEGER PRIMARY KEY)")
+            self.conn.execute("DELETE FROM seen_dialogs")
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO seen_dialogs (chat_id) VALUES (?)",
+                [(chat_id,) for chat_id in chat_ids]
+            )
+            cursor = self.conn.execute("""
+                UPDATE dialogs SET is_member = 0, can_send = 0
+                WHERE session_id = ? AND is_member = 1
+                    AND chat_id NOT IN (SELECT chat_id FROM seen_dialogs)
+            """, (session_id,))
+        else:
+            if not chat_ids:
+                return 0
+            placeholders = ','.join('?' * len(chat_ids))
+            cursor = self.conn.execute(f"""
+                UPDATE dialogs SET is_member = 0, can_send = 0
+                WHERE session_id = ? AND chat_id IN ({placeholders})
+            """, (session_id, *chat_ids))
+        
+        self.conn.commit()
+        return cursor.rowcount
+    
+    # ==================== MESSAGES PROGRAMMÉS ====================
+    
+    @staticmethod
+    def _scheduled_row(session_id: str, msg: Dict) -> Tuple:
+        """Normalise un message programmé (format TelegramAccount) en tuple."""
+        return (
+            session_id,
+            msg['chat_id'],
+            msg['message_id'],
+            msg.get('chat_title'),
+            msg.get('text'),
+            to_epoch_ms(msg['date']),
+            msg.get('has_media', False),
+            msg.get('media_type'),
+        )
+    
+    @_on_writer
+    def save_scheduled_messages(self, session_id: str, messages: List[Dict]) -> int:
+        """
+        Ajoute ou met à jour des messages programmés dans le miroir local.
+        
+        Args:
+            session_id: ID de la session
+            messages: Messages (chat_id, message_id, text, date, ...)
+            
+        Returns:
+            int: Nombre de messages enregistrés
+        """
+        rows = [self._scheduled_row(session_id, msg) for msg in messages]
+        return self._bulk_upsert(_UPSERT_SCHEDULED_SQL, rows, "message programmé")
+    
+    @_on_writer
+    def replace_scheduled_chat(
+        self,
+        session_id: str,
+        chat_id: int,
+        messages: List[Dict],
+        history_hash: int
+    ) -> int:
+        """
+        Remplace les messages programmés d'un groupe par la liste reçue de Telegram.
+        
+        Args:
+            session_id: ID de la session
+            chat_id: ID brut du groupe
+            messages: Liste complète des messages programmés du groupe
+            history_hash: Hash Telegram de cette liste
+            
+        Returns:
+            int: Nombre de messages enregistrés
+        """
+        rows = [self._scheduled_row(session_id, msg) for msg in messages]
+        
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM scheduled_messages WHERE session_id = ? AND chat_id = ?",
+                (session_id, chat_id)
+            )
+            self.conn.executemany(_UPSERT_SCHEDULED_SQL, rows)
+            self.conn.execute("""
+                INSERT INTO scheduled_chats (session_id, chat_id, history_hash, synced_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(session_id, chat_id) DO UPDATE SET
+                    history_hash = excluded.history_hash,
+                    synced_at = excluded.synced_at
+            """, (session_id, chat_id, history_hash, to_epoch_ms(datetime.now())))
+        
+        return len(rows)
+    
+    @_on_writer
+    def get_scheduled_messages(self, session_id: str, chat_id: Optional[int] = None) -> List[Dict]:
+        """
+        Récupère les messages programmés du miroir local, par date croissante.
+        
+        Args:
+            session_id: ID de la session
+            chat_id: Limiter à un groupe (None = tous)
+            
+        Returns:
+            List[Dict]: Messages (dates en datetime local)
+        """
+        sql = """
+            SELECT
+                s.message_id, s.chat_id, COALESCE(s.chat_title, d.title, '') AS chat_title,
+                s.text, s.date, s.has_media, s.media_type
+            FROM scheduled_messages s
+            LEFT JOIN dialogs d ON d.session_id = s.session_id AND d.chat_id = s.chat_id
+            WHERE s.session_id = ?
+        """
+        params: List = [session_id]
+        if chat_id is not None:
+            sql += " AND s.chat_id = ?"
+            params.append(chat_id)
+        sql += " ORDER BY s.date"
+        
+        messages = []
+        for row in self.conn.execute(sql, params).fetchall():
+            message = dict(row)
+            message['date'] = as_datetime(message['date'])
+            message['has_media'] = bool(message['has_media'])
+            messages.append(message)
+        return messages
+    
+    @_on_writer
+    def update_scheduled_messages(
+        self,
+        session_id: str,
+        chat_id: int,
+        message_ids: List[int],
+        text: Optional[str] = None,
+        date: Optional[datetime] = None
+    ) -> int:
+        """
+        Applique une modification sur place (texte et/ou date) au miroir local.
+        
+        Args:
+            session_id: ID de la session
+            chat_id: ID brut du groupe
+            message_ids: IDs des messages modifiés
+            text: Nouveau texte (None = inchangé)
+            date: Nouvelle date de programmation (None = inchangée)
+            
+        Returns:
+            int: Nombre de messages mis à jour
+        """
+        if not message_ids:
+            return 0
+        
+        placeholders = ','.join('?' * len(message_ids))
+        with self.conn:
+            cursor = self.conn.execute(f"""
+                UPDATE scheduled_messages
+                SET text = COALESCE(?, text), date = COALESCE(?, date)
+                WHERE session_id = ? AND chat_id = ? AND message_id IN ({placeholders})
+            """, (text, to_epoch_ms(date), session_id, chat_id, *message_ids))
+        return cursor.rowcount
+    
+    @_on_writer
+    def get_scheduled_hashes(self, session_id: str) -> Dict[int, int]:
+        """
+        Récupère le hash de la dernière liste reçue pour chaque groupe.
+        
+        Args:
+            session_id: ID de la session
+            
+        Returns:
+            Dict[int, int]: history_hash par chat_id
+        """
+        cursor = self.conn.execute("""
+            SELECT chat_id, history_hash FROM scheduled_chats WHERE session_id = ?
+        """, (session_id,))
+        return dict(cursor.fetchall())
+    
+    @_on_writer
+    def delete_scheduled_messages(
+        self,
+        session_id: str,
+        chat_id: int,
+        message_ids: Optional[List[int]] = None
+    ) -> int:
+        """
+        Retire des messages programmés du miroir local (après suppression réussie).
+        
+        Le hash du groupe est oublié : la prochaine réconciliation relit la liste.
+        
+        Args:
+            session_id: ID de la session
+            chat_id: ID brut du groupe
+            message_ids: IDs des messages (None = tous ceux du groupe)
+            
+        Returns:
+            int: Nombre de messages retirés
+        """
+        with self.conn:
+            if message_ids is None:
+                cursor = self.conn.execute(
+                    "DELETE FROM scheduled_messages WHERE session_id = ? AND chat_id = ?",
+                    (session_id, chat_id)
+                )
+            else:
+                placeholders = ','.join('?' * len(message_ids))
+                cursor = self.conn.execute(f"""
+                    DELETE FROM scheduled_messages
+                    WHERE session_id = ? AND chat_id = ? AND message_id IN ({placeholders})
+                """, (session_id, chat_id, *message_ids))
+            self.conn.execute(
+                "DELETE FROM scheduled_chats WHERE session_id = ? AND chat_id = ?",
+                (session_id, chat_id)
+            )
+        return cursor.rowcount
+    
+    @_on_writer
+    def prune_scheduled_chats(self, session_id: str, chat_ids: List[int]) -> int:
+        """
+        Retire du miroir les groupes absents d'un scan complet (quittés).
+        
+        Args:
+            session_id: ID de la session
+            chat_ids: Groupes scannés (à conserver)
+            
+        Returns:
+            int: Nombre de messages retirés
+        """
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS scanned_chats (chat_id INTEGER PRIMARY KEY)")
+        with self.conn:
+            self.conn.execute("DELETE FROM scanned_chats")
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO scanned_chats (chat_id) VALUES (?)",
+                [(chat_id,) for chat_id in chat_ids]
+            )
+            cursor = self.conn.execute("""
+                DELETE FROM scheduled_messages
+                WHERE session_id = ? AND chat_id NOT IN (SELECT chat_id FROM scanned_chats)
+            """, (session_id,))
+            self.conn.execute("""
+                DELETE FROM scheduled_chats
+                WHERE session_id = ? AND chat_id NOT IN (SELECT chat_id FROM scanned_chats)
+            """, (session_id,))
+        return cursor.rowcount
+    
+    # ==================== ENTITÉS ====================
+    
+    @_on_writer
+    def save_entities(self, session_id: str, entities: List[Tuple]) -> int:
+        """
+        Enregistre les pairs résolus d'un compte (voir core.telegram.entity_cache).
+        
+        Args:
+            session_id: ID de la session
+            entities: Tuples (peer_id, peer_type, access_hash, username)
+            
+        Returns:
+            int: Nombre de pairs enregistrés
+        """
+        now = to_epoch_ms(datetime.now())
+        rows = [(session_id, *entity, now) for entity in entities]
+        return self._bulk_upsert(_UPSERT_ENTITY_SQL, rows, "entité")
+    
+    @_on_writer
+    def get_entity(self, session_id: str, peer_id: int) -> Optional[Dict]:
+        """
+        Récupère un pair résolu.
+        
+        Args:
+            session_id: ID de la session
+            peer_id: ID marqué du pair (voir EntityCache.peer_key)
+            
+        Returns:
+            Optional[Dict]: peer_id, peer_type, access_hash, username ou None
+        """
+        cursor = self.conn.execute("""
+            SELECT peer_id, peer_type, access_hash, username FROM entities
+            WHERE session_id = ? AND peer_id = ?
+        """, (session_id, peer_id))
+        
+        row = cursor.fetchone()
+        return dict(row) if row else None
+    
+    @_on_writer
+    def get_entities(self, session_id: str, limit: int) -> List[Dict]:
+        """
+        Récupère les pairs résolus les plus récents d'un compte (préchargement).
+        
+        Args:
+            session_id: ID de la session
+            limit: Nombre maximum de pairs
+            
+        Returns:
+            List[Dict]: Pairs, du plus récent au plus ancien
+        """
+        cursor = self.conn.execute("""
+            SELECT peer_id, peer_type, access_hash, username FROM entities
+            WHERE session_id = ?
+            ORDER BY updated_at DESC
+            LIMIT ?
+        """, (session_id, limit))
+        
+        return [dict(row) for row in cursor.fetchall()]
+    
     # ==================== MÉTADONNÉES ====================
     
+    @_on_writer
     def set_metadata(self, key: str, value: str):
         """
         Sauvegarde une métadonnée.
@@ -587,7 +2039,9 @@ class TelegramDatabase:
             INSERT OR REPLACE INTO metadata (key, value, updated_at)
             VALUES (?, ?, CURRENT_TIMESTAMP)
         """, (key, value))
+        self.conn.commit()
     
+    @_on_writer
     def get_metadata(self, key: str, default: Optional[str] = None) -> Optional[str]:
         """
         Récupère une métadonnée.
@@ -620,7 +2074,8 @@ class TelegramDatabase:
         if value:
             try:
                 return datetime.fromisoformat(value)
-            except:
+            except ValueError:
+                logger.warning(f"Date de synchronisation invalide pour {session_id}: {value!r}")
                 return None
         return None
     
@@ -636,42 +2091,317 @@ class TelegramDatabase:
     
     # ==================== UTILITAIRES ====================
     
+    @_on_writer
+    def execute_write(self, query: str, params: Tuple = (), session_id: Optional[str] = None) -> int:
+        """
+        Exécute une requête d'écriture paramétrée et la valide.
+        
+        Remplace les accès directs à `conn.execute` depuis les services,
+        pour que toutes les écritures passent par le thread écrivain.
+        
+        Args:
+            query: Requête SQL paramétrée
+            params: Paramètres de la requête
+            session_id: Session concernée (aiguillage en mode par compte,
+                        voir database.sharded_db ; ignoré ici)
+            
+        Returns:
+            int: Nombre de lignes modifiées
+        """
+        cursor = self.conn.execute(query, params)
+        self.conn.commit()
+        return cursor.rowcount
+    
+    # ==================== RÉTENTION ====================
+    
+    @_on_writer
+    def get_retention_candidates(self, keep_messages: int, inactive_before: Optional[int]) -> Dict:
+        """
+        Liste les conversations dont les messages en cache doivent être purgés.
+        
+        Les conversations épinglées ne sont jamais purgées.
+        
+        Args:
+            keep_messages: Messages conservés par conversation (0 = pas de limite)
+            inactive_before: Millisecondes epoch ; les conversations non ouvertes
+                             depuis (ni actives, à défaut d'ouverture) sont
+                             vidées. None = désactivé
+            
+        Returns:
+            Dict: {'inactive': [(chat_id, session_id)], 'oversized': [(chat_id, session_id)]}
+        """
+        inactive = []
+        oversized = []
+        
+        if inactive_before is not None:
+            cursor = self.conn.execute("""
+                SELECT c.entity_id, c.session_id FROM conversations c
+                WHERE c.pinned = 0
+                    AND COALESCE(c.last_opened_at, c.last_message_date, 0) < ?
+                    AND EXISTS (
+                        SELECT 1 FROM messages m
+                        WHERE m.chat_id = c.entity_id AND m.session_id = c.session_id
+                    )
+            """, (inactive_before,))
+            inactive = [tuple(row) for row in cursor.fetchall()]
+        
+        if keep_messages > 0:
+            cursor = self.conn.execute("""
+                SELECT m.chat_id, m.session_id FROM (
+                    SELECT chat_id, session_id, COUNT(*) AS total
+                    FROM messages
+                    GROUP BY chat_id, session_id
+                ) m
+                LEFT JOIN conversations c
+                    ON c.entity_id = m.chat_id AND c.session_id = m.session_id
+                WHERE m.total > ? AND COALESCE(c.pinned, 0) = 0
+            """, (keep_messages,))
+            skipped = set(inactive)
+            oversized = [tuple(row) for row in cursor.fetchall() if tuple(row) not in skipped]
+        
+        return {'inactive': inactive, 'oversized': oversized}
+    
+    @_on_writer
+    def prune_chat_messages(self, chat_id: int, session_id: str, keep: int, batch_size: int) -> int:
+        """
+        Supprime un lot des messages les plus anciens d'une conversation.
+        
+        Un lot par appel : la file d'écriture reste disponible entre deux lots.
+        
+        Args:
+            chat_id: ID du chat
+            session_id: ID de la session
+            keep: Nombre de messages récents conservés (0 = tout supprimer)
+            batch_size: Nombre maximum de messages supprimés
+            
+        Returns:
+            int: Nombre de messages supprimés (< batch_size : terminé)
+        """
+        if keep > 0:
+            # Plus ancien message conservé, lu sur l'index (chat, session, date, id)
+            boundary = self.conn.execute("""
+                SELECT date, id FROM messages
+                WHERE chat_id = ? AND session_id = ?
+                ORDER BY date DESC, id DESC
+                LIMIT 1 OFFSET ?
+            """, (chat_id, session_id, keep - 1)).fetchone()
+            if not boundary:
+                return 0
+            
+            cursor = self.conn.execute("""
+                DELETE FROM messages WHERE rowid IN (
+                    SELECT rowid FROM messages
+                    WHERE chat_id = ? AND session_id = ?
+                        AND date <= ? AND (date < ? OR id < ?)
+                    LIMIT ?
+                )
+            """, (chat_id, session_id, boundary['date'], boundary['date'], boundary['id'], batch_size))
+        else:
+            cursor = self.conn.execute("""
+                DELETE FROM messages WHERE rowid IN (
+                    SELECT rowid FROM messages
+                    WHERE chat_id = ? AND session_id = ?
+                    LIMIT ?
+                )
+            """, (chat_id, session_id, batch_size))
+        
+        # Historique tronqué : les pages plus anciennes viendront de l'API
+        if cursor.rowcount > 0:
+            self.conn.execute("""
+                UPDATE conversations SET history_complete = 0
+                WHERE entity_id = ? AND session_id = ? AND history_complete = 1
+            """, (chat_id, session_id))
+        
+        self.conn.commit()
+        return cursor.rowcount
+    
+    @_on_writer
+    def incremental_vacuum(self, pages: int) -> int:
+        """
+        Rend au système une partie des pages libres (auto_vacuum=INCREMENTAL).
+        
+        Args:
+            pages: Nombre maximum de pages libérées
+            
+        Returns:
+            int: Nombre de pages effectivement libérées
+        """
+        before = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not before:
+            return 0
+        
+        # executescript exécute le PRAGMA jusqu'au bout (execute ne libère qu'une page)
+        self.conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+        
+        after = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return before - after
+    
+    @_on_writer
+    def is_auto_vacuum_pending(self) -> bool:
+        """
+        Indique si la conversion en auto_vacuum incrémental reste à faire.
+        
+        Returns:
+            bool: True si la migration v5 l'a programmée
+        """
+        return self.get_metadata(AUTO_VACUUM_PENDING_KEY) is not None
+    
+    @_on_writer
+    def convert_auto_vacuum(self) -> bool:
+        """
+        Passe une base existante en auto_vacuum incrémental (VACUUM complet).
+        
+        Bloque l'écrivain le temps de réécrire le fichier : lancé une seule
+        fois par database.retention, pendant l'inactivité ou à la demande.
+        
+        Returns:
+            bool: True si un VACUUM a été nécessaire
+        """
+        self.conn.commit()  # VACUUM impossible dans une transaction
+        
+        converted = False
+        if self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self.conn.execute("VACUUM")
+            converted = True
+        
+        with self.conn:
+            self.conn.execute("DELETE FROM metadata WHERE key = ?", (AUTO_VACUUM_PENDING_KEY,))
+        return converted
+    
+    @_on_writer
+    def get_storage_stats(self) -> Dict:
+        """
+        Récupère l'occupation du fichier de base de données.
+        
+        Returns:
+            Dict: page_size (octets), page_count, freelist_count, db_size_mb, free_mb
+        """
+        page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist_count = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        
+        return {
+            'page_size': page_size,
+            'page_count': page_count,
+            'freelist_count': freelist_count,
+            'db_size_mb': page_size * page_count / (1024 * 1024),
+            'free_mb': page_size * freelist_count / (1024 * 1024),
+        }
+    
+    @_on_writer
+    def delete_session(self, session_id: str) -> int:
+        """
+        Supprime les conversations et messages en cache d'un compte.
+        
+        Args:
+            session_id: ID de la session
+            
+        Returns:
+            int: Nombre de lignes supprimées
+        """
+        with self.conn:
+            messages = self.conn.execute(
+                "DELETE FROM messages WHERE session_id = ?", (session_id,)
+            ).rowcount
+            conversations = self.conn.execute(
+                "DELETE FROM conversations WHERE session_id = ?", (session_id,)
+            ).rowcount
+            self.conn.execute(
+                "DELETE FROM metadata WHERE key = ?", (f"last_sync_{session_id}",)
+            )
+            self.conn.execute(
+                "DELETE FROM entities WHERE session_id = ?", (session_id,)
+            )
+            self.conn.execute(
+                "DELETE FROM dialogs WHERE session_id = ?", (session_id,)
+            )
+            self.conn.execute(
+                "DELETE FROM scheduled_messages WHERE session_id = ?", (session_id,)
+            )
+            self.conn.execute(
+                "DELETE FROM scheduled_chats WHERE session_id = ?", (session_id,)
+            )
+        
+        logger.info(f"Cache du compte {session_id} supprimé : {conversations} conversation(s), {messages} message(s)")
+        return messages + conversations
+    
+    @_on_writer
     def vacuum(self):
-        """Optimise la base de données (libère l'espace)."""
+        """
+        Optimise la base de données (libère l'espace).
+        
+        VACUUM complet et bloquant : préférer incremental_vacuum, lancé
+        par petites étapes par database.retention.
+        """
         self.conn.execute("VACUUM")
         logger.info("Base de données optimisée (VACUUM)")
     
+    @_on_writer
     def get_stats(self) -> Dict:
         """
         Récupère les statistiques de la base de données.
         
+        Lues dans la table counters (tenue par triggers) : aucun COUNT(*).
+        
         Returns:
             Dict: Statistiques
         """
-        stats = {}
-        
-        # Nombre de conversations
-        cursor = self.conn.execute("SELECT COUNT(*) FROM conversations")
-        stats['conversations_count'] = cursor.fetchone()[0]
-        
-        # Nombre de messages
-        cursor = self.conn.execute("SELECT COUNT(*) FROM messages")
-        stats['messages_count'] = cursor.fetchone()[0]
-        
-        # Nombre de photos
-        cursor = self.conn.execute("SELECT COUNT(*) FROM profile_photos")
-        stats['photos_count'] = cursor.fetchone()[0]
+        totals = dict.fromkeys(('conversations', 'messages', 'unread', 'photos', 'photo_bytes'), 0)
+        cursor = self.conn.execute(f"""
+            SELECT name, SUM(value) FROM counters
+            WHERE name IN ({','.join('?' * len(totals))})
+            GROUP BY name
+        """, tuple(totals))
+        totals.update(cursor.fetchall())
+        
+        stats = {
+            'conversations_count': totals['conversations'],
+            'messages_count': totals['messages'],
+            'unread_count': totals['unread'],
+            'photos_count': totals['photos'],
+            'photos_size_mb': totals['photo_bytes'] / (1024 * 1024),
+        }
         
         # Taille de la DB
         stats['db_size_mb'] = self.db_path.stat().st_size / (1024 * 1024) if self.db_path.exists() else 0
         
         return stats
     
+    @_on_writer
+    def get_unread_totals(self, session_ids: List[str]) -> Dict[str, int]:
+        """
+        Récupère le total de messages non lus par compte (badges).
+        
+        Lecture directe de la table counters, quel que soit le volume en cache.
+        
+        Args:
+            session_ids: Liste des IDs de session
+            
+        Returns:
+            Dict[str, int]: Non lus par session_id (0 si aucune conversation)
+        """
+        totals = dict.fromkeys(session_ids, 0)
+        if not session_ids:
+            return totals
+        
+        placeholders = ','.join('?' * len(session_ids))
+        cursor = self.conn.execute(f"""
+            SELECT session_id, value FROM counters
+            WHERE name = 'unread' AND session_id IN ({placeholders})
+        """, list(session_ids))
+        
+        totals.update(cursor.fetchall())
+        return totals
+    
     def close(self):
         """Ferme la connexion à la base de données."""
         if self.conn:
             self.conn.close()
-            logger.info("Connexion à la base de données fermée")
+            if self.read_only:
+                logger.debug("Connexion de lecture fermée")
+            else:
+                logger.info("Connexion à la base de données fermée")
 
 
 # Instance globale (singleton)
@@ -687,6 +2417,7 @@ def get_telegram_db() -> TelegramDatabase:
     """
     global _db_instance
     if _db_instance is None:
-        _db_instance = TelegramDatabase()
+        # Migrations lancées sur le thread écrivain par database.async_db
+        _db_instance = TelegramDatabase(migrate=False)
     return _db_instance
 
@@ -0,0 +1,81 @@
+"""
+Conversion des dates stockées en base (millisecondes epoch, entiers).
+
+Les dates sont conservées en entiers dans SQLite : tri et comparaisons
+directs dans les index, aucun parsing à la lecture. La conversion en
+datetime n'a lieu qu'à l'affichage, via as_datetime().
+"""
+from datetime import datetime
+from typing import Optional, Union
+
+from utils.logger import get_logger
+
+logger = get_logger()
+
+DateValue = Union[datetime, int, float, str, None]
+
+
+def to_epoch_ms(value: DateValue) -> Optional[int]:
+    """
+    Convertit une date en millisecondes epoch.
+
+    Les datetime naïfs sont interprétés en heure locale (format de
+    l'application). Les chaînes ISO (anciennes bases) sont acceptées.
+
+    Args:
+        value: datetime, millisecondes epoch, chaîne ISO ou None
+
+    Returns:
+        Optional[int]: Millisecondes epoch ou None si absente/invalide
+    """
+    if value is None or value == "":
+        return None
+
+    if isinstance(value, bool):
+        logger.warning(f"Date invalide ignorée : {value!r}")
+        return None
+
+    if isinstance(value, (int, float)):
+        return int(value)
+
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            logger.warning(f"Date invalide ignorée : {value!r}")
+            return None
+
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1000)
+
+    logger.warning(f"Date invalide ignorée : {value!r}")
+    return None
+
+
+def as_datetime(value: DateValue) -> Optional[datetime]:
+    """
+    Convertit une date stockée en datetime local naïf (pour l'affichage).
+
+    Args:
+        value: Millisecondes epoch, datetime, chaîne ISO ou None
+
+    Returns:
+        Optional[datetime]: Date locale naïve ou None
+    """
+    if value is None or value == "":
+        return None
+
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            return value.astimezone().replace(tzinfo=None)
+        return value
+
+    ms = to_epoch_ms(value)
+    if ms is None:
+        return None
+
+    try:
+        return datetime.fromtimestamp(ms / 1000)
+    except (OverflowError, OSError, ValueError):
+        logger.warning(f"Date hors limites ignorée : {value!r}")
+        return None
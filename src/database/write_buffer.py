@@ -0,0 +1,432 @@
+"""
+Tampon d'écriture des mises à jour temps réel.
+
+Les événements Telethon (nouveaux messages, éditions, lectures, titres)
+sont regroupés par conversation (session, chat) puis écrits en une seule
+transaction toutes les FLUSH_INTERVAL_MS millisecondes ou dès que
+FLUSH_MAX_EVENTS événements sont en attente : un commit par lot au lieu
+de trois écritures par message reçu.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from database.async_db import AsyncTelegramDatabase, get_async_db
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# Délai maximum avant écriture d'un événement
+FLUSH_INTERVAL_MS = 250
+
+# Nombre d'événements déclenchant une écriture immédiate
+FLUSH_MAX_EVENTS = 500
+
+# Écritures échouées tolérées pour une conversation avant abandon de ses mises à jour
+FLUSH_MAX_RETRIES = 5
+
+
+@dataclass
+class PendingChatUpdate:
+    """Mises à jour fusionnées d'une conversation en attente d'écriture."""
+    session_id: str
+    chat_id: int
+    messages: Dict[int, Dict] = field(default_factory=dict)  # {message_id: message}
+    edits: Dict[int, str] = field(default_factory=dict)  # {message_id: texte}
+    last_message: Optional[Tuple[str, datetime, bool]] = None  # (texte, date, from_me)
+    unread_delta: int = 0
+    reset_unread: bool = False  # unread_count remis à 0 avant d'ajouter unread_delta
+    title: Optional[str] = None
+    photo_changed: bool = False
+    failed_attempts: int = 0  # Écritures échouées (réessai au prochain cycle)
+
+    def merge_newer(self, newer: 'PendingChatUpdate') -> 'PendingChatUpdate':
+        """
+        Fusionne une entrée plus récente dans celle-ci (la plus récente l'emporte).
+
+        Args:
+            newer: Mises à jour arrivées après celles-ci
+
+        Returns:
+            PendingChatUpdate: self, complété
+        """
+        self.messages.update(newer.messages)
+        for message_id, text in newer.edits.items():
+            buffered = self.messages.get(message_id)
+            if buffered is not None:
+                buffered['text'] = text
+                buffered['edited'] = True
+            else:
+                self.edits[message_id] = text
+        if newer.last_message is not None:
+            self.last_message = newer.last_message
+        if newer.reset_unread:
+            self.reset_unread = True
+            self.unread_delta = newer.unread_delta
+        else:
+            self.unread_delta += newer.unread_delta
+        if newer.title is not None:
+            self.title = newer.title
+        self.photo_changed = self.photo_changed or newer.photo_changed
+        return self
+
+
+class WriteBuffer:
+    """
+    Regroupe les écritures temps réel et les applique par lots.
+
+    Règles de fusion par conversation :
+    - dernier message : le dernier reçu l'emporte
+    - non lus : les incréments sont additionnés, une lecture les remet à 0
+    - éditions et titre : la dernière valeur l'emporte
+
+    Une conversation dont l'écriture échoue (la base rejoue le lot
+    conversation par conversation) est refusionnée dans les mises à jour
+    en attente et réessayée au cycle suivant, FLUSH_MAX_RETRIES fois au
+    plus ; les autres conversations du lot sont écrites. Les rappels
+    after_flush ne sont appelés qu'une fois le lot écrit, pour que
+    l'interface relise une base à jour.
+    """
+
+    def __init__(
+        self,
+        db: AsyncTelegramDatabase,
+        flush_interval_ms: int = FLUSH_INTERVAL_MS,
+        max_events: int = FLUSH_MAX_EVENTS
+    ):
+        """
+        Initialise le tampon.
+
+        Args:
+            db: Façade asynchrone de la base
+            flush_interval_ms: Délai maximum avant écriture (ms)
+            max_events: Nombre d'événements déclenchant une écriture immédiate
+        """
+        self.db = db
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_events = max_events
+
+        self._pending: Dict[Tuple[str, int], PendingChatUpdate] = {}
+        self._pending_events = 0
+        self._flush_lock = asyncio.Lock()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._after_flush: List[Callable[[], None]] = []
+
+        # Métriques
+        self._flush_count = 0
+        self._failed_flushes = 0
+        self._dropped_chats = 0
+        self._events_written = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        self._last_batch_size = 0
+        self._max_batch_size = 0
+
+    # ==================== ÉVÉNEMENTS ====================
+
+    def _entry(self, session_id: str, chat_id: int) -> PendingChatUpdate:
+        """Récupère (ou crée) l'entrée en attente d'une conversation."""
+        key = (session_id, chat_id)
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = PendingChatUpdate(session_id, chat_id)
+            self._pending[key] = entry
+        return entry
+
+    def add_message(
+        self,
+        session_id: str,
+        chat_id: int,
+        message: Dict,
+        preview: str,
+        count_unread: bool = True
+    ) -> None:
+        """
+        Ajoute un nouveau message (et met à jour le dernier message du chat).
+
+        Args:
+            session_id: ID de la session
+            chat_id: ID du chat
+            message: Message (format API)
+            preview: Aperçu affiché dans la liste des conversations
+            count_unread: Incrémenter le compteur de non lus
+        """
+        entry = self._entry(session_id, chat_id)
+        entry.messages[message['id']] = message
+        entry.last_message = (preview, message['date'], message.get('from_me', False))
+        if count_unread:
+            entry.unread_delta += 1
+        self._on_event()
+
+    def edit_message(self, session_id: str, chat_id: int, message_id: int, text: str) -> None:
+        """
+        Enregistre l'édition d'un message.
+
+        Args:
+            session_id: ID de la session
+            chat_id: ID du chat
+            message_id: ID du message
+            text: Nouveau texte
+        """
+        entry = self._entry(session_id, chat_id)
+
+        buffered = entry.messages.get(message_id)
+        if buffered is not None:
+            # Message pas encore écrit : l'édition s'applique directement
+            buffered['text'] = text
+            buffered['edited'] = True
+        else:
+            entry.edits[message_id] = text
+        self._on_event()
+
+    def mark_read(self, session_id: str, chat_id: int) -> None:
+        """
+        Enregistre la lecture d'une conversation (non lus remis à 0).
+
+        Args:
+            session_id: ID de la session
+            chat_id: ID du chat
+        """
+        entry = self._entry(session_id, chat_id)
+        entry.reset_unread = True
+        entry.unread_delta = 0
+        self._on_event()
+
+    def set_title(self, session_id: str, chat_id: int, title: str) -> None:
+        """
+        Enregistre le changement de titre d'une conversation.
+
+        Args:
+            session_id: ID de la session
+            chat_id: ID du chat
+            title: Nouveau titre
+        """
+        self._entry(session_id, chat_id).title = title
+        self._on_event()
+
+    def invalidate_photo(self, session_id: str, chat_id: int) -> None:
+        """
+        Enregistre le changement de photo d'une conversation.
+
+        Args:
+            session_id: ID de la session
+            chat_id: ID du chat
+        """
+        self._entry(session_id, chat_id).photo_changed = True
+        self._on_event()
+
+    def after_flush(self, callback: Callable[[], None]) -> None:
+        """
+        Appelle `callback` une fois les mises à jour en attente écrites en base.
+
+        Args:
+            callback: Fonction sans argument (notification de l'interface)
+        """
+        if not self._pending and not self._flush_lock.locked():
+            self._run_callbacks([callback])
+            return
+        self._after_flush.append(callback)
+        self._arm_timer()
+
+    @staticmethod
+    def _run_callbacks(callbacks: List[Callable[[], None]]) -> None:
+        """Appelle les rappels en isolant leurs erreurs."""
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Erreur rappel après écriture du tampon: {e}")
+
+    # ==================== ÉCRITURE ====================
+
+    def _on_event(self) -> None:
+        """Planifie l'écriture (immédiate si le seuil d'événements est atteint)."""
+        self._pending_events += 1
+
+        if self._pending_events >= self.max_events:
+            self._start_flush()
+        else:
+            self._arm_timer()
+
+    def _arm_timer(self) -> None:
+        """Planifie une écriture dans flush_interval si aucune n'est prévue."""
+        if self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.flush_interval, self._start_flush)
+
+    def _start_flush(self) -> None:
+        """Lance les écritures en tâche de fond (une seule tâche à la fois)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        """Écrit tant que le seuil est atteint, puis réarme le minuteur."""
+        while True:
+            await self.flush()
+            if self._pending_events < self.max_events:
+                break
+
+        # Événements arrivés pendant l'écriture, sous le seuil
+        if self._pending:
+            self._arm_timer()
+
+    async def flush(self) -> int:
+        """
+        Écrit toutes les mises à jour en attente en une transaction.
+
+        Returns:
+            int: Nombre d'événements écrits
+        """
+        async with self._flush_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            if not self._pending:
+                callbacks, self._after_flush = self._after_flush, []
+                self._run_callbacks(callbacks)
+                return 0
+
+            pending = self._pending
+            batch = list(pending.values())
+            events = self._pending_events
+            callbacks = self._after_flush
+            self._pending = {}
+            self._pending_events = 0
+            self._after_flush = []
+
+            start = time.perf_counter()
+            try:
+                failed = await self.db.apply_chat_updates(batch)
+            except Exception as e:
+                self._failed_flushes += 1
+                logger.error(f"Erreur écriture du tampon temps réel ({events} événement(s)): {e}")
+                self._requeue(pending, events, callbacks)
+                return 0
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            if failed:
+                # Seules les conversations en échec sont réessayées (et décomptées)
+                self._failed_flushes += 1
+                failed_keys = {(update.session_id, update.chat_id) for update in failed}
+                logger.warning(
+                    f"Tampon temps réel : {len(failed_keys)} conversation(s) sur "
+                    f"{len(batch)} non écrite(s), réessai au prochain cycle"
+                )
+                self._requeue(
+                    {key: pending[key] for key in failed_keys},
+                    len(failed_keys),
+                    callbacks
+                )
+                events = max(events - len(failed_keys), 0)
+                callbacks = []
+
+            self._flush_count += 1
+            self._events_written += events
+            self._last_flush_ms = elapsed_ms
+            self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+            self._last_batch_size = events
+            self._max_batch_size = max(self._max_batch_size, events)
+
+            logger.debug(
+                f"Tampon temps réel écrit : {events} événement(s), "
+                f"{len(batch)} conversation(s) en {elapsed_ms:.1f} ms"
+            )
+
+        self._run_callbacks(callbacks)
+        return events
+
+    def _requeue(
+        self,
+        failed: Dict[Tuple[str, int], PendingChatUpdate],
+        events: int,
+        callbacks: List[Callable[[], None]]
+    ) -> None:
+        """
+        Remet un lot non écrit en attente, sous les mises à jour arrivées
+        pendant l'écriture (les plus récentes l'emportent).
+        """
+        merged: Dict[Tuple[str, int], PendingChatUpdate] = {}
+        for key, entry in failed.items():
+            entry.failed_attempts += 1
+            if entry.failed_attempts > FLUSH_MAX_RETRIES:
+                self._dropped_chats += 1
+                logger.error(
+                    f"Mises à jour abandonnées après {FLUSH_MAX_RETRIES} échecs : "
+                    f"chat {entry.chat_id} ({entry.session_id})"
+                )
+                continue
+            merged[key] = entry
+
+        for key, newer in self._pending.items():
+            older = merged.get(key)
+            merged[key] = older.merge_newer(newer) if older is not None else newer
+
+        self._pending = merged
+        self._pending_events += events
+        self._after_flush = callbacks + self._after_flush
+
+        if self._pending:
+            self._arm_timer()
+        else:
+            # Tout a été abandonné : ne pas bloquer l'interface
+            callbacks, self._after_flush = self._after_flush, []
+            self._run_callbacks(callbacks)
+
+    async def close(self) -> None:
+        """Écrit les mises à jour restantes (à appeler avant close_async_db)."""
+        await self.flush()
+
+    def get_stats(self) -> Dict:
+        """
+        Récupère les métriques du tampon.
+
+        Returns:
+            Dict: Statistiques (latences en ms, tailles de lot en événements)
+        """
+        return {
+            'pending_events': self._pending_events,
+            'pending_chats': len(self._pending),
+            'flush_count': self._flush_count,
+            'failed_flushes': self._failed_flushes,
+            'dropped_chats': self._dropped_chats,
+            'events_written': self._events_written,
+            'last_flush_ms': round(self._last_flush_ms, 2),
+            'max_flush_ms': round(self._max_flush_ms, 2),
+            'avg_flush_ms': round(self._total_flush_ms / self._flush_count, 2) if self._flush_count else 0.0,
+            'last_batch_size': self._last_batch_size,
+            'max_batch_size': self._max_batch_size,
+            'avg_batch_size': round(self._events_written / self._flush_count, 1) if self._flush_count else 0.0,
+        }
+
+
+# Instance globale (singleton)
+_write_buffer_instance = None
+
+
+def get_write_buffer() -> WriteBuffer:
+    """
+    Récupère l'instance globale du tampon d'écriture.
+
+    Returns:
+        WriteBuffer: Tampon lié à get_async_db()
+    """
+    global _write_buffer_instance
+    if _write_buffer_instance is None:
+        _write_buffer_instance = WriteBuffer(get_async_db())
+    return _write_buffer_instance
+
+
+async def close_write_buffer() -> None:
+    """Écrit les mises à jour restantes du tampon global (à la fermeture)."""
+    if _write_buffer_instance is not None:
+        await _write_buffer_instance.close()
@@ -126,6 +126,17 @@ def main() -> None:
     static_dir.mkdir(parents=True, exist_ok=True)
     nicegui_app.add_static_files('/static', str(static_dir))
 
+    # Rétention du cache en tâche de fond (purge par lots, vacuum incrémental)
+    from database.retention import start_retention_job, stop_retention_job
+    nicegui_app.on_startup(start_retention_job)
+
+    # Vider le tampon temps réel puis la file d'écriture SQLite avant la fermeture
+    from database.async_db import close_async_db
+    from database.write_buffer import close_write_buffer
+    nicegui_app.on_shutdown(stop_retention_job)
+    nicegui_app.on_shutdown(close_write_buffer)
+    nicegui_app.on_shutdown(close_async_db)
+
     app = AutoTeleApp()
 
     # Ajouter Material Icons directement dans le head
@@ -12,12 +12,15 @@ class DialogService:
     """Service pour gérer les dialogues Telegram."""
     
     @staticmethod
-    async def get_dialogs(account: TelegramAccount) -> List[Dict]:
+    async def get_dialogs(account: TelegramAccount, full_refresh: bool = False) -> List[Dict]:
         """
         Récupère tous les dialogues d'un compte.
         
+        Servis depuis la base locale (voir TelegramAccount.get_dialogs).
+        
         Args:
             account: Compte Telegram
+            full_refresh: Resynchronisation complète depuis Telegram
             
         Returns:
             List[Dict]: Liste des dialogues
@@ -27,7 +30,7 @@ class DialogService:
             return []
         
         try:
-            dialogs = await account.get_dialogs()            
+            dialogs = await account.get_dialogs(full_refresh=full_refresh)
             return dialogs
         except Exception as e:
             logger.error(f"Erreur récupération dialogues: {e}")
@@ -1,148 +1,323 @@
-"""Service de gestion des messages programmés avec rate limiting global."""
+"""Service de gestion des messages programmés avec rate limiting hiérarchique."""
 import asyncio
+import heapq
+import itertools
 import random
 import time
-from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple
+from collections import Counter, deque
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
 from core.telegram.account import TelegramAccount
+from core.telegram.send_result import SendResult, SendStatus
 from utils.constants import (
-    TELEGRAM_GLOBAL_RATE_LIMIT,
-    TELEGRAM_SAFETY_MARGIN
+    TELEGRAM_SEND_PIPELINE_DEPTH,
+    TELEGRAM_SEND_RETRY_BACKOFF,
+    TELEGRAM_SEND_RETRY_BUDGET
 )
 from utils.logger import get_logger
+from utils.rate_limiter import get_rate_limiter
 
 logger = get_logger()
 
+# Méthode du rate limiter pour les envois de campagne (bloquée pendant un FloodWait)
+SEND_METHOD = 'send_scheduled'
 
-class GlobalRateLimiter:
-    """
-    Rate limiter global adaptatif avec attente non-bloquante.
-
-    S'adapte automatiquement après un FloodWait pour éviter les répétitions.
-    """
+_MASK_64 = 0xFFFFFFFFFFFFFFFF
 
-    def __init__(self):
-        """Initialise le rate limiter global."""
-        self._lock = None
-        self._active_accounts = set()
-        self._last_request_time = 0.0
 
-        # Limite globale fixe
-        self._global_rate_limit = (
-            TELEGRAM_GLOBAL_RATE_LIMIT * TELEGRAM_SAFETY_MARGIN
-        )
-        self._min_delay = 1.0 / self._global_rate_limit
-
-        # Système adaptatif par compte
-        self._account_flood_counts: Dict[str, int] = {}
-        self._account_penalty_multipliers: Dict[str, float] = {}
-        self._account_successful_since_flood: Dict[str, int] = {}
-        self._recovery_threshold = 50
+def _permutation(n: int, seed: int) -> Iterator[int]:
+    """
+    Parcourt range(n) dans un ordre pseudo-aléatoire, en mémoire constante.
     
-    def _get_lock(self):
-        """Crée ou récupère le lock global."""
-        if self._lock is None:
-            self._lock = asyncio.Lock()
-        return self._lock
+    Réseau de Feistel à 4 tours sur le plus petit domaine 2^(2k) >= n ; les
+    valeurs hors de range(n) sont ré-chiffrées jusqu'à y revenir (cycle
+    walking), ce qui reste une bijection. Le domaine faisant moins de 4n,
+    il faut en moyenne moins de 4 passages par valeur.
+    """
+    if n <= 1:
+        yield from range(n)
+        return
     
-    def register_account(self, account_id: str) -> None:
-        """Enregistre un compte comme actif et initialise ses compteurs."""
-        self._active_accounts.add(account_id)
-
-        # Initialiser les compteurs adaptatifs pour ce compte
-        if account_id not in self._account_flood_counts:
-            self._account_flood_counts[account_id] = 0
-            self._account_penalty_multipliers[account_id] = 1.0
-            self._account_successful_since_flood[account_id] = 0
-
-    def unregister_account(self, account_id: str) -> None:
-        """Désenregistre un compte actif."""
-        self._active_accounts.discard(account_id)
+    half_bits = max(1, ((n - 1).bit_length() + 1) // 2)
+    half_mask = (1 << half_bits) - 1
+    rng = random.Random(seed)
+    keys = [rng.getrandbits(64) for _ in range(4)]
     
-    def report_flood(self, account_id: str) -> None:
-        """
-        Signale qu'un FloodWait a été détecté pour ce compte.
-
-        Ralentit automatiquement le débit pour éviter les répétitions.
-        """
-        self._account_flood_counts[account_id] = (
-            self._account_flood_counts.get(account_id, 0) + 1
-        )
-        old_penalty = self._account_penalty_multipliers.get(account_id, 1.0)
-
-        # Augmenter la pénalité : multiplier par 1.5 à chaque flood (max 4.0)
-        new_penalty = min(old_penalty * 1.5, 4.0)
-        self._account_penalty_multipliers[account_id] = new_penalty
-        self._account_successful_since_flood[account_id] = 0
+    def encrypt(x: int) -> int:
+        left, right = x >> half_bits, x & half_mask
+        for key in keys:
+            # Fonction de tour : finaliseur splitmix64
+            mixed = (right + key) & _MASK_64
+            mixed = ((mixed ^ (mixed >> 30)) * 0xBF58476D1CE4E5B9) & _MASK_64
+            mixed = ((mixed ^ (mixed >> 27)) * 0x94D049BB133111EB) & _MASK_64
+            mixed ^= mixed >> 31
+            left, right = right, (left ^ mixed) & half_mask
+        return (left << half_bits) | right
+    
+    for i in range(n):
+        x = encrypt(i)
+        while x >= n:
+            x = encrypt(x)
+        yield x
 
-        new_rate = self._global_rate_limit / new_penalty
-        logger.warning(
-            f"FloodWait #{self._account_flood_counts[account_id]} détecté → "
-            f"Débit réduit: {new_rate:.1f} req/s "
-            f"(pénalité ×{new_penalty:.1f})"
-        )
 
-    def report_success(self, account_id: str) -> None:
-        """Signale un envoi réussi et récupère progressivement le débit."""
-        if account_id not in self._account_successful_since_flood:
-            return
+def shuffled_schedule_pairs(
+    dates: Sequence[datetime],
+    group_ids: Sequence[int],
+    seed: Optional[int] = None
+) -> Iterator[Tuple[datetime, int]]:
+    """
+    Génère toutes les paires (date, groupe) dans un ordre aléatoire sans les
+    matérialiser (mémoire en O(groupes + dates) au lieu de O(groupes × dates)).
+    
+    Args:
+        dates: Dates de planification
+        group_ids: IDs des groupes
+        seed: Graine de la permutation (aléatoire si None)
+    """
+    group_count = len(group_ids)
+    if seed is None:
+        seed = random.getrandbits(64)
+    for index in _permutation(len(dates) * group_count, seed):
+        date_index, group_index = divmod(index, group_count)
+        yield dates[date_index], group_ids[group_index]
 
-        self._account_successful_since_flood[account_id] += 1
-        successes = self._account_successful_since_flood[account_id]
-        penalty = self._account_penalty_multipliers.get(account_id, 1.0)
 
-        # Récupération progressive : tous les 50 succès, réduire de 20%
-        if successes >= self._recovery_threshold and penalty > 1.0:
-            new_penalty = max(penalty * 0.8, 1.0)
-            self._account_penalty_multipliers[account_id] = new_penalty
-            self._account_successful_since_flood[account_id] = 0
-            
+class _SendPipeline:
+    """
+    Envoi pipeliné des paires (date, groupe) d'une campagne pour un compte.
+    
+    Plusieurs requêtes restent en vol en même temps (chacune attend son slot
+    auprès du rate limiter), si bien que le débit n'est plus borné par la
+    latence aller-retour. Un groupe n'a jamais plus d'un envoi en cours : les
+    paires d'un groupe occupé sont mises de côté puis envoyées dans l'ordre.
+    
+    Une paire touchée par un FloodWait part dans une file différée jusqu'à
+    son heure de reprise, avec un nombre de réessais limité et un délai qui
+    double à chaque tentative. Pendant ce temps les autres groupes continuent
+    (mode lent d'un groupe) ou le rate limiter suspend les envois du compte
+    (FloodWait sur la méthode d'envoi).
+    """
     
-    async def _calculate_wait_time(self, account_id: str) -> float:
+    def __init__(
+        self,
+        account: TelegramAccount,
+        message: str,
+        pairs: Iterable[Tuple[datetime, int]],
+        group_remaining: Dict[int, int],
+        total: int,
+        file_path: Optional[str],
+        uploaded_file,
+        on_progress: Optional[callable],
+        cancelled_flag: Optional[Dict],
+        task: Optional['SendingTask'],
+        max_retries: int = TELEGRAM_SEND_RETRY_BUDGET
+    ):
+        self.account = account
+        self.message = message
+        self.pairs = iter(pairs)
+        self.group_remaining = group_remaining
+        self.total = total
+        self.file_path = file_path
+        self.uploaded_file = uploaded_file
+        self.on_progress = on_progress
+        self.cancelled_flag = cancelled_flag
+        self.task = task
+        self.max_retries = max_retries
+        self.rate_limiter = get_rate_limiter()
+        
+        self.sent = 0
+        self.skipped = 0
+        self.failed_groups: Set[int] = set()
+        self.retried = 0  # Nouvelles tentatives après FloodWait
+        self.failed = 0  # Messages abandonnés (erreur ou réessais épuisés)
+        
+        # Groupes avec un envoi en cours (ou différé) et paires mises de côté pour eux
+        self._busy_groups: Set[int] = set()
+        self._held: Dict[int, Deque[Tuple[datetime, int]]] = {}
+        # File différée : (reprise, ordre d'arrivée, paire, tentatives)
+        self._deferred: List[Tuple[float, int, Tuple[datetime, int], int]] = []
+        self._deferred_seq = itertools.count()
+        self._flood_until = 0.0
+    
+    async def run(self, depth: int) -> None:
+        """Envoie toutes les paires avec au plus `depth` requêtes en vol."""
+        workers = [asyncio.create_task(self._worker()) for _ in range(max(1, depth))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+    
+    def _cancelled(self) -> bool:
+        return bool(self.cancelled_flag and self.cancelled_flag.get('value'))
+    
+    def _progress(self) -> None:
+        if self.on_progress:
+            self.on_progress(self.sent, self.total, self.skipped, self.failed_groups, {
+                'deferred': len(self._deferred),
+                'retried': self.retried,
+                'failed': self.failed,
+            })
+    
+    def _skip(self, group_id: int) -> None:
+        """Compte une paire d'un groupe exclu comme ignorée."""
+        self.group_remaining[group_id] -= 1
+        self.skipped += 1
+        self._progress()
+    
+    async def _next_pair(
+        self,
+        group_id: Optional[int] = None
+    ) -> Optional[Tuple[Tuple[datetime, int], int]]:
         """
-        Calcule le temps d'attente avec pénalité adaptative (thread-safe).
+        Prochaine paire à envoyer avec son nombre de tentatives : d'abord celles
+        mises de côté pour le groupe qui vient de se libérer, puis les paires
+        différées arrivées à échéance, puis la suite de la campagne. Quand il
+        ne reste que des paires différées, attend la première reprise.
         """
-        async with self._get_lock():
-            penalty = self._account_penalty_multipliers.get(account_id, 1.0)
-            adjusted_delay = self._min_delay * penalty
-
-            now = time.time()
-            if self._last_request_time > 0:
-                elapsed = now - self._last_request_time
-                if elapsed < adjusted_delay:
-                    return adjusted_delay - elapsed
-            return 0.0
-
-    @asynccontextmanager
-    async def request_slot(self, account_id: str):
+        while not self._cancelled():
+            held = self._held.get(group_id)
+            while held:
+                pair = held.popleft()
+                if group_id not in self.failed_groups:
+                    return pair, 0
+                self._skip(group_id)
+            self._held.pop(group_id, None)
+            group_id = None
+            
+            if self._deferred and self._deferred[0][0] <= time.monotonic():
+                _, _, pair, attempts = heapq.heappop(self._deferred)
+                return pair, attempts
+            
+            for pair in self.pairs:
+                pair_group = pair[1]
+                if pair_group in self.failed_groups:
+                    self._skip(pair_group)
+                elif pair_group in self._busy_groups:
+                    self._held.setdefault(pair_group, deque()).append(pair)
+                else:
+                    return pair, 0
+                if self._cancelled():
+                    return None
+            
+            if not self._deferred:
+                return None
+            # Réveil régulier pour rester réactif à l'annulation
+            await asyncio.sleep(min(1.0, max(0.0, self._deferred[0][0] - time.monotonic())))
+        return None
+    
+    async def _worker(self) -> None:
+        """Envoie des paires tant qu'il en reste, un groupe à la fois."""
+        item = await self._next_pair()
+        while item is not None:
+            pair, attempts = item
+            group_id = pair[1]
+            self._busy_groups.add(group_id)
+            deferred = False
+            try:
+                deferred = await self._send(pair, attempts)
+            finally:
+                # Un groupe différé reste réservé pour préserver l'ordre de ses messages
+                if not deferred:
+                    self._busy_groups.discard(group_id)
+            item = await self._next_pair(None if deferred else group_id)
+    
+    async def _schedule(self, dt: datetime, group_id: int) -> SendResult:
+        """Attend son slot puis programme un message."""
+        async with self.rate_limiter.request_slot(
+            self.account.session_id, SEND_METHOD, chat_id=group_id
+        ):
+            return await self.account.schedule_message(
+                group_id,
+                self.message,
+                dt,
+                file_path=self.file_path,
+                uploaded_file=self.uploaded_file
+            )
+    
+    def _defer(self, pair: Tuple[datetime, int], attempts: int, result: SendResult) -> None:
+        """Place une paire dans la file différée et suspend le niveau concerné."""
+        account_id = self.account.session_id
+        group_id = pair[1]
+        delay = result.wait_seconds + TELEGRAM_SEND_RETRY_BACKOFF * 2 ** (attempts - 1)
+        now = time.monotonic()
+        
+        if result.status is SendStatus.SLOW_MODE:
+            # Mode lent : seul ce groupe attend, les autres continuent
+            self.rate_limiter.block(account_id, delay, chat_id=group_id)
+            logger.info(f"Mode lent dans {group_id}: message différé de {delay:.0f}s")
+        else:
+            # FloodWait sur l'envoi : les envois du compte attendent la reprise
+            if now >= self._flood_until:
+                # Un seul signalement pour les envois en vol touchés par le même flood
+                self.rate_limiter.report_flood(account_id)
+            self._flood_until = max(self._flood_until, now + delay)
+            self.rate_limiter.block(account_id, delay, method=SEND_METHOD)
+            logger.warning(f"Flood: envois suspendus {delay:.0f}s (tentative {attempts}/{self.max_retries})")
+            
+            # Signaler l'attente à la tâche (pour affichage UI)
+            if self.task:
+                self.task.set_waiting(int(self._flood_until - now) + 1)
+        
+        heapq.heappush(self._deferred, (now + delay, next(self._deferred_seq), pair, attempts))
+    
+    async def _send(self, pair: Tuple[datetime, int], attempts: int) -> bool:
         """
-        Context manager pour acquérir un slot de requête.
-
-        Les attentes se font EN DEHORS du lock pour ne pas bloquer les
-        autres comptes.
-
-        Usage:
-            async with rate_limiter.request_slot(account_id):
-                await account.schedule_message(...)
+        Envoie une paire et traite son résultat dès qu'il arrive.
+        
+        Returns:
+            bool: True si la paire a été différée (FloodWait)
         """
-        # Calculer et attendre EN DEHORS du lock (avec pénalité adaptative)
-        wait_time = await self._calculate_wait_time(account_id)
-        if wait_time > 0:
-            await asyncio.sleep(wait_time)
-
-        # Lock très court juste pour marquer le slot
-        async with self._get_lock():
-            self._last_request_time = time.time()
-
-        # L'envoi se fait en parallèle avec les autres comptes
-        yield
-
-
-# Instance globale
-_rate_limiter = GlobalRateLimiter()
+        dt, group_id = pair
+        account_id = self.account.session_id
+        if attempts:
+            self.retried += 1
+        else:
+            self.group_remaining[group_id] -= 1
+        
+        try:
+            result = await self._schedule(dt, group_id)
+            
+            if result.success:
+                self.sent += 1
+                # Signaler le succès pour récupération adaptative
+                self.rate_limiter.report_success(account_id)
+                # Effacer l'attente (reprise)
+                if self.task and self.task.waiting_until and not self.task.is_waiting:
+                    self.task.clear_waiting()
+            elif result.status is SendStatus.PERMISSION_DENIED:
+                if group_id not in self.failed_groups:
+                    self.failed_groups.add(group_id)
+                    remaining_for_group = self.group_remaining[group_id]
+                    self.total -= remaining_for_group
+                    logger.warning(
+                        f"Groupe {group_id} exclu: {result.rpc_error} ({remaining_for_group} msg restants retirés)"
+                    )
+                self.skipped += 1
+            elif result.is_flood:
+                if attempts < self.max_retries:
+                    self._defer(pair, attempts + 1, result)
+                    self._progress()
+                    return True
+                self.failed += 1
+                self.skipped += 1
+                logger.error(f"Abandon après {attempts} réessais ({group_id}): {result.error}")
+            else:
+                self.failed_groups.add(group_id)
+                self.failed += 1
+                self.skipped += 1
+        
+        except Exception as e:
+            logger.error(f"Erreur inattendue {group_id}: {e}")
+            self.failed_groups.add(group_id)
+            self.failed += 1
+            self.skipped += 1
+        
+        self._progress()
+        return False
 
 
 class MessageService:
@@ -160,7 +335,30 @@ class MessageService:
         task: Optional['SendingTask'] = None
     ) -> Tuple[int, int, Set[int]]:
         """
-        Envoie des messages programmés avec rate limiting global strict.
+        Envoie des messages programmés ; le compte reste connecté pendant toute la campagne.
+        
+        Voir _send_scheduled_messages.
+        """
+        async with account.in_use() as connected:
+            if not connected:
+                raise ValueError("Le compte n'est pas connecté")
+            return await MessageService._send_scheduled_messages(
+                account, group_ids, message, dates, file_path, on_progress, cancelled_flag, task
+            )
+    
+    @staticmethod
+    async def _send_scheduled_messages(
+        account: TelegramAccount,
+        group_ids: List[int],
+        message: str,
+        dates: List[datetime],
+        file_path: Optional[str] = None,
+        on_progress: Optional[callable] = None,
+        cancelled_flag: Optional[Dict] = None,
+        task: Optional['SendingTask'] = None
+    ) -> Tuple[int, int, Set[int]]:
+        """
+        Envoie des messages programmés avec rate limiting hiérarchique (global, compte, groupe).
         
         Args:
             account: Compte Telegram à utiliser
@@ -168,226 +366,96 @@ class MessageService:
             message: Message à envoyer
             dates: Liste des dates de planification
             file_path: Chemin du fichier à joindre (optionnel)
-            on_progress: Callback pour suivre la progression
+            on_progress: Callback (envoyés, total, ignorés, groupes_en_erreur, compteurs) ;
+                compteurs = {'deferred', 'retried', 'failed'} pour les FloodWait
             cancelled_flag: Dict avec une clé 'value' pour annuler l'envoi
             task: Tâche d'envoi (optionnel, pour afficher les attentes FloodWait)
             
         Returns:
             Tuple[int, int, Set[int]]: (nb_envoyés, nb_skipped, groupes_en_erreur)
         """
-        if not account.is_connected:
-            raise ValueError("Le compte n'est pas connecté")
-        
         account_id = account.session_id
-        _rate_limiter.register_account(account_id)
+        rate_limiter = get_rate_limiter()
         
         # Démarrer le chronomètre pour les métriques de performance
         start_time = time.time()
         
-        try:
-            total_groups = len(group_ids)
-            total_dates = len(dates)
-            initial_total = total_groups * total_dates
-            total = initial_total
-            sent = 0
-            skipped = 0
-            failed_groups: Set[int] = set()
-            
-            # Pré-remplir le cache d'entités pour éviter les cache miss pendant l'envoi
-            cache_filled = 0
-            for group_id in group_ids:
-                if group_id not in account._entity_cache:
-                    try:
-                        entity = await account.client.get_input_entity(group_id)
-                        account._entity_cache[group_id] = entity
-                        cache_filled += 1
-                        # Petit délai pour ne pas surcharger l'API
-                        if cache_filled % 10 == 0:
-                            await asyncio.sleep(0.1)
-                    except Exception as e:
-                        pass
-            
-            # Upload du fichier UNE SEULE FOIS si nécessaire
-            uploaded_file = None
-            if file_path and Path(file_path).exists():
+        total_groups = len(group_ids)
+        total_dates = len(dates)
+        initial_total = total_groups * total_dates
+        
+        # Pré-remplir le cache d'entités pour éviter les cache miss pendant l'envoi :
+        # les pairs déjà vus sont relus en base, seuls les inconnus coûtent un appel
+        await account.entities.warm()
+        cache_filled = 0
+        for group_id in group_ids:
+            if account.entities.get_cached(group_id) is None:
                 try:
-                    async with _rate_limiter.request_slot(account_id):
-                        import mimetypes
-                        from telethon.tl.types import (
-                            InputMediaUploadedDocument, 
-                            DocumentAttributeFilename
-                        )
-                        
-                        # Upload du fichier
-                        file_input = await account.client.upload_file(file_path)
-                        
-                        # Déterminer le type MIME
-                        mime_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
-                        
-                        # Créer les attributs (nom du fichier)
-                        file_name = Path(file_path).name
-                        attributes = [DocumentAttributeFilename(file_name=file_name)]
-                        
-                        # Créer le média uploadé correctement
-                        uploaded_file = InputMediaUploadedDocument(
-                            file=file_input,
-                            mime_type=mime_type,
-                            attributes=attributes
-                        )
+                    await account.get_input_peer(group_id)
+                    cache_filled += 1
+                    # Petit délai pour ne pas surcharger l'API
+                    if cache_filled % 10 == 0:
+                        await asyncio.sleep(0.1)
                 except Exception as e:
-                    logger.warning(f"Échec upload: {e}")
-                    uploaded_file = None
-            
-            # Créer toutes les paires (date, groupe) et les randomiser
-            # Cela évite la détection de pattern de spam par Telegram
-            schedule_pairs = [(dt, group_id) for dt in dates for group_id in group_ids]
-            random.shuffle(schedule_pairs)
-            
-            # Parcourir les paires dans l'ordre randomisé
-            for idx, (dt, group_id) in enumerate(schedule_pairs, 1):
-                if cancelled_flag and cancelled_flag.get('value'):
-                    break
-                
-                # Skip les groupes qui ont déjà échoué
-                if group_id in failed_groups:
-                    skipped += 1
-                    if on_progress:
-                        on_progress(sent, total, skipped, failed_groups)
-                    continue
-                
-                try:
-                    # Acquérir le slot et envoyer (atomique)
-                    async with _rate_limiter.request_slot(account_id):
-                        # Si fichier uploadé, l'utiliser ; sinon utiliser le chemin direct
-                        success, error = await account.schedule_message(
-                            group_id,
-                            message,
-                            dt,
-                            file_path=None if uploaded_file else file_path,
-                            uploaded_file=uploaded_file
-                        )
-                    # Le timestamp est automatiquement enregistré à la sortie du context manager
+                    pass
+        
+        # Upload du fichier UNE SEULE FOIS si nécessaire
+        uploaded_file = None
+        if file_path and Path(file_path).exists():
+            try:
+                async with rate_limiter.request_slot(account_id):
+                    import mimetypes
+                    from telethon.tl.types import (
+                        InputMediaUploadedDocument, 
+                        DocumentAttributeFilename
+                    )
                     
-                    if success:
-                        sent += 1
-                        # Signaler le succès pour récupération adaptative
-                        _rate_limiter.report_success(account_id)
-                        if on_progress:
-                            on_progress(sent, total, skipped, failed_groups)
-                    else:
-                        # Gérer les erreurs
-                        if MessageService._is_permission_error(error):
-                            if group_id not in failed_groups:
-                                failed_groups.add(group_id)
-                                # Calculer combien de messages restants pour ce groupe
-                                remaining_for_group = sum(1 for _, gid in schedule_pairs[idx:] if gid == group_id)
-                                total -= remaining_for_group
-                                logger.warning(
-                                    f"Groupe {group_id} exclu: {error} ({remaining_for_group} msg restants retirés)"
-                                )
-                            skipped += 1
-                        elif MessageService._is_flood_error(error):
-                            # Signaler le flood pour ajustement adaptatif
-                            _rate_limiter.report_flood(account_id)
-                            
-                            # Flood: attendre et réessayer
-                            wait_time = MessageService._extract_wait_time(error)
-                            logger.warning(f"Flood: attente {wait_time}s...")
-                            
-                            # Signaler l'attente à la tâche (pour affichage UI)
-                            if task:
-                                task.set_waiting(wait_time + 2)  # +2s marge de sécurité
-                            
-                            await asyncio.sleep(wait_time)
-                            
-                            # Réessayer avec marge de sécurité supplémentaire
-                            await asyncio.sleep(2.0)  # +2s de sécurité
-                            
-                            # Effacer l'attente (reprise)
-                            if task:
-                                task.clear_waiting()
-                            
-                            async with _rate_limiter.request_slot(account_id):
-                                success, retry_error = await account.schedule_message(
-                                    group_id, message, dt, 
-                                    file_path=None if uploaded_file else file_path,
-                                    uploaded_file=uploaded_file
-                                )
-                            
-                            if success:
-                                sent += 1
-                                _rate_limiter.report_success(account_id)
-                            else:
-                                failed_groups.add(group_id)
-                                skipped += 1
-                                logger.error(f"Réessai échoué: {retry_error}")
-                        else:
-                            failed_groups.add(group_id)
-                            skipped += 1
-                        
-                        if on_progress:
-                            on_progress(sent, total, skipped, failed_groups)
+                    # Upload du fichier
+                    file_input = await account.client.upload_file(file_path)
                     
-                except Exception as e:
-                    logger.error(f"Erreur inattendue {group_id}: {e}")
-                    failed_groups.add(group_id)
-                    skipped += 1
-                    if on_progress:
-                        on_progress(sent, total, skipped, failed_groups)
-            
-            # Calculer les métriques de performance
-            elapsed_time = time.time() - start_time
-            messages_per_second = sent / elapsed_time if elapsed_time > 0 else 0
-            success_rate = (sent / initial_total * 100) if initial_total > 0 else 0
-            
-            return sent, skipped, failed_groups
-            
-        finally:
-            _rate_limiter.unregister_account(account_id)
-    
-    @staticmethod
-    def _is_permission_error(error: str) -> bool:
-        """Vérifie si c'est une erreur de permission."""
-        error_lower = error.lower()
-        return any(x in error_lower for x in [
-            "can't write", "topic_closed", "chat_write_forbidden", "permission"
-        ])
-    
-    @staticmethod
-    def _is_flood_error(error: str) -> bool:
-        """Vérifie si c'est une erreur de flood limit (français et anglais)."""
-        error_lower = error.lower()
-        # Détection anglais : "wait X seconds"
-        english_flood = 'wait' in error_lower and 'seconds' in error_lower
-        # Détection français : "attendez X secondes" ou "rate limit"
-        french_flood = 'attendez' in error_lower and 'secondes' in error_lower
-        rate_limit = 'rate limit' in error_lower
-        
-        return english_flood or french_flood or rate_limit
-    
-    @staticmethod
-    def _extract_wait_time(error: str) -> int:
-        """Extrait le temps d'attente d'une erreur de flood (français et anglais)."""
-        import re
-        error_lower = error.lower()
+                    # Déterminer le type MIME
+                    mime_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+                    
+                    # Créer les attributs (nom du fichier)
+                    file_name = Path(file_path).name
+                    attributes = [DocumentAttributeFilename(file_name=file_name)]
+                    
+                    # Créer le média uploadé correctement
+                    uploaded_file = InputMediaUploadedDocument(
+                        file=file_input,
+                        mime_type=mime_type,
+                        attributes=attributes
+                    )
+            except Exception as e:
+                logger.warning(f"Échec upload: {e}")
+                uploaded_file = None
         
-        # Chercher en anglais : "wait 236 seconds"
-        match = re.search(r'wait\s+(\d+)\s*seconds?', error_lower)
-        if match:
-            return int(match.group(1)) + 5
+        # Paires (date, groupe) dans un ordre aléatoire, générées à la demande
+        # Cela évite la détection de pattern de spam par Telegram
+        schedule_pairs = shuffled_schedule_pairs(dates, group_ids)
         
-        # Chercher format alternatif anglais : "236 seconds"
-        match = re.search(r'(\d+)\s*seconds?', error_lower)
-        if match:
-            return int(match.group(1)) + 5
+        # Envoi pipeliné : plusieurs requêtes en vol, au plus une par groupe
+        pipeline = _SendPipeline(
+            account, message, schedule_pairs,
+            group_remaining={
+                group_id: count * total_dates for group_id, count in Counter(group_ids).items()
+            },
+            total=initial_total,
+            file_path=None if uploaded_file else file_path,
+            uploaded_file=uploaded_file,
+            on_progress=on_progress,
+            cancelled_flag=cancelled_flag,
+            task=task
+        )
+        await pipeline.run(TELEGRAM_SEND_PIPELINE_DEPTH)
+        sent, skipped, failed_groups = pipeline.sent, pipeline.skipped, pipeline.failed_groups
         
-        # Chercher en français : "attendez 236 secondes"
-        match = re.search(r'attendez\s+(\d+)\s*secondes?', error_lower)
-        if match:
-            return int(match.group(1)) + 5
+        # Calculer les métriques de performance
+        elapsed_time = time.time() - start_time
+        messages_per_second = sent / elapsed_time if elapsed_time > 0 else 0
+        success_rate = (sent / initial_total * 100) if initial_total > 0 else 0
         
-        # Si rien trouvé, défaut à 60 secondes
-        return 60
+        return sent, skipped, failed_groups
     
     @staticmethod
     def cleanup_temp_file(file_path: Optional[str]) -> None:
@@ -6,12 +6,13 @@ import asyncio
 import os
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Optional, Callable
+from typing import List, Dict, Optional, Callable, Tuple
 from telethon import events
 from telethon.tl.types import User, Chat, Channel
 
 from core.telegram.account import TelegramAccount
-from database.telegram_db import get_telegram_db
+from database.async_db import get_async_db
+from database.timestamps import to_epoch_ms
 from utils.profile_photo_cache import get_photo_cache
 from utils.logger import get_logger
 from utils.media_validator import MediaValidator
@@ -32,7 +33,8 @@ class MessagingService:
     
     def __init__(self):
         """Initialise le service."""
-        self.db = get_telegram_db()
+        # Façade asynchrone : aucun appel SQLite sur la boucle d'événements
+        self.db = get_async_db()
         self.photo_cache = get_photo_cache()
         self._sync_in_progress = set()  # Sessions en cours de sync
     
@@ -67,14 +69,14 @@ class MessagingService:
             return []
         
         # 1. Charger depuis la DB (instantané)
-        conversations = self.db.get_conversations(
+        conversations = await self.db.get_conversations(
             session_ids,
             include_groups=include_groups,
             limit=limit
         )
         
         # 2. Vérifier si synchronisation nécessaire
-        needs_sync = force_sync or self._needs_sync(session_ids)
+        needs_sync = force_sync or await self._needs_sync(session_ids)
         
         if needs_sync and not force_sync:
             # Lancer sync en arrière-plan (non-bloquant)
@@ -85,7 +87,7 @@ class MessagingService:
             # Sync immédiate demandée
             await self._sync_conversations_background(session_ids, include_groups, telegram_manager)
             # Recharger depuis la DB après sync
-            conversations = self.db.get_conversations(
+            conversations = await self.db.get_conversations(
                 session_ids,
                 include_groups=include_groups,
                 limit=limit
@@ -123,7 +125,7 @@ class MessagingService:
         )
         
         # 2. Lancer téléchargement photos en arrière-plan
-        if account and account.is_connected:
+        if account and account.is_live:  # Pas de réveil d'un compte en veille pour des photos
             asyncio.create_task(
                 self._download_missing_photos(
                     account,
@@ -153,11 +155,10 @@ class MessagingService:
                 entity_id = conv['entity_id']
                 
                 # Vérifier si photo déjà en cache
-                if self.photo_cache.has_photo(entity_id):
-                    cached_path = self.photo_cache.get_photo_path(entity_id)
-                    if cached_path:
-                        conv['profile_photo'] = cached_path
-                        conv['has_photo'] = True
+                cached_path = await self.photo_cache.get_photo_path(entity_id)
+                if cached_path:
+                    conv['profile_photo'] = cached_path
+                    conv['has_photo'] = True
                     continue
                 
                 # Télécharger la photo
@@ -178,7 +179,7 @@ class MessagingService:
                         conv['has_photo'] = True
                         
                         # Mettre à jour dans la DB
-                        self.db.conn.execute("""
+                        await self.db.execute_write("""
                             UPDATE conversations
                             SET profile_photo_path = ?, has_photo = 1
                             WHERE entity_id = ?
@@ -194,7 +195,7 @@ class MessagingService:
         except Exception as e:
             logger.error(f"Erreur téléchargement photos: {e}")
     
-    def _needs_sync(self, session_ids: List[str]) -> bool:
+    async def _needs_sync(self, session_ids: List[str]) -> bool:
         """
         Détermine si une synchronisation est nécessaire.
         
@@ -206,7 +207,7 @@ class MessagingService:
         """
         # Vérifier le timestamp de dernière sync pour chaque session
         for session_id in session_ids:
-            last_sync = self.db.get_last_sync_time(session_id)
+            last_sync = await self.db.get_last_sync_time(session_id)
             
             if not last_sync:
                 # Jamais synchronisé
@@ -272,7 +273,7 @@ class MessagingService:
                         
                         # Sauvegarder dans la DB
                         if conversations:
-                            count = self.db.save_conversations(session_id, conversations)
+                            count = await self.db.save_conversations(session_id, conversations)
                             logger.info(f"Synchronise {count} conversations pour {session_id}")
                         else:
                             logger.warning(f"Aucune conversation récupérée pour {session_id}")
@@ -282,7 +283,7 @@ class MessagingService:
                         logger.error(traceback.format_exc())
                     
                     # Mettre à jour timestamp de sync
-                    self.db.set_last_sync_time(session_id, datetime.now())
+                    await self.db.set_last_sync_time(session_id, datetime.now())
                     
                 except Exception as e:
                     logger.error(f"Erreur sync conversations {session_id}: {e}")
@@ -315,7 +316,7 @@ class MessagingService:
         Returns:
             List[Dict]: Conversations
         """
-        if not account or not account.is_connected:
+        if not account or not await account.ensure_connected():
             return []
         
         try:
@@ -421,14 +422,16 @@ class MessagingService:
         account: TelegramAccount,
         chat_id: int,
         session_id: str,
-        limit: int = 50
+        limit: int = 50,
+        before: Optional[Tuple[datetime, int]] = None
     ) -> List[Dict]:
         """
-        Récupère les messages de manière optimisée.
+        Récupère une page de messages de manière optimisée.
         
         Stratégie :
-        1. Charge depuis SQLite (instantané)
-        2. Si vide ou trop ancien, charge depuis API
+        1. Charge depuis SQLite (pagination par curseur, coût constant)
+        2. Si la page est incomplète, complète depuis l'API (messages plus anciens),
+           sauf si le début de l'historique est déjà en cache
         3. Sauvegarde dans SQLite
         
         Args:
@@ -436,24 +439,50 @@ class MessagingService:
             chat_id: ID du chat
             session_id: ID de la session
             limit: Limite de messages
+            before: Curseur (date, id) du plus ancien message affiché,
+                    None pour la page la plus récente
             
         Returns:
-            List[Dict]: Liste des messages
+            List[Dict]: Liste des messages (ordre chronologique)
         """
+        # Première page : ouverture de la conversation (rétention du cache)
+        if before is None:
+            await self.db.mark_conversation_opened(chat_id, session_id)
+        
         # 1. Charger depuis DB
-        messages = self.db.get_messages(chat_id, session_id, limit)
+        messages = await self.db.get_messages_before(chat_id, session_id, before, limit)
         
-        # 2. Si vide, charger depuis API
-        if not messages and account and account.is_connected:
-            messages = await self._fetch_messages_from_api(
+        # 2. Page incomplète : compléter avec l'historique plus ancien depuis l'API
+        missing = limit - len(messages)
+        if missing > 0 and account and account.is_connected:
+            # Début de l'historique déjà atteint : rien de plus ancien côté API
+            if await self.db.is_history_complete(chat_id, session_id):
+                return messages
+            
+            if messages:
+                offset_id = messages[0]['id']
+            else:
+                offset_id = before[1] if before else 0
+            
+            older = await self._fetch_messages_from_api(
                 account,
                 chat_id,
-                limit
+                missing,
+                offset_id=offset_id
             )
             
+            # Erreur API : réessayé à la prochaine page
+            if older is None:
+                return messages
+            
             # Sauvegarder dans DB
-            if messages:
-                self.db.save_messages(session_id, chat_id, messages)
+            if older:
+                await self.db.save_messages(session_id, chat_id, older)
+                messages = older + messages
+            
+            # Moins de messages que demandé : début de l'historique atteint
+            if len(older) < missing:
+                await self.db.mark_history_complete(chat_id, session_id)
         
         return messages
     
@@ -461,8 +490,9 @@ class MessagingService:
         self,
         account: TelegramAccount,
         chat_id: int,
-        limit: int = 50
-    ) -> List[Dict]:
+        limit: int = 50,
+        offset_id: int = 0
+    ) -> Optional[List[Dict]]:
         """
         Récupère les messages depuis l'API Telegram.
         
@@ -472,17 +502,18 @@ class MessagingService:
             account: Compte Telegram
             chat_id: ID du chat
             limit: Limite
+            offset_id: Ne récupérer que les messages d'ID inférieur (0 = les plus récents)
             
         Returns:
-            List[Dict]: Messages
+            Optional[List[Dict]]: Messages, None si l'API n'a pas répondu
         """
-        if not account or not account.is_connected:
-            return []
+        if not account or not await account.ensure_connected():
+            return None
         
         try:
             messages = []
             
-            async for message in account.client.iter_messages(chat_id, limit=limit):
+            async for message in account.client.iter_messages(chat_id, limit=limit, offset_id=offset_id):
                 # Infos expéditeur
                 sender_name = "Inconnu"
                 sender_id = None
@@ -559,7 +590,7 @@ class MessagingService:
         
         except Exception as e:
             logger.error(f"Erreur récupération messages API: {e}")
-            return []
+            return None
     
     def _get_message_reactions(self, message) -> List[Dict]:
         """Récupère les réactions d'un message."""
@@ -614,7 +645,7 @@ class MessagingService:
         Returns:
             Optional[str]: Chemin vers le fichier ou None
         """
-        if not account or not account.is_connected:
+        if not account or not await account.ensure_connected():
             return None
         
         try:
@@ -635,11 +666,11 @@ class MessagingService:
             
             if success and file_path:
                 # Mettre à jour dans la DB
-                self.db.conn.execute("""
+                await self.db.execute_write("""
                     UPDATE messages
                     SET media_path = ?
                     WHERE id = ? AND chat_id = ? AND session_id = ?
-                """, (file_path, message_id, chat_id, session_id))
+                """, (file_path, message_id, chat_id, session_id), session_id=session_id)
                 
                 return file_path
         
@@ -648,6 +679,29 @@ class MessagingService:
         
         return None
     
+    # ==================== RECHERCHE ====================
+    
+    async def search(
+        self,
+        query: str,
+        session_ids: List[str],
+        limit: int = 50,
+        cursor: Optional[int] = None
+    ) -> Dict:
+        """
+        Recherche dans les conversations et messages en cache (index FTS5).
+        
+        Args:
+            query: Texte recherché
+            session_ids: Liste des IDs de session
+            limit: Nombre maximum de résultats
+            cursor: Curseur de pagination (next_cursor du résultat précédent)
+            
+        Returns:
+            Dict: {'hits': [...], 'next_cursor': Optional[int]}
+        """
+        return await self.db.search(query, session_ids, limit, cursor)
+    
     # ==================== ENVOI MESSAGES ====================
     
     async def send_message(
@@ -669,7 +723,7 @@ class MessagingService:
         Returns:
             bool: True si réussi
         """
-        if not account or not account.is_connected:
+        if not account or not await account.ensure_connected():
             return False
         
         try:
@@ -681,7 +735,7 @@ class MessagingService:
             
             # Mettre à jour la conversation dans la DB
             if sent_message:
-                self.db.update_conversation_last_message(
+                await self.db.update_conversation_last_message(
                     chat_id,
                     account.session_id,
                     message[:100],
@@ -706,7 +760,7 @@ class MessagingService:
                     "views": None,
                 }
                 
-                self.db.save_messages(account.session_id, chat_id, [msg_dict])
+                await self.db.save_messages(account.session_id, chat_id, [msg_dict])
             
             return True
         
@@ -725,18 +779,18 @@ class MessagingService:
         Returns:
             bool: True si réussi
         """
-        if not account or not account.is_connected:
+        if not account or not await account.ensure_connected():
             return False
         
         try:
             await account.client.send_read_acknowledge(chat_id)
             
             # Mettre à jour unread_count dans la DB
-            self.db.conn.execute("""
+            await self.db.execute_write("""
                 UPDATE conversations
                 SET unread_count = 0
                 WHERE entity_id = ? AND session_id = ?
-            """, (chat_id, account.session_id))
+            """, (chat_id, account.session_id), session_id=account.session_id)
             
             return True
         
@@ -792,14 +846,9 @@ class MessagingService:
         
         all_conversations = list(conversations_map.values())
         
-        # Trier par date
+        # Trier par date (millisecondes epoch depuis la base, datetime depuis l'API)
         def safe_date_sort(conv):
-            date = conv.get('last_message_date')
-            if not date:
-                return datetime.min
-            if hasattr(date, 'tzinfo') and date.tzinfo is not None:
-                date = date.replace(tzinfo=None)
-            return date
+            return to_epoch_ms(conv.get('last_message_date')) or 0
         
         all_conversations.sort(key=safe_date_sort, reverse=True)
         
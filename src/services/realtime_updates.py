@@ -9,7 +9,8 @@ from telethon import events
 from telethon.tl.types import User, Chat, Channel
 
 from core.telegram.account import TelegramAccount
-from database.telegram_db import get_telegram_db
+from database.async_db import get_async_db
+from database.write_buffer import get_write_buffer
 from utils.logger import get_logger
 
 logger = get_logger()
@@ -25,7 +26,9 @@ class RealtimeUpdates:
     
     def __init__(self):
         """Initialise le gestionnaire d'updates."""
-        self.db = get_telegram_db()
+        self.db = get_async_db()
+        # Écritures regroupées par conversation (un commit par lot)
+        self.buffer = get_write_buffer()
         self._active_handlers: Dict[str, Set] = {}  # {session_id: {handlers}}
         self._ui_callbacks: Dict[str, Callable] = {}  # {event_type: callback}
     
@@ -100,6 +103,27 @@ class RealtimeUpdates:
         """
         self._ui_callbacks[event_type] = callback
     
+    def _notify_ui_after_flush(self, event_type: str, *args) -> None:
+        """
+        Notifie l'UI après l'écriture du tampon, pour qu'un rechargement
+        depuis la base voie déjà l'événement.
+        
+        Args:
+            event_type: Type d'événement
+            *args: Arguments du callback
+        """
+        callback = self._ui_callbacks.get(event_type)
+        if callback is None:
+            return
+        
+        def notify():
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.error(f"Erreur callback UI {event_type}: {e}")
+        
+        self.buffer.after_flush(notify)
+    
     async def _handle_new_message(self, account: TelegramAccount, event):
         """
         Gère l'arrivée d'un nouveau message.
@@ -170,31 +194,16 @@ class RealtimeUpdates:
                 "views": getattr(message, 'views', None),
             }
             
-            # Sauvegarder dans la DB
-            self.db.save_messages(account.session_id, chat_id, [msg_dict])
-            
-            # Mettre à jour la conversation
-            self.db.update_conversation_last_message(
-                chat_id,
+            # Sauvegarder (message, dernier message, unread_count) via le tampon
+            self.buffer.add_message(
                 account.session_id,
-                message_text[:100],
-                local_date,
-                from_me=False
+                chat_id,
+                msg_dict,
+                message_text[:100]
             )
             
-            # Incrémenter unread_count
-            self.db.conn.execute("""
-                UPDATE conversations
-                SET unread_count = unread_count + 1
-                WHERE entity_id = ? AND session_id = ?
-            """, (chat_id, account.session_id))
-            
-            # Notifier l'UI
-            if 'new_message' in self._ui_callbacks:
-                try:
-                    self._ui_callbacks['new_message'](msg_dict, chat_id)
-                except Exception as e:
-                    logger.error(f"Erreur callback UI new_message: {e}")
+            # Notifier l'UI une fois le lot écrit (elle relit la base)
+            self._notify_ui_after_flush('new_message', msg_dict, chat_id)
             
             logger.debug(f"Nouveau message reçu et sauvegardé : chat {chat_id}")
         
@@ -216,19 +225,11 @@ class RealtimeUpdates:
             # Texte modifié
             message_text = message.text or message.message or ""
             
-            # Mettre à jour dans la DB
-            self.db.conn.execute("""
-                UPDATE messages
-                SET text = ?, edited = 1
-                WHERE id = ? AND chat_id = ? AND session_id = ?
-            """, (message_text, message.id, chat_id, account.session_id))
+            # Mettre à jour dans la DB (via le tampon)
+            self.buffer.edit_message(account.session_id, chat_id, message.id, message_text)
             
-            # Notifier l'UI
-            if 'message_edited' in self._ui_callbacks:
-                try:
-                    self._ui_callbacks['message_edited'](message.id, chat_id, message_text)
-                except Exception as e:
-                    logger.error(f"Erreur callback UI message_edited: {e}")
+            # Notifier l'UI une fois le lot écrit
+            self._notify_ui_after_flush('message_edited', message.id, chat_id, message_text)
             
             logger.debug(f"Message édité : {message.id} dans chat {chat_id}")
         
@@ -246,19 +247,11 @@ class RealtimeUpdates:
         try:
             chat_id = event.chat_id
             
-            # Réinitialiser unread_count
-            self.db.conn.execute("""
-                UPDATE conversations
-                SET unread_count = 0
-                WHERE entity_id = ? AND session_id = ?
-            """, (chat_id, account.session_id))
+            # Réinitialiser unread_count (via le tampon)
+            self.buffer.mark_read(account.session_id, chat_id)
             
-            # Notifier l'UI
-            if 'messages_read' in self._ui_callbacks:
-                try:
-                    self._ui_callbacks['messages_read'](chat_id)
-                except Exception as e:
-                    logger.error(f"Erreur callback UI messages_read: {e}")
+            # Notifier l'UI une fois le lot écrit
+            self._notify_ui_after_flush('messages_read', chat_id)
             
             logger.debug(f"Messages lus : chat {chat_id}")
         
@@ -284,11 +277,7 @@ class RealtimeUpdates:
             
             # Mise à jour du titre
             if hasattr(event, 'new_title') and event.new_title:
-                self.db.conn.execute("""
-                    UPDATE conversations
-                    SET title = ?
-                    WHERE entity_id = ? AND session_id = ?
-                """, (event.new_title, chat_id, account.session_id))
+                self.buffer.set_title(account.session_id, chat_id, event.new_title)
                 
                 logger.debug(f"Titre de chat mis à jour : {event.new_title}")
             
@@ -296,20 +285,12 @@ class RealtimeUpdates:
             if hasattr(event, 'new_photo') and event.new_photo:
                 # Invalider le cache de photo
                 # La nouvelle photo sera téléchargée lors du prochain affichage
-                self.db.conn.execute("""
-                    UPDATE conversations
-                    SET profile_photo_path = NULL, has_photo = 1
-                    WHERE entity_id = ? AND session_id = ?
-                """, (chat_id, account.session_id))
+                self.buffer.invalidate_photo(account.session_id, chat_id)
                 
                 logger.debug(f"Photo de chat modifiée : chat {chat_id}")
             
-            # Notifier l'UI
-            if 'chat_action' in self._ui_callbacks:
-                try:
-                    self._ui_callbacks['chat_action'](chat_id, event)
-                except Exception as e:
-                    logger.error(f"Erreur callback UI chat_action: {e}")
+            # Notifier l'UI une fois le lot écrit
+            self._notify_ui_after_flush('chat_action', chat_id, event)
         
         except Exception as e:
             logger.error(f"Erreur traitement action chat: {e}")
@@ -324,7 +305,8 @@ class RealtimeUpdates:
         return {
             'active_sessions': len(self._active_handlers),
             'total_handlers': sum(len(handlers) for handlers in self._active_handlers.values()),
-            'ui_callbacks': len(self._ui_callbacks)
+            'ui_callbacks': len(self._ui_callbacks),
+            'write_buffer': self.buffer.get_stats()
         }
 
 
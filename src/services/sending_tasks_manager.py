@@ -23,6 +23,9 @@ class SendingTask:
     sent: int = 0
     skipped: int = 0
     failed_groups: Set[int] = field(default_factory=set)
+    deferred: int = 0  # Messages en attente de réessai (FloodWait)
+    retried: int = 0  # Réessais effectués
+    failed: int = 0  # Messages abandonnés
     status: str = "en_cours"  # en_cours, terminé, annulé
     started_at: datetime = field(default_factory=datetime.now)
     finished_at: Optional[datetime] = None
@@ -71,7 +74,14 @@ class SendingTask:
         self.status = "terminé"
         self.finished_at = datetime.now()
     
-    def update_progress(self, sent: int, skipped: int, failed_groups: Set[int], total_adjusted: Optional[int] = None) -> None:
+    def update_progress(
+        self,
+        sent: int,
+        skipped: int,
+        failed_groups: Set[int],
+        total_adjusted: Optional[int] = None,
+        retry_counts: Optional[Dict[str, int]] = None
+    ) -> None:
         """
         Met à jour la progression.
         
@@ -80,11 +90,17 @@ class SendingTask:
             skipped: Nombre de messages ignorés
             failed_groups: Set des groupes en erreur
             total_adjusted: Total ajusté après exclusions (optionnel)
+            retry_counts: Compteurs FloodWait {'deferred', 'retried', 'failed'} (optionnel)
         """
         self.sent = sent
         self.skipped = skipped
         self.failed_groups = failed_groups
         
+        if retry_counts is not None:
+            self.deferred = retry_counts.get('deferred', 0)
+            self.retried = retry_counts.get('retried', 0)
+            self.failed = retry_counts.get('failed', 0)
+        
         # Mettre à jour le total si fourni (après exclusions)
         if total_adjusted is not None:
             self.total_messages = total_adjusted
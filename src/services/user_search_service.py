@@ -28,7 +28,7 @@ class UserSearchService:
         Returns:
             Dict avec les infos formatées comme une conversation, ou None si introuvable
         """
-        if not account or not account.is_connected:
+        if not account or not await account.ensure_connected():
             logger.warning("Tentative de recherche avec compte non connecté")
             return None
         
@@ -58,11 +58,16 @@ class AutoTeleApp:
             )
 
             await self.telegram_manager.load_existing_sessions_with_progress(
-                lambda progress, message: self.ui_manager.update_loading_progress(  # noqa: E501
-                    progress, message
-                )
+                self._update_loading_progress,
+                on_first_connected=self._show_after_first_account
             )
 
+            if not self.is_loading_accounts:
+                # Interface déjà affichée : mettre à jour la liste des comptes
+                if self.current_page == 'comptes':
+                    await self.show_page(self.current_page)
+                return
+
             nb_accounts = len(self.telegram_manager.list_accounts())
 
             self.ui_manager.update_loading_progress(
@@ -84,6 +89,16 @@ class AutoTeleApp:
 
             await self.show_page(self.current_page)
 
+    def _update_loading_progress(self, progress: int, message: str) -> None:
+        """Met à jour l'écran de chargement tant qu'il est affiché."""
+        if self.is_loading_accounts:
+            self.ui_manager.update_loading_progress(progress, message)
+
+    async def _show_after_first_account(self) -> None:
+        """Rend l'interface utilisable dès le premier compte connecté."""
+        self.is_loading_accounts = False
+        await self.show_page(self.current_page)
+
     async def show_page(self, page_name: str) -> None:
         """
         Affiche une page spécifique.
@@ -9,7 +9,11 @@ from core.session_manager import SessionManager
 from ui.components.dialogs import VerificationDialog, ConfirmDialog
 from utils.logger import get_logger
 from utils.notification_manager import notify
-from utils.constants import ICON_ACCOUNT, ICON_SUCCESS, MSG_NO_ACCOUNT
+from utils.constants import (
+    ICON_ACCOUNT, ICON_SUCCESS, MSG_NO_ACCOUNT,
+    CONNECTION_POLICY_ALWAYS, CONNECTION_POLICY_ON_DEMAND, CONNECTION_POLICY_IDLE,
+    DEFAULT_IDLE_TIMEOUT_MINUTES
+)
 from utils.validators import validate_time_format, format_time
 from ui.components.svg_icons import svg
 
@@ -53,6 +57,13 @@ class AccountsPage:
                     'color: var(--text-secondary);'
                 )
             
+            stats = self.telegram_manager.get_connection_stats()
+            if stats['parked']:
+                with ui.row().classes('w-full justify-center'):
+                    ui.label(
+                        f"{stats['live']} connexion(s) ouverte(s) • {stats['parked']} compte(s) en veille"
+                    ).classes('text-xs').style('color: var(--text-secondary);')
+            
             ui.separator().style('background: var(--border); height: 1px; border: none; margin: 16px 0;')
             
             # Liste des comptes
@@ -61,7 +72,7 @@ class AccountsPage:
     def _render_accounts_grid(self) -> None:
         """Rend la grille des comptes."""
         # Forcer le rechargement des settings pour avoir les infos à jour
-        accounts = self.telegram_manager.list_accounts(reload_settings=True)
+        accounts = self.telegram_manager.list_accounts()
         
         if accounts:
             with ui.column().classes('w-full items-center'):
@@ -381,6 +392,35 @@ class AccountsPage:
                 
                 ui.separator()
                 
+                # Politique de connexion (utile avec beaucoup de comptes)
+                with ui.card().classes('p-4 bg-green-50 border-2 border-green-200'):
+                    with ui.row().classes('items-center gap-2 mb-2'):
+                        ui.html(svg('sync', 22, '#059669'))
+                        ui.label('Connexion').classes('font-bold text-lg').style('color: #059669;')
+                    ui.label(
+                        'Un compte en veille ferme sa connexion et se reconnecte automatiquement '
+                        'dès qu\'il est utilisé (envoi, scan, messagerie).'
+                    ).classes('text-sm text-gray-600 mb-3')
+                    
+                    policy_select = ui.select(
+                        {
+                            CONNECTION_POLICY_ALWAYS: 'Toujours connecté',
+                            CONNECTION_POLICY_ON_DEMAND: 'À la demande',
+                            CONNECTION_POLICY_IDLE: 'Veille après inactivité',
+                        },
+                        value=settings['connection_policy'],
+                        label='Politique'
+                    ).classes('w-full')
+                    idle_input = ui.number(
+                        'Minutes d\'inactivité avant la veille',
+                        value=settings['idle_timeout_minutes'],
+                        min=1, max=1440, step=1
+                    ).classes('w-full').bind_visibility_from(
+                        policy_select, 'value', value=CONNECTION_POLICY_IDLE
+                    )
+                
+                ui.separator()
+                
                 # Nom du compte Telegram (modifiable et synchronisé avec Telegram)
                 with ui.card().classes('p-4 bg-purple-50 border-2 border-purple-200'):
                     with ui.row().classes('items-center gap-2 mb-2'):
@@ -562,6 +602,16 @@ class AccountsPage:
                                         notify(f'{acc["account_name"]} est maintenant le compte maître', type='info')
                                         break
                         
+                        # Politique de connexion
+                        new_policy = policy_select.value
+                        new_idle = int(idle_input.value or DEFAULT_IDLE_TIMEOUT_MINUTES)
+                        if (new_policy, new_idle) != (
+                            settings['connection_policy'], settings['idle_timeout_minutes']
+                        ):
+                            await self.telegram_manager.set_connection_policy(
+                                session_id, new_policy, new_idle
+                            )
+                        
                         # Sauvegarder et mettre à jour le nom Telegram (sur Telegram ET localement)
                         try:
                             new_name = await ui.run_javascript('document.getElementById("name_input_native").value', timeout=1.0) or ""
@@ -9,6 +9,7 @@ from typing import List, Dict, Optional, Set
 from nicegui import ui
 
 from core.telegram.manager import TelegramManager
+from database.timestamps import as_datetime
 from services.messaging_service import get_messaging_service
 from services.realtime_updates import get_realtime_updates
 from services.user_search_service import UserSearchService
@@ -20,6 +21,13 @@ from utils.country_flags import get_country_flag_from_phone
 
 logger = get_logger()
 
+# Nombre maximum de résultats de la recherche plein texte
+SEARCH_RESULTS_LIMIT = 500
+
+# Pagination de l'historique : première page puis pages chargées en remontant
+MESSAGES_FIRST_PAGE_SIZE = 200
+MESSAGES_OLDER_PAGE_SIZE = 100
+
 
 class MessagingPage:
     """Page de messagerie Telegram optimisée avec SQLite."""
@@ -57,7 +65,6 @@ class MessagingPage:
         self.search_input: Optional[ui.input] = None
         
         # Cache pour optimisation
-        self._photo_exists_cache: Dict[str, bool] = {}
         self._conversation_items: Dict[str, any] = {}  # Mapping conversation_id -> UI element
         self._photo_base64_cache: Dict[str, str] = {}  # NOUVEAU: Cache base64 des images
         
@@ -67,6 +74,10 @@ class MessagingPage:
         self._is_updating_ui = False  # NOUVEAU: Empêche updates UI multiples
         self._update_timer = None  # NOUVEAU: Timer pour debounce
         self._current_search_text = ''
+        self._search_hit_ids: Optional[set] = None  # (session_id, entity_id) trouvés par la recherche plein texte
+        self._is_loading_older = False  # Chargement d'une page d'historique en cours
+        self._has_older_messages = True  # False quand le début de l'historique est atteint
+        self._page_events_client = None  # Client dont les événements de page sont abonnés
     
     def render(self) -> None:
         """Rend la page de messagerie."""
@@ -86,12 +97,28 @@ class MessagingPage:
                 # Colonne droite : Messages
                 self._render_messages_area()
         
+        # Événements globaux : un seul abonnement par client (render est rappelé à chaque navigation)
+        self._register_page_events()
+        
         # Charger immédiatement depuis SQLite avec le contexte UI
         ui.timer(0.1, lambda: asyncio.create_task(self._load_conversations_instant()), once=True)
         
         # Setup handlers temps réel
         self._setup_realtime_handlers()
     
+    def _register_page_events(self) -> None:
+        """Abonne les événements globaux de la page, une fois par client."""
+        client = ui.context.client
+        if self._page_events_client is client:
+            return
+        self._page_events_client = client
+        
+        # Remonter en haut de la conversation charge l'historique plus ancien
+        async def on_scrolled_top(e):
+            await self._load_older_messages()
+        
+        ui.on('messages_scrolled_top', on_scrolled_top)
+    
     async def _load_conversations_instant(self):
         """Charge les conversations instantanément depuis SQLite."""
         try:
@@ -181,7 +208,7 @@ class MessagingPage:
                     continue
                 
                 account = self.telegram_manager.get_account(session_id)
-                if not account or not account.is_connected:
+                if not account or not account.is_live:
                     continue
                 
                 # Télécharger cette photo seulement
@@ -200,14 +227,13 @@ class MessagingPage:
                         # Mettre à jour silencieusement SANS re-render
                         conv['profile_photo'] = photo_path
                         conv['has_photo'] = True
-                        self._photo_exists_cache[photo_path] = True
                         
                         # Mettre à jour dans la DB
-                        self.messaging_service.db.conn.execute("""
+                        await self.messaging_service.db.execute_write("""
                             UPDATE conversations
                             SET profile_photo_path = ?, has_photo = 1
                             WHERE entity_id = ? AND session_id = ?
-                        """, (photo_path, entity_id, session_id))
+                        """, (photo_path, entity_id, session_id), session_id=session_id)
                         
                         # NE PAS appeler _apply_filters() ici pour éviter le flickering
                     else:
@@ -520,6 +546,19 @@ class MessagingPage:
             )
             self._update_messages_display()
             
+            # Écouteur attaché au conteneur qui vient d'être créé (voir _register_page_events)
+            ui.run_javascript(f'''
+                const messagesContainer = document.getElementById('c{self.messages_container.id}');
+                if (messagesContainer && !messagesContainer.dataset.olderListener) {{
+                    messagesContainer.dataset.olderListener = '1';
+                    messagesContainer.addEventListener('scroll', () => {{
+                        if (messagesContainer.scrollTop < 80) {{
+                            emitEvent('messages_scrolled_top', {{}});
+                        }}
+                    }}, {{passive: true}});
+                }}
+            ''')
+            
             # Saisie
             self._render_message_input()
     
@@ -830,7 +869,24 @@ class MessagingPage:
                 for msg in messages:
                     self._render_message_bubble(msg)
     
-    def _render_message_bubble(self, msg: Dict) -> None:
+    def _prepend_messages(self, messages: List[Dict]) -> None:
+        """
+        Insère une page d'historique en tête du fil.
+        
+        Seules les nouvelles bulles sont rendues : celles déjà affichées
+        restent en place (pas de clear() ni de re-rendu complet).
+        
+        Args:
+            messages: Messages plus anciens, du plus ancien au plus récent
+        """
+        if not self.messages_container:
+            return
+        
+        with self.messages_container:
+            for index, msg in enumerate(messages):
+                self._render_message_bubble(msg).move(target_index=index)
+    
+    def _render_message_bubble(self, msg: Dict) -> ui.card:
         """Rend une bulle de message avec lazy loading des médias."""
         is_from_me = msg.get('from_me', False)
         
@@ -844,7 +900,7 @@ class MessagingPage:
         
         bubble_container = ui.card().classes(f'p-3 {text_align}').style(
             f'{bubble_style} border-radius: 12px; border: 1px solid #ddd;'
-        )
+        ).props(f'data-message-id="{msg.get("id")}"')
         
         with bubble_container:
             # Menu contextuel sur mes messages (clic droit)
@@ -911,14 +967,13 @@ class MessagingPage:
                             ui.label('Télécharger média').classes('text-sm')
             
             # Date
-            if msg.get('date'):
-                msg_date = msg['date']
-                if hasattr(msg_date, 'tzinfo') and msg_date.tzinfo is not None:
-                    msg_date = msg_date.replace(tzinfo=None)
-                
+            msg_date = as_datetime(msg.get('date'))
+            if msg_date:
                 date_str = msg_date.strftime('%H:%M')
                 edited_marker = ' (modifié)' if msg.get('edited') else ''
                 ui.label(f"{date_str}{edited_marker}").classes('text-xs mt-1').style('color: var(--text-secondary);')
+        
+        return bubble_container
     
     async def _load_messages(self, chat_id: int, account_session_id: str) -> None:
         """Charge les messages d'une conversation."""
@@ -938,12 +993,13 @@ class MessagingPage:
                 account,
                 chat_id,
                 account_session_id,
-                limit=200  # Plus de messages (au lieu de 50)
+                limit=MESSAGES_FIRST_PAGE_SIZE
             )
             
             # logger.info(f"Messages chargés: {len(messages)} messages pour chat_id={chat_id}")
             
             self.state['messages'] = messages
+            self._has_older_messages = len(messages) >= MESSAGES_FIRST_PAGE_SIZE
             self._update_messages_display()
             
             ui.timer(0.3, lambda: self._scroll_to_bottom(), once=True)
@@ -956,6 +1012,47 @@ class MessagingPage:
             logger.error(f"Erreur chargement messages: {e}")
             ui.notify('Erreur lors du chargement des messages', type='negative')
     
+    async def _load_older_messages(self) -> None:
+        """Charge la page de messages précédant le plus ancien message affiché."""
+        messages = self.state.get('messages', [])
+        conversation = self.state.get('selected_conversation')
+        
+        if self._is_loading_older or not self._has_older_messages or not messages or not conversation:
+            return
+        
+        self._is_loading_older = True
+        try:
+            session_id = conversation['session_id']
+            chat_id = conversation['entity_id']
+            account = self.telegram_manager.get_account(session_id)
+            
+            oldest = messages[0]
+            older = await self.messaging_service.get_messages_fast(
+                account,
+                chat_id,
+                session_id,
+                limit=MESSAGES_OLDER_PAGE_SIZE,
+                before=(oldest['date'], oldest['id'])
+            )
+            
+            # La conversation a pu changer pendant le chargement
+            if self.state.get('selected_conversation') is not conversation:
+                return
+            
+            if len(older) < MESSAGES_OLDER_PAGE_SIZE:
+                self._has_older_messages = False
+            if not older:
+                return
+            
+            self.state['messages'] = older + messages
+            self._prepend_messages(older)
+            ui.timer(0.1, lambda: self._scroll_to_message(oldest['id']), once=True)
+        
+        except Exception as e:
+            logger.error(f"Erreur chargement historique: {e}")
+        finally:
+            self._is_loading_older = False
+    
     def _merge_and_display_conversations(self, conversations: List[Dict]):
         """
         Fusionne et affiche les conversations.
@@ -1121,13 +1218,9 @@ class MessagingPage:
                     if conv.get('type') == 'user'
                 ]
             
-            # Appliquer le filtre de texte (recherche dans le titre)
+            # Appliquer le filtre de texte (titre, username et contenu des messages)
             if search_text and not search_text.startswith('@'):
-                search_lower = search_text.lower()
-                filtered = [
-                    conv for conv in filtered
-                    if search_lower in conv['title'].lower()
-                ]
+                filtered = self._filter_by_search(filtered, search_text)
             
             # Filtre messages non lus seulement
             if self.state.get('show_unread_only', False):
@@ -1143,6 +1236,30 @@ class MessagingPage:
         # CORRECTION : Affichage IMMÉDIAT sans debounce pour l'initialisation
         self._do_update_conversations()
     
+    def _filter_by_search(self, conversations: List[Dict], search_text: str) -> List[Dict]:
+        """
+        Filtre les conversations avec les résultats de la recherche plein texte.
+        
+        Args:
+            conversations: Conversations à filtrer
+            search_text: Texte recherché
+            
+        Returns:
+            List[Dict]: Conversations correspondantes
+        """
+        if self._search_hit_ids is None:
+            # Résultats FTS pas encore disponibles : repli sur le titre
+            search_lower = search_text.lower()
+            return [
+                conv for conv in conversations
+                if search_lower in conv['title'].lower()
+            ]
+        
+        return [
+            conv for conv in conversations
+            if (conv.get('session_id'), conv['entity_id']) in self._search_hit_ids
+        ]
+    
     def _apply_filters_sync(self) -> None:
         """
         Applique les filtres de recherche (VERSION SYNCHRONE avec debounce).
@@ -1166,13 +1283,9 @@ class MessagingPage:
                     if conv.get('type') == 'user'
                 ]
             
-            # Appliquer le filtre de texte (recherche dans le titre)
+            # Appliquer le filtre de texte (titre, username et contenu des messages)
             if search_text and not search_text.startswith('@'):
-                search_lower = search_text.lower()
-                filtered = [
-                    conv for conv in filtered
-                    if search_lower in conv['title'].lower()
-                ]
+                filtered = self._filter_by_search(filtered, search_text)
             
             # Filtre messages non lus seulement
             if self.state.get('show_unread_only', False):
@@ -1196,6 +1309,18 @@ class MessagingPage:
             # Définir la valeur via JavaScript
             await ui.run_javascript(f'document.getElementById("search_input_native").value = "{search_text}"')
         
+        # Recherche plein texte dans la base locale (index FTS5)
+        if search_text and not search_text.startswith('@'):
+            result = await self.messaging_service.search(
+                search_text,
+                self.state['selected_accounts'],
+                limit=SEARCH_RESULTS_LIMIT
+            )
+            # Clé par compte : un même chat_id peut exister sur plusieurs comptes
+            self._search_hit_ids = {(hit['session_id'], hit['chat_id']) for hit in result['hits']}
+        else:
+            self._search_hit_ids = None
+        
         # Appeler la version synchrone pour le filtrage
         self._apply_filters_sync()
     
@@ -1279,7 +1404,7 @@ class MessagingPage:
                 return
             
             account = self.telegram_manager.get_account(session_id)
-            if not account or not account.is_connected:
+            if not account or not await account.ensure_connected():
                 notify('Compte non connecté', type='negative')
                 return
             
@@ -1288,10 +1413,10 @@ class MessagingPage:
                 await account.client.delete_messages(chat_id, [message_id])
                 
                 # Supprimer de la DB
-                self.messaging_service.db.conn.execute("""
+                await self.messaging_service.db.execute_write("""
                     DELETE FROM messages
                     WHERE id = ? AND chat_id = ? AND session_id = ?
-                """, (message_id, chat_id, session_id))
+                """, (message_id, chat_id, session_id), session_id=session_id)
                 
                 # Supprimer de l'état local
                 self.state['messages'] = [
@@ -1328,9 +1453,22 @@ class MessagingPage:
             })();
         ''')
     
+    def _scroll_to_message(self, message_id: int) -> None:
+        """Replace la vue sur un message (conserve la lecture après ajout en haut)."""
+        ui.run_javascript(f'''
+            (function scrollToMessage() {{
+                const bubble = document.querySelector('[data-message-id="{int(message_id)}"]');
+                if (bubble) {{
+                    bubble.scrollIntoView({{block: 'start'}});
+                }}
+            }})();
+        ''')
+    
     def _photo_exists(self, photo_path: str) -> bool:
         """
-        Vérifie si une photo existe (avec cache persistent).
+        Vérifie si une photo existe (index mémoire, aucun accès disque).
+        
+        Un fichier disparu est détecté par _get_relative_image_path.
         
         Args:
             photo_path: Chemin de la photo
@@ -1338,21 +1476,7 @@ class MessagingPage:
         Returns:
             bool: True si la photo existe
         """
-        if not photo_path:
-            return False
-            
-        # Cache en mémoire d'abord
-        if photo_path in self._photo_exists_cache:
-            return self._photo_exists_cache[photo_path]
-        
-        # Vérifier sur disque
-        import os
-        exists = os.path.exists(photo_path)
-        
-        # Mettre en cache (persistent pendant la session)
-        self._photo_exists_cache[photo_path] = exists
-        
-        return exists
+        return photo_path in self.messaging_service.photo_cache.index
     
     def _get_relative_image_path(self, photo_path: str) -> str:
         """
@@ -1375,19 +1499,20 @@ class MessagingPage:
         
         if base64_data:
             self._photo_base64_cache[photo_path] = base64_data
+        else:
+            # Fichier manquant ou illisible : retéléchargé au prochain passage
+            self.messaging_service.photo_cache.mark_missing(photo_path)
             
         return base64_data if base64_data else ""
     
     @staticmethod
-    def _format_date(date: datetime) -> str:
-        """Formate une date."""
+    def _format_date(date) -> str:
+        """Formate une date (datetime ou millisecondes epoch de la base)."""
+        date = as_datetime(date)
         if not date:
             return ""
         
         try:
-            if date.tzinfo is not None:
-                date = date.replace(tzinfo=None)
-            
             now = datetime.now()
             if now.tzinfo is not None:
                 now = now.replace(tzinfo=None)
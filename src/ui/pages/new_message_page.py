@@ -213,9 +213,7 @@ class NewMessagePage:
                 return
             self.state['selected_account'] = session_id
             
-            # CORRECTION : Recharger les settings du compte sélectionné
-            # Recharger l'index depuis le fichier pour avoir les dernières modifications
-            self.session_manager.sessions_index = self.session_manager._load_index()
+            # Settings du compte sélectionné (index partagé, toujours à jour)
             settings = self.session_manager.get_account_settings(session_id)
             
             # Charger le message par défaut du compte
@@ -305,6 +303,10 @@ class NewMessagePage:
                 ):
                     ui.html(svg('remove_circle', 18, 'var(--secondary)'))
                     ui.label('Rien').classes('ml-1')
+                with ui.button(on_click=self._resync_groups).props('outline dense size=sm').style(
+                    'color: var(--primary); border-color: var(--primary);'
+                ).tooltip('Resynchroniser la liste des groupes depuis Telegram'):
+                    ui.html(svg('refresh', 18, 'var(--primary)'))
             
             # Compteur
             self.counter_label = ui.label().classes('text-sm font-semibold mb-3 px-3 py-2 rounded-lg')
@@ -341,8 +343,6 @@ class NewMessagePage:
             
             # CORRECTION : Charger le message prérempli avec les derniers paramètres
             if self.state['selected_account']:
-                # Recharger l'index pour avoir les dernières modifications
-                self.session_manager.sessions_index = self.session_manager._load_index()
                 settings = self.session_manager.get_account_settings(self.state['selected_account'])
                 if settings.get('default_message') and not self.state.get('message'):
                     self.state['message'] = settings['default_message']
@@ -764,9 +764,6 @@ class NewMessagePage:
             return []
         
         try:
-            # CORRECTION : Recharger l'index pour avoir les derniers horaires
-            self.session_manager.sessions_index = self.session_manager._load_index()
-            
             # Utiliser le système existant de SessionManager
             settings = self.session_manager.get_account_settings(account_name)
             default_schedules = settings.get('default_schedules', [])
@@ -1051,6 +1048,29 @@ class NewMessagePage:
         self._update_groups_list()
         self._update_counter()
     
+    async def _resync_groups(self) -> None:
+        """Resynchronise complètement les groupes du compte sélectionné."""
+        account = self.telegram_manager.get_account(self.state['selected_account'])
+        if not account:
+            return
+        
+        notify('Synchronisation des groupes...', type='info')
+        dialogs = await DialogService.get_dialogs(account, full_refresh=True)
+        
+        # Garder la sélection des groupes toujours présents
+        available_ids = {d['id'] for d in dialogs}
+        self.state['all_groups'] = dialogs
+        self.state['filtered_groups'] = DialogService.filter_dialogs(
+            dialogs,
+            self._last_groups_search
+        )
+        self.state['selected_groups'] = [
+            gid for gid in self.state['selected_groups'] if gid in available_ids
+        ]
+        self._update_groups_list()
+        self._update_counter()
+        notify(f'{len(dialogs)} groupe(s) synchronisé(s)', type='positive')
+    
     def _deselect_all_groups(self) -> None:
         """Désélectionne tous les groupes filtrés."""
         filtered_ids = [g['id'] for g in self.state['filtered_groups']]
@@ -1198,13 +1218,22 @@ class NewMessagePage:
         
         progress_dialog.open()
         
-        def on_progress(sent: int, total: int, skipped: int, failed_groups: Set[int]) -> None:
+        def on_progress(
+            sent: int,
+            total: int,
+            skipped: int,
+            failed_groups: Set[int],
+            retry_counts: Optional[Dict[str, int]] = None
+        ) -> None:
             """Met à jour la progression avec le total ajusté dynamiquement."""
             # Passer le total ajusté pour que l'interface reflète les exclusions
-            task.update_progress(sent, skipped, failed_groups, total_adjusted=total)
+            task.update_progress(sent, skipped, failed_groups, total_adjusted=total, retry_counts=retry_counts)
             progress = sent / total if total > 0 else 0
             progress_bar.set_value(progress)
-            progress_label.set_text(f'{sent}/{total} messages envoyés ({skipped} ignorés, {len(failed_groups)} groupes en erreur)')
+            text = f'{sent}/{total} messages envoyés ({skipped} ignorés, {len(failed_groups)} groupes en erreur)'
+            if task.deferred or task.retried or task.failed:
+                text += f' • {task.deferred} différés, {task.retried} réessais, {task.failed} échecs'
+            progress_label.set_text(text)
         
         try:
             notify('Envoi en cours...', type='info')
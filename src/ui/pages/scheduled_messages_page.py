@@ -2,13 +2,14 @@
 Page de gestion des messages programmés.
 """
 import asyncio
+import time
 from typing import Optional, List, Dict, Set, Tuple
 from datetime import datetime
 from nicegui import ui
-from telethon.tl.functions.messages import GetScheduledHistoryRequest, DeleteScheduledMessagesRequest
 
 from core.telegram.manager import TelegramManager
 from ui.components.dialogs import ConfirmDialog
+from utils.config import get_config
 from utils.logger import get_logger
 from utils.notification_manager import notify
 from utils.constants import ICON_SCHEDULED, ICON_REFRESH, MSG_NO_CONNECTED_ACCOUNT
@@ -16,6 +17,12 @@ from ui.components.svg_icons import svg
 
 logger = get_logger()
 
+# Intervalle minimal entre deux rendus de la liste pendant un scan (secondes)
+SCAN_RENDER_INTERVAL = 1.0
+
+# Comptes scannés en parallèle par défaut (voir telegram.max_parallel_tasks)
+DEFAULT_PARALLEL_ACCOUNTS = 5
+
 
 class ScheduledMessagesPage:
     """Page de gestion des messages programmés."""
@@ -38,6 +45,11 @@ class ScheduledMessagesPage:
         self.selected_messages: Set[Tuple[int, int]] = set()  # Set de (chat_id, message_id)
         self.action_bar_container: Optional[ui.row] = None  # Barre d'action pour édition en lot
         self.checkboxes: Dict[Tuple[int, int], ui.checkbox] = {}  # Référence aux checkboxes
+        
+        # Scan global (tous les comptes) : progression et tâches en cours
+        self.scan_progress_container: Optional[ui.column] = None
+        self._scan_tasks: List[asyncio.Task] = []
+        self._scan_generation = 0  # Incrémenté à chaque scan : les anciens résultats sont ignorés
     
     def render(self) -> None:
         """Rend la page."""
@@ -57,6 +69,9 @@ class ScheduledMessagesPage:
             # Sélection du compte
             self._render_account_selection()
             
+            # Progression du scan global (au-dessus des résultats partiels)
+            self.scan_progress_container = ui.column().classes('w-full')
+            
             # Container pour les messages
             self.messages_container = ui.column().classes('w-full')
     
@@ -107,13 +122,24 @@ class ScheduledMessagesPage:
                             ).props('outline').style('color: var(--text-secondary);')
     
     async def load_scheduled_messages(self) -> None:
-        """Charge les messages programmés."""
+        """
+        Charge les messages programmés.
+        
+        Le miroir local s'affiche immédiatement ; le scan Telegram le
+        réconcilie ensuite et la liste n'est redessinée que si elle a changé.
+        Sans données locales, la liste se remplit au fil du scan.
+        """
         if not self.selected_account:
             return
         
         # Réinitialiser le filtre de groupe quand on change de compte
         self.selected_chat_id = None
         
+        # Interrompre un scan global en cours
+        self._cancel_scan()
+        self._scan_generation += 1
+        self.scan_progress_container.clear()
+        
         self.messages_container.clear()
         
         with self.messages_container:
@@ -124,7 +150,7 @@ class ScheduledMessagesPage:
                     ui.label('Analyse en cours...').classes('text-xl font-bold mt-2').style(
                         'color: var(--text-primary);'
                     )
-                    ui.label('Scan exhaustif de vos groupes et messages programmés').classes('text-sm')
+                    scan_label = ui.label('Scan exhaustif de vos groupes et messages programmés').classes('text-sm')
         
         # Récupérer le compte
         account = self.telegram_manager.get_account(self.selected_account)
@@ -137,10 +163,44 @@ class ScheduledMessagesPage:
             return
         
         try:
-            # Récupérer tous les messages programmés
-            scheduled_messages = await account.get_all_scheduled_messages()
-            self.current_messages = scheduled_messages
-            self.display_messages()
+            session_id = self.selected_account
+            
+            # Miroir local : affichage immédiat, sans appel réseau
+            self.current_messages = await account.get_local_scheduled_messages()
+            local_state = self._messages_state(self.current_messages)
+            if self.current_messages:
+                self.display_messages()
+            
+            # Scan au fil de l'eau : réconcilie le miroir (hash Telegram par groupe)
+            scanned_messages: List[Dict] = []
+            last_render = 0.0
+            
+            async for scanned, total, messages in account.iter_scheduled_messages():
+                if self.selected_account != session_id:
+                    return  # Autre compte sélectionné entre-temps
+                
+                scanned_messages.extend(messages)
+                if local_state:
+                    continue  # Liste locale déjà affichée : comparer en fin de scan
+                
+                if not scanned_messages:
+                    scan_label.set_text(f'{scanned} / {total} groupes analysés')
+                if not messages:
+                    continue
+                
+                now = time.monotonic()
+                if now - last_render >= SCAN_RENDER_INTERVAL:
+                    self.current_messages = sorted(scanned_messages, key=lambda x: x['date'])
+                    self.display_messages()
+                    last_render = now
+            
+            if self.selected_account != session_id:
+                return
+            
+            scanned_messages.sort(key=lambda x: x['date'])
+            if not local_state or self._messages_state(scanned_messages) != local_state:
+                self.current_messages = scanned_messages
+                self.display_messages()
             
         except Exception as e:
             logger.error(f"Erreur chargement messages: {e}")
@@ -151,6 +211,14 @@ class ScheduledMessagesPage:
                     ui.label('Erreur lors du chargement').classes('text-red-700 font-bold')
                     ui.label(str(e)).classes('text-sm text-red-600')
     
+    @staticmethod
+    def _messages_state(messages: List[Dict]) -> Set[Tuple]:
+        """Empreinte d'une liste de messages (pour ne redessiner que si elle change)."""
+        return {
+            (msg['chat_id'], msg['message_id'], msg['text'], msg['date'])
+            for msg in messages
+        }
+    
     def display_messages(self) -> None:
         """Affiche les messages depuis le cache."""
         self.messages_container.clear()
@@ -433,7 +501,14 @@ class ScheduledMessagesPage:
         confirm.show()
     
     async def scan_all_accounts(self) -> None:
-        """Scanne tous les comptes connectés et affiche tous les messages avec barre de progression."""
+        """
+        Scanne tous les comptes connectés en parallèle et affiche tous les messages.
+        
+        Le nombre de comptes scannés simultanément est borné
+        (telegram.max_parallel_tasks), indépendamment du rate limiter de
+        chaque compte. La progression avance à chaque groupe scanné et les
+        résultats s'affichent dès qu'un compte est terminé.
+        """
         accounts = self.telegram_manager.list_accounts()
         connected = [acc for acc in accounts if acc.get('is_connected', False)]
         
@@ -441,14 +516,22 @@ class ScheduledMessagesPage:
             notify('Aucun compte connecté', type='negative')
             return
         
+        # Un seul scan global à la fois
+        self._cancel_scan()
+        self._scan_generation += 1
+        generation = self._scan_generation
+        
         # Réinitialiser le filtre de groupe lors d'un nouveau scan
         self.selected_chat_id = None
+        self.selected_account = None  # Mode "tous les comptes" (interrompt un scan de compte)
         
         total_accounts = len(connected)
+        self.current_messages = []
         self.messages_container.clear()
+        self.scan_progress_container.clear()
         
         # Créer la carte de progression
-        with self.messages_container:
+        with self.scan_progress_container:
             with ui.card().classes('w-full p-8 card-modern'):
                 with ui.column().classes('w-full items-center gap-4'):
                     # Titre
@@ -472,67 +555,102 @@ class ScheduledMessagesPage:
                     )
                     
                     # Détails
-                    details_label = ui.label('0 / 0 comptes scannés').classes('text-sm mt-2').style(
+                    details_label = ui.label(f'0 / {total_accounts} comptes scannés').classes('text-sm mt-2').style(
                         'color: var(--text-secondary);'
                     )
+                    
+                    # Annulation de tous les scans en cours
+                    cancel_button = ui.button('Annuler le scan', on_click=self._cancel_scan).props('flat color=red')
         
-        try:
-            all_messages = []
-            scanned = 0
-            
-            for idx, account_info in enumerate(connected, 1):
-                # Mettre à jour la progression
-                account_name = account_info['account_name']
-                progress_label.set_text(f'Scan de {account_name}...')
-                percentage = (idx - 1) / total_accounts
-                progress_bar.set_value(percentage)
-                percentage_label.set_text(f'{int(percentage * 100)}%')
-                details_label.set_text(f'{idx - 1} / {total_accounts} comptes scannés')
-                
-                account = self.telegram_manager.get_account(account_info['session_id'])
+        # Progression par compte : session_id -> (groupes scannés, total)
+        progress: Dict[str, Tuple[int, int]] = {}
+        finished: Set[str] = set()
+        all_messages: List[Dict] = []
+        max_parallel = get_config().get('telegram.max_parallel_tasks', DEFAULT_PARALLEL_ACCOUNTS)
+        semaphore = asyncio.Semaphore(max(1, max_parallel))
+        
+        def update_progress() -> None:
+            # Chaque compte pèse autant ; un compte non démarré compte pour 0
+            running = sum(
+                done / total for sid, (done, total) in progress.items()
+                if total and sid not in finished
+            )
+            fraction = (running + len(finished)) / total_accounts
+            scanned_chats = sum(done for done, _ in progress.values())
+            known_chats = sum(total for _, total in progress.values())
+            progress_bar.set_value(fraction)
+            percentage_label.set_text(f'{int(fraction * 100)}%')
+            progress_label.set_text(f'{scanned_chats} / {known_chats} groupes analysés')
+            details_label.set_text(f'{len(finished)} / {total_accounts} comptes scannés')
+        
+        async def scan_account(account_info: Dict) -> None:
+            session_id = account_info['session_id']
+            async with semaphore:
+                account = self.telegram_manager.get_account(session_id)
                 if not account:
-                    continue
+                    return
                 
+                messages: List[Dict] = []
+                scan = account.iter_scheduled_messages()
                 try:
-                    messages = await account.get_all_scheduled_messages()
-                    # Ajouter le nom du compte et session_id à chaque message
-                    for msg in messages:
-                        msg['account_name'] = account.account_name
-                        msg['account_session_id'] = account_info['session_id']
-                    all_messages.extend(messages)
-                    scanned += 1
+                    async for scanned, total, chat_messages in scan:
+                        progress[session_id] = (scanned, total)
+                        messages.extend(chat_messages)
+                        update_progress()
+                except asyncio.CancelledError:
+                    raise
                 except Exception as e:
                     logger.error(f"Erreur scan {account.account_name}: {e}")
-                
-                # Mise à jour finale pour ce compte
-                progress_bar.set_value(idx / total_accounts)
-                percentage_label.set_text(f'{int((idx / total_accounts) * 100)}%')
-                details_label.set_text(f'{idx} / {total_accounts} comptes scannés')
+                    return
+                finally:
+                    await scan.aclose()
             
-            # Progression à 100%
+            # Ajouter le nom du compte et session_id à chaque message
+            for msg in messages:
+                msg['account_name'] = account.account_name
+                msg['account_session_id'] = session_id
+            finished.add(session_id)
+            update_progress()
+            
+            # Résultats partiels : affichés dès qu'un compte est terminé
+            if messages and generation == self._scan_generation:
+                all_messages.extend(messages)
+                self.current_messages = sorted(all_messages, key=lambda x: x['date'])
+                self.display_all_accounts_messages()
+        
+        tasks = [asyncio.create_task(scan_account(account_info)) for account_info in connected]
+        self._scan_tasks = tasks
+        try:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            if self._scan_tasks is tasks:
+                self._scan_tasks = []
+        
+        if generation != self._scan_generation:
+            return  # Nouveau scan ou compte sélectionné entre-temps
+        
+        cancelled = any(task.cancelled() for task in tasks)
+        cancel_button.set_visibility(False)
+        if cancelled:
+            progress_label.set_text('Scan annulé')
+        else:
             progress_label.set_text('Scan terminé !')
             progress_bar.set_value(1.0)
             percentage_label.set_text('100%')
-            details_label.set_text(f'{scanned} / {total_accounts} comptes scannés avec succès')
-            
-            # Petit délai pour voir le 100%
-            await asyncio.sleep(0.5)
-            
-            # Stocker les messages
-            self.current_messages = all_messages
-            self.selected_account = None  # Mode "tous les comptes"
-            
-            # Afficher les messages
-            self.display_all_accounts_messages()
-            
-        except Exception as e:
-            logger.error(f"Erreur scan global: {e}")
-            self.messages_container.clear()
-            with self.messages_container:
-                with ui.card().classes('w-full p-4 bg-red-50'):
-                    ui.html(svg('error', 32, '#b91c1c'))
-                    ui.label('Erreur lors du scan global').classes('text-red-700 font-bold')
-                    ui.label(str(e)).classes('text-sm text-red-600')
+        details_label.set_text(f'{len(finished)} / {total_accounts} comptes scannés avec succès')
+        
+        # Petit délai pour voir le résultat
+        await asyncio.sleep(0.5)
+        self.scan_progress_container.clear()
+        
+        # Afficher les messages (résultats partiels si annulé)
+        self.current_messages = sorted(all_messages, key=lambda x: x['date'])
+        self.display_all_accounts_messages()
+    
+    def _cancel_scan(self) -> None:
+        """Annule tous les scans de comptes en cours (les résultats déjà reçus restent affichés)."""
+        for task in self._scan_tasks:
+            task.cancel()
     
     def display_all_accounts_messages(self) -> None:
         """Affiche tous les messages de tous les comptes."""
@@ -1031,91 +1149,38 @@ class ScheduledMessagesPage:
         dialog.open()
     
     async def _apply_bulk_edit(self, new_text: Optional[str], new_schedule: Optional[datetime]) -> None:
-        """Applique les modifications en lot - VERSION SIMPLIFIÉE."""
-        total = len(self.selected_messages)
-        success_count = 0
-        error_count = 0
-        errors = []
+        """
+        Applique les modifications en lot.
         
+        Modification sur place (une requête par message), plusieurs groupes
+        en parallèle sous le rate limiter de chaque compte ; les comptes sont
+        traités simultanément.
+        """
         # Afficher un message de progression persistant
         ui.notify('Messages en cours de modification, veuillez patienter...', type='info')
         
-        # Ne pas rafraîchir automatiquement - cela coupe les modifications
-        # Le rafraîchissement se fera après les modifications
-        
-        # Grouper par compte ET par chat pour optimiser
-        messages_by_account_and_chat = {}
+        # Grouper par compte puis par chat : compte -> {chat_id: [message_id]}
+        targets: Dict[Optional[str], Dict[int, List[int]]] = {}
         for chat_id, message_id in self.selected_messages:
             # Trouver le message dans current_messages
             msg = next((m for m in self.current_messages if m['chat_id'] == chat_id and m['message_id'] == message_id), None)
             if msg:
                 account_id = msg.get('account_session_id', self.selected_account)
-                key = (account_id, chat_id)
-                if key not in messages_by_account_and_chat:
-                    messages_by_account_and_chat[key] = []
-                messages_by_account_and_chat[key].append((message_id, msg))
+                targets.setdefault(account_id, {}).setdefault(chat_id, []).append(message_id)
         
-        # Appliquer les modifications par groupe (compte + chat) pour optimiser
-        for (account_id, chat_id), messages in messages_by_account_and_chat.items():
+        async def edit_account(account_id: Optional[str], chats: Dict[int, List[int]]) -> Tuple[int, List[str]]:
             account = self.telegram_manager.get_account(account_id or self.selected_account)
             if not account:
-                error_count += len(messages)
-                continue
-            
-            try:
-                # Récupérer TOUS les messages programmés du chat UNE SEULE FOIS
-                peer = await account.client.get_input_entity(chat_id)
-                result = await account.client(GetScheduledHistoryRequest(peer=peer, hash=0))
-                
-                # Créer un dictionnaire des messages actuels pour accès rapide
-                current_messages_dict = {}
-                if hasattr(result, 'messages') and result.messages:
-                    for msg in result.messages:
-                        if msg and msg.id:
-                            current_messages_dict[msg.id] = msg
-                
-                # Modifier tous les messages de ce chat avec rate limiting
-                for idx, (message_id, msg) in enumerate(messages):
-                    try:
-                        current_message = current_messages_dict.get(message_id)
-                        if not current_message:
-                            error_count += 1
-                            errors.append(f"Message {message_id}: introuvable")
-                            continue
-                        
-                        # Déterminer les nouvelles valeurs
-                        text_to_use = new_text if new_text is not None else (getattr(current_message, 'message', None) or getattr(current_message, 'text', None) or "")
-                        schedule_to_use = new_schedule if new_schedule is not None else current_message.date
-                        
-                        # Supprimer l'ancien message
-                        await account.client(DeleteScheduledMessagesRequest(peer=peer, id=[message_id]))
-                        
-                        # Délai entre suppression et recréation (rate limit Telegram)
-                        await asyncio.sleep(0.1)
-                        
-                        # Recréer le message
-                        await account.client.send_message(
-                            entity=peer,
-                            message=text_to_use,
-                            schedule=schedule_to_use
-                        )
-                        
-                        success_count += 1
-                        
-                        # Rate limiting : Délai de 0.65s entre chaque message
-                        # Total = 0.75s par message = 10 msg en 7.5s = 2.67 req/sec (safe)
-                        if idx < len(messages) - 1:
-                            await asyncio.sleep(0.65)
-                        
-                    except Exception as e:
-                        logger.error(f"Erreur édition message {message_id}: {e}")
-                        error_count += 1
-                        errors.append(f"Message {message_id}: {str(e)}")
-                
-            except Exception as e:
-                logger.error(f"Erreur récupération messages chat {chat_id}: {e}")
-                error_count += len(messages)
-                errors.append(f"Chat {chat_id}: {str(e)}")
+                return 0, [f"Compte {account_id} introuvable"]
+            return await account.bulk_edit_scheduled_messages(chats, new_text, new_schedule)
+        
+        results = await asyncio.gather(*(
+            edit_account(account_id, chats) for account_id, chats in targets.items()
+        ))
+        
+        success_count = sum(count for count, _ in results)
+        errors = [error for _, account_errors in results for error in account_errors]
+        error_count = len(errors)
         
         # Afficher le résultat
         if success_count > 0:
@@ -1133,27 +1198,18 @@ class ScheduledMessagesPage:
         # Désélectionner tout
         self._deselect_all()
     
-    async def _update_ui_after_modification(self) -> None:
-        """Met à jour l'UI après modification - OPTIMISÉE."""
+    async def _update_ui_after_modification(self, chats: Optional[Set[Tuple[Optional[str], int]]] = None) -> None:
+        """
+        Met à jour l'UI après modification, depuis le miroir local.
+        
+        Args:
+            chats: Groupes modifiés (compte, chat_id) ; None = groupes de la sélection
+        """
         try:
-            # Délai minimal pour s'assurer que les modifications sont prises en compte
-            modified_count = len(self.selected_messages)
-            delay = 0.3  # Délai fixe court
-            await asyncio.sleep(delay)
+            modified_count = len(self.selected_messages) or 1
             
-            # Stratégie optimisée selon le volume
-            if modified_count <= 10:
-                # Mise à jour ciblée pour petits volumes
-                await self._refresh_targeted_messages()
-            else:
-                # Rechargement complet pour gros volumes
-                if self.selected_account:
-                    await self.load_scheduled_messages()
-                else:
-                    await self.scan_all_accounts()
-            
-            # Forcer le rafraîchissement de l'UI
-            self.display_messages()
+            # Le miroir est à jour dès la fin des modifications : mise à jour ciblée quel que soit le volume
+            await self._refresh_targeted_messages(chats)
             
             notify(f'Interface mise à jour ({modified_count} messages)', type='positive')
             
@@ -1162,71 +1218,49 @@ class ScheduledMessagesPage:
             # Fallback : rechargement complet
             self.display_messages()
     
-    async def _refresh_targeted_messages(self) -> None:
-        """Rafraîchit seulement les messages modifiés - VERSION OPTIMISÉE."""
-        if not self.selected_messages:
-            return
+    async def _refresh_targeted_messages(self, chats: Optional[Set[Tuple[Optional[str], int]]] = None) -> None:
+        """
+        Rafraîchit seulement les groupes modifiés, depuis le miroir local.
         
-        try:
-            # Grouper par compte et chat pour minimiser les requêtes
-            messages_by_account_and_chat = {}
+        Une modification recrée le message (nouvel ID) : les messages des
+        groupes concernés sont remplacés par ceux du miroir, sans appel réseau.
+        
+        Args:
+            chats: Groupes modifiés (compte, chat_id) ; None = groupes de la sélection
+        """
+        if chats is None:
+            # Groupes de la sélection, par compte
+            chats = set()
             for chat_id, message_id in self.selected_messages:
                 msg = next((m for m in self.current_messages if m['chat_id'] == chat_id and m['message_id'] == message_id), None)
                 if msg:
-                    account_id = msg.get('account_session_id', self.selected_account)
-                    key = (account_id, chat_id)
-                    if key not in messages_by_account_and_chat:
-                        messages_by_account_and_chat[key] = []
-                    messages_by_account_and_chat[key].append(message_id)
-            
-            # Rafraîchir chaque groupe de messages (une requête par chat)
+                    chats.add((msg.get('account_session_id'), chat_id))
+        if not chats:
+            return
+        
+        try:
             updated_count = 0
-            for (account_id, chat_id), message_ids in messages_by_account_and_chat.items():
+            for account_id, chat_id in chats:
                 account = self.telegram_manager.get_account(account_id or self.selected_account)
                 if not account:
                     continue
                 
-                try:
-                    # Récupérer seulement les messages de ce chat
-                    peer = await account.client.get_input_entity(chat_id)
-                    result = await account.client(GetScheduledHistoryRequest(peer=peer, hash=0))
-                    
-                    if hasattr(result, 'messages') and result.messages:
-                        # Mettre à jour seulement les messages modifiés dans current_messages
-                        for msg in result.messages:
-                            if msg and msg.id in message_ids:
-                                # Trouver et mettre à jour le message dans current_messages
-                                for i, current_msg in enumerate(self.current_messages):
-                                    if (current_msg['chat_id'] == chat_id and 
-                                        current_msg['message_id'] == msg.id):
-                                        self.current_messages[i] = {
-                                            "message_id": msg.id,
-                                            "chat_id": chat_id,
-                                            "chat_title": current_msg['chat_title'],
-                                            "text": getattr(msg, 'message', None) or getattr(msg, 'text', None) or "[Fichier]",
-                                            "date": msg.date,
-                                            "has_media": hasattr(msg, 'media') and msg.media is not None,
-                                            "media_type": type(msg.media).__name__ if hasattr(msg, 'media') and msg.media else None,
-                                            "account_session_id": account_id
-                                        }
-                                        updated_count += 1
-                                        break
+                local_messages = await account.get_local_scheduled_messages(chat_id)
+                if account_id:
+                    for msg in local_messages:
+                        msg['account_session_id'] = account_id
                 
-                except Exception as e:
-                    logger.warning(f"Erreur rafraîchissement messages pour chat {chat_id}: {e}")
-                    continue
+                # Remplacer les messages du groupe par ceux du miroir
+                self.current_messages = [
+                    m for m in self.current_messages
+                    if not (m['chat_id'] == chat_id and m.get('account_session_id') == account_id)
+                ] + local_messages
+                updated_count += len(local_messages)
             
-            # Rafraîchir l'affichage seulement si des messages ont été mis à jour
+            self.current_messages.sort(key=lambda x: x['date'])
+            self.display_messages()
             if updated_count > 0:
-                self.display_messages()
                 notify(f'{updated_count} message(s) mis à jour', type='positive')
-            else:
-                # Si aucun message n'a été mis à jour, forcer le rechargement complet
-                logger.warning("Aucun message mis à jour - rechargement complet")
-                if self.selected_account:
-                    await self.load_scheduled_messages()
-                else:
-                    await self.scan_all_accounts()
             
         except Exception as e:
             logger.error(f"Erreur rafraîchissement messages ciblés: {e}")
@@ -1327,8 +1361,8 @@ class ScheduledMessagesPage:
                         
                         if success:
                             notify('Message modifié avec succès !', type='positive')
-                            # Rafraîchir l'UI complètement pour s'assurer que les changements sont visibles
-                            await self._update_ui_after_modification()
+                            # Rafraîchir le groupe depuis le miroir local
+                            await self._update_ui_after_modification({(None, chat_id)})
                         else:
                             notify(f'Erreur: {error}', type='negative')
                     
@@ -189,6 +189,18 @@ class SendingTasksPage:
                             'color: var(--text-secondary); font-style: italic;'
                         )
             
+            # Réessais après FloodWait
+            if task.deferred or task.retried or task.failed:
+                with ui.row().classes('w-full gap-6 mb-3'):
+                    for label, value, color in (
+                        ('Différés', task.deferred, 'var(--warning)'),
+                        ('Réessais', task.retried, 'var(--text-primary)'),
+                        ('Échecs', task.failed, 'var(--danger)'),
+                    ):
+                        with ui.column().classes('gap-1'):
+                            ui.label(label).classes('text-xs').style('color: var(--text-secondary);')
+                            ui.label(str(value)).classes('text-lg font-bold').style(f'color: {color};')
+            
             # Indicateur d'attente FloodWait
             if is_active and task.is_waiting and task.waiting_until:
                 wait_until_str = task.waiting_until.strftime('%H:%M:%S')
@@ -64,6 +64,23 @@ class Config:
             'max': 1440,
             'description': 'Déconnexion automatique (minutes, 0=désactivé)'
         },
+        'cache.retention_messages_per_chat': {
+            'type': int,
+            'min': 0,
+            'max': 1000000,
+            'description': 'Messages conservés en cache par conversation (0=illimité)'
+        },
+        'cache.retention_inactive_days': {
+            'type': int,
+            'min': 0,
+            'max': 3650,
+            'description': 'Purge des conversations non ouvertes depuis (jours, 0=désactivé)'
+        },
+        'cache.storage_mode': {
+            'type': str,
+            'pattern': r'^(single|sharded)$',
+            'description': 'Stockage du cache : un fichier (single) ou un fichier par compte (sharded)'
+        },
         'ui.font_size': {
             'type': int,
             'min': 6,
@@ -94,6 +111,11 @@ class Config:
             "auto_logout_minutes": 0,  # 0 = désactivé
             "require_password": False
         },
+        "cache": {
+            "retention_messages_per_chat": 5000,  # Messages conservés par conversation
+            "retention_inactive_days": 180,       # Conversations non ouvertes (hors épinglées)
+            "storage_mode": "single"              # "sharded" : un fichier SQLite par compte
+        },
         "ui": {
             "theme": "light",
             "font_family": "Segoe UI",
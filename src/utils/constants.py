@@ -9,13 +9,35 @@ APP_VERSION: Final[str] = "2.1.5"
 
 # Limites Telegram
 TELEGRAM_MAX_MESSAGE_LENGTH: Final[int] = 4096
+TELEGRAM_MAX_CAPTION_LENGTH: Final[int] = 1024  # Légende d'une photo ou d'un document
 
-# Rate limiting global optimisé pour multi-comptes
-TELEGRAM_GLOBAL_RATE_LIMIT: Final[int] = 25  # Limite GLOBALE stricte (tous comptes confondus)
-TELEGRAM_SAFETY_MARGIN: Final[float] = 0.90  # Marge de sécurité (90% = 22.5 req/s réelles)
+# Rate limiting hiérarchique (global → compte → groupe → méthode) optimisé pour multi-comptes
+TELEGRAM_GLOBAL_RATE_LIMIT: Final[int] = 100  # Plafond côté client, tous comptes confondus (req/s)
+TELEGRAM_ACCOUNT_RATE_LIMIT: Final[int] = 25  # Quota par compte (req/s)
+TELEGRAM_SAFETY_MARGIN: Final[float] = 0.90  # Marge de sécurité (90% = 22.5 req/s réelles par compte)
+TELEGRAM_RATE_BURST: Final[int] = 2  # Rafale tolérée (jetons) pour les seaux global et par compte
 
 TELEGRAM_MIN_DELAY_PER_CHAT: Final[float] = 0.5  # 1 msg toutes les 0.5 sec/chat (optimisé)
 TELEGRAM_MAX_SCHEDULED_MESSAGES_FETCH: Final[int] = 100  # Limite de récupération des messages
+TELEGRAM_DIALOGS_REFRESH_INTERVAL: Final[int] = 60  # Rafraîchissement incrémental des groupes (secondes)
+TELEGRAM_SCHEDULED_SCAN_CONCURRENCY: Final[int] = 8  # Groupes scannés simultanément par compte
+TELEGRAM_SCHEDULED_EDIT_CONCURRENCY: Final[int] = 4  # Groupes modifiés simultanément par compte
+TELEGRAM_MAX_IDS_PER_REQUEST: Final[int] = 100  # IDs de messages par requête (suppression, lecture)
+TELEGRAM_SEND_PIPELINE_DEPTH: Final[int] = 6  # Envois programmés en vol simultanément par compte
+TELEGRAM_SEND_RETRY_BUDGET: Final[int] = 3  # Réessais d'un message après FloodWait avant abandon
+TELEGRAM_SEND_RETRY_BACKOFF: Final[float] = 2.0  # Marge ajoutée au FloodWait, doublée à chaque réessai (secondes)
+TELEGRAM_SESSION_LOAD_CONCURRENCY: Final[int] = 8  # Comptes connectés simultanément au démarrage
+
+# Politique de connexion par compte : toujours connecté, à la demande, ou mise en veille après inactivité
+CONNECTION_POLICY_ALWAYS: Final[str] = "always"
+CONNECTION_POLICY_ON_DEMAND: Final[str] = "on_demand"
+CONNECTION_POLICY_IDLE: Final[str] = "idle"
+CONNECTION_POLICIES: Final[tuple[str, ...]] = (
+    CONNECTION_POLICY_ALWAYS, CONNECTION_POLICY_ON_DEMAND, CONNECTION_POLICY_IDLE
+)
+DEFAULT_IDLE_TIMEOUT_MINUTES: Final[int] = 30  # Mise en veille (politique "idle")
+ON_DEMAND_IDLE_SECONDS: Final[int] = 120  # Mise en veille après usage (politique "on_demand")
+IDLE_CHECK_INTERVAL_SECONDS: Final[int] = 30  # Fréquence de vérification des comptes inactifs
 
 # Limites de fichiers
 MAX_FILE_SIZE_MB: Final[float] = 2.5
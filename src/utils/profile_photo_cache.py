@@ -1,14 +1,18 @@
 """
 Système de cache persistent pour les photos de profil.
 Utilise la base de données SQLite pour stocker les chemins des photos.
+
+Tous les accès à la base passent par la façade asynchrone (get_async_db) :
+aucun appel SQLite ne bloque la boucle d'événements, même pendant les
+migrations du démarrage.
 """
-import os
 import asyncio
 from pathlib import Path
-from typing import Optional, Callable
+from typing import Optional, Callable, Set
 from telethon import TelegramClient
 
-from database.telegram_db import get_telegram_db
+from database.async_db import get_async_db
+from database.photo_index import get_photo_index, photo_file_stats
 from utils.logger import get_logger
 from utils.media_validator import MediaValidator
 
@@ -23,11 +27,12 @@ class ProfilePhotoCache:
     - Vérifie si une photo existe déjà en cache
     - Télécharge les photos manquantes en arrière-plan
     - Stocke les chemins dans la base de données SQLite
+    - Tient l'index mémoire des fichiers présents (aucun stat par requête)
     """
     
     def __init__(self):
         """Initialise le cache des photos."""
-        self.db = get_telegram_db()
+        self.db = get_async_db()
         
         # CORRECTION : Utiliser get_temp_dir() pour la cohérence
         from utils.paths import get_temp_dir
@@ -37,8 +42,73 @@ class ProfilePhotoCache:
         # Queue pour téléchargements en arrière-plan
         self._download_queue: asyncio.Queue = asyncio.Queue()
         self._is_processing = False
+        
+        # Fichiers présents : un seul parcours du dossier au démarrage,
+        # en arrière-plan (la lecture de la base attend les migrations)
+        self.index = get_photo_index()
+        self._index_task: Optional[asyncio.Task] = None
+        try:
+            self._index_task = asyncio.get_running_loop().create_task(self.refresh_index())
+        except RuntimeError:
+            logger.debug("Pas de boucle d'événements : refresh_index() à appeler explicitement")
+    
+    async def refresh_index(self) -> int:
+        """
+        Reconstruit l'index des photos présentes (un parcours du dossier).
+        
+        Le parcours du dossier s'exécute hors de la boucle d'événements.
+        
+        Returns:
+            int: Nombre de photos présentes
+        """
+        try:
+            records = await self.db.get_profile_photo_records()
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.index.refresh, self.photos_dir, records)
+        except Exception as e:
+            logger.error(f"Erreur construction de l'index des photos : {e}")
+            return 0
+    
+    async def _register_photo(self, entity_id: int, photo_path: str) -> None:
+        """
+        Enregistre une photo téléchargée (taille et date relevées une fois).
+        
+        Args:
+            entity_id: ID de l'entité
+            photo_path: Chemin de la photo
+            
+        Raises:
+            OSError: Fichier absent ou illisible
+        """
+        file_size, file_mtime = photo_file_stats(photo_path)
+        await self.db.save_profile_photo(entity_id, photo_path, file_size, file_mtime)
+        self.index.add(photo_path)
+    
+    def mark_missing(self, photo_path: str) -> None:
+        """
+        Signale une photo qui n'a pas pu être affichée (fichier manquant ou illisible).
+        
+        Elle sort de l'index immédiatement et de la base en arrière-plan
+        (appelé pendant le rendu) : elle sera téléchargée à nouveau.
+        
+        Args:
+            photo_path: Chemin de la photo
+        """
+        if photo_path not in self.index:
+            return
+        
+        self.index.discard(photo_path)
+        asyncio.create_task(self._forget_photo(photo_path))
+        logger.warning(f"Photo en cache mais illisible, sera retéléchargée: {photo_path}")
+    
+    async def _forget_photo(self, photo_path: str) -> None:
+        """Supprime de la base une photo illisible (tâche privée)."""
+        try:
+            await self.db.forget_profile_photo(photo_path)
+        except Exception as e:
+            logger.error(f"Erreur suppression photo en base {photo_path}: {e}")
     
-    def get_photo_path(self, entity_id: int) -> Optional[str]:
+    async def get_photo_path(self, entity_id: int) -> Optional[str]:
         """
         Récupère le chemin d'une photo depuis le cache.
         
@@ -48,20 +118,15 @@ class ProfilePhotoCache:
         Returns:
             Optional[str]: Chemin de la photo ou None si pas en cache
         """
-        photo_path = self.db.get_profile_photo(entity_id)
+        photo_path = await self.db.get_profile_photo(entity_id)
         
-        # Vérifier que le fichier existe toujours
-        if photo_path and os.path.exists(photo_path):
+        # Présence lue dans l'index (fichier manquant détecté à l'affichage)
+        if photo_path and photo_path in self.index:
             return photo_path
         
-        # Si le fichier n'existe plus, supprimer de la DB
-        if photo_path:
-            logger.warning(f"Photo en cache mais fichier manquant: {photo_path}")
-            # Note: on pourrait supprimer l'entrée de la DB ici
-        
         return None
     
-    def has_photo(self, entity_id: int) -> bool:
+    async def has_photo(self, entity_id: int) -> bool:
         """
         Vérifie si une photo existe en cache.
         
@@ -71,7 +136,7 @@ class ProfilePhotoCache:
         Returns:
             bool: True si la photo existe
         """
-        photo_path = self.get_photo_path(entity_id)
+        photo_path = await self.get_photo_path(entity_id)
         return photo_path is not None
     
     async def download_photo(
@@ -96,7 +161,7 @@ class ProfilePhotoCache:
             Optional[str]: Chemin de la photo ou None
         """
         # Vérifier si déjà en cache
-        cached_path = self.get_photo_path(entity_id)
+        cached_path = await self.get_photo_path(entity_id)
         if cached_path:
             logger.debug(f"Photo déjà en cache pour entity {entity_id}")
             return cached_path
@@ -119,7 +184,7 @@ class ProfilePhotoCache:
             # Si le fichier existe déjà sur disque (mais pas en DB)
             if target_file.exists():
                 logger.debug(f"Photo trouvée sur disque pour entity {entity_id}")
-                self.db.save_profile_photo(entity_id, str(target_file))
+                await self._register_photo(entity_id, str(target_file))
                 return str(target_file)
             
             # Télécharger avec timeout et nom de fichier unique
@@ -130,7 +195,7 @@ class ProfilePhotoCache:
             
             if photo_path:
                 # Sauvegarder dans la DB
-                self.db.save_profile_photo(entity_id, photo_path)
+                await self._register_photo(entity_id, photo_path)
                 logger.debug(f"Photo téléchargée et mise en cache : {photo_path}")
                 
                 # Appeler le callback si fourni
@@ -183,7 +248,7 @@ class ProfilePhotoCache:
         except Exception as e:
             logger.error(f"Erreur tâche téléchargement photo {entity_id}: {e}")
     
-    def save_photo_path(self, entity_id: int, photo_path: str):
+    async def save_photo_path(self, entity_id: int, photo_path: str):
         """
         Sauvegarde un chemin de photo dans le cache.
         
@@ -193,70 +258,79 @@ class ProfilePhotoCache:
             entity_id: ID de l'entité
             photo_path: Chemin de la photo
         """
-        if os.path.exists(photo_path):
-            self.db.save_profile_photo(entity_id, photo_path)
+        try:
+            await self._register_photo(entity_id, photo_path)
             logger.debug(f"Chemin photo sauvegardé dans cache : {entity_id}")
-        else:
+        except OSError:
             logger.warning(f"Tentative de sauvegarder chemin inexistant : {photo_path}")
     
-    def get_cache_stats(self) -> dict:
+    async def get_cache_stats(self) -> dict:
         """
         Récupère les statistiques du cache.
         
         Returns:
             dict: Statistiques
         """
-        stats = self.db.get_stats()
-        
-        # Taille totale des photos
-        total_size = 0
-        photo_count = 0
-        
-        if self.photos_dir.exists():
-            for photo_file in self.photos_dir.iterdir():
-                if photo_file.is_file():
-                    total_size += photo_file.stat().st_size
-                    photo_count += 1
+        # Compteurs de la base et index mémoire : aucun parcours du dossier
+        stats = await self.db.get_stats()
         
         return {
             'photos_in_db': stats.get('photos_count', 0),
-            'photos_on_disk': photo_count,
-            'total_size_mb': total_size / (1024 * 1024),
+            'photos_on_disk': len(self.index),
+            'total_size_mb': stats.get('photos_size_mb', 0),
             'photos_dir': str(self.photos_dir)
         }
     
-    def cleanup_orphaned_photos(self):
+    async def cleanup_orphaned_photos(self) -> int:
         """
         Nettoie les photos orphelines (fichiers sans entrée dans la DB).
+        
+        Les chemins référencés sont lus en une requête par la façade ;
+        le parcours du dossier et les suppressions s'exécutent hors de la
+        boucle d'événements.
+        
+        Returns:
+            int: Nombre de photos supprimées
         """
-        if not self.photos_dir.exists():
-            return
+        records = await self.db.get_profile_photo_records()
+        referenced = {path for path, _, _ in records}
         
-        cleaned = 0
-        for photo_file in self.photos_dir.iterdir():
-            if photo_file.is_file():
-                # Vérifier si ce fichier est référencé dans la DB
-                photo_path = str(photo_file)
-                # Requête pour vérifier si le chemin existe
-                cursor = self.db.conn.execute(
-                    "SELECT 1 FROM profile_photos WHERE photo_path = ?",
-                    (photo_path,)
-                )
-                
-                if not cursor.fetchone():
-                    # Fichier orphelin, le supprimer
-                    try:
-                        photo_file.unlink()
-                        cleaned += 1
-                        logger.debug(f"Photo orpheline supprimée : {photo_path}")
-                    except Exception as e:
-                        logger.error(f"Erreur suppression photo orpheline : {e}")
+        loop = asyncio.get_running_loop()
+        cleaned = await loop.run_in_executor(None, self._remove_orphans, referenced)
         
         if cleaned > 0:
             logger.info(f"Nettoyage : {cleaned} photo(s) orpheline(s) supprimée(s)")
         
         return cleaned
-
+    
+    def _remove_orphans(self, referenced: Set[str]) -> int:
+        """
+        Supprime les fichiers du dossier absents des chemins référencés.
+        
+        Args:
+            referenced: Chemins enregistrés en base
+            
+        Returns:
+            int: Nombre de fichiers supprimés
+        """
+        if not self.photos_dir.exists():
+            return 0
+        
+        cleaned = 0
+        for photo_file in self.photos_dir.iterdir():
+            if not photo_file.is_file() or str(photo_file) in referenced:
+                continue
+            
+            # Fichier orphelin, le supprimer
+            try:
+                photo_file.unlink()
+                self.index.discard(photo_file)
+                cleaned += 1
+                logger.debug(f"Photo orpheline supprimée : {photo_file}")
+            except Exception as e:
+                logger.error(f"Erreur suppression photo orpheline : {e}")
+        
+        return cleaned
 
 # Instance globale (singleton)
 _photo_cache_instance = None
@@ -8,26 +8,169 @@ Limites Telegram officielles :
 - 20 messages par seconde dans un même chat
 - Pas plus de 30 messages par seconde au total
 - Limite augmentée pour les bots/comptes vérifiés
+
+Les limites sont hiérarchiques : une requête consomme un jeton dans le seau
+de sa méthode, de son groupe, de son compte puis dans le seau global. Les
+quotas étant propres à chaque compte, le débit total augmente avec le nombre
+de comptes jusqu'au plafond global.
 """
-from datetime import datetime, timedelta
-from collections import defaultdict
-from typing import Dict, Tuple, Optional
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, List, Optional, Tuple
 import asyncio
+import math
+import time
 
+from utils.constants import (
+    TELEGRAM_ACCOUNT_RATE_LIMIT,
+    TELEGRAM_GLOBAL_RATE_LIMIT,
+    TELEGRAM_MIN_DELAY_PER_CHAT,
+    TELEGRAM_RATE_BURST,
+    TELEGRAM_SAFETY_MARGIN
+)
 from utils.logger import get_logger
 
 logger = get_logger()
 
+# Nombre de seaux par groupe au-delà duquel les seaux inactifs sont purgés
+CHAT_BUCKETS_PRUNE_THRESHOLD = 10_000
+
+
+class TokenBucket:
+    """
+    Seau à jetons avec file d'attente FIFO.
+
+    Les appelants qui ne trouvent pas de jeton attendent dans une file ; un
+    seul minuteur les réveille dans l'ordre d'arrivée à mesure que les jetons
+    se régénèrent (pas d'attente calculée par appelant ni de course au réveil).
+    """
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', '_waiters', '_timer')
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: Jetons régénérés par seconde
+            capacity: Nombre maximum de jetons (rafale autorisée)
+        """
+        self.rate = rate
+        self.capacity = max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _refill(self) -> None:
+        """Ajoute les jetons régénérés depuis la dernière mise à jour."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def set_rate(self, rate: float) -> None:
+        """Change le débit (les jetons déjà acquis sont conservés)."""
+        self._refill()
+        self.rate = rate
+
+    def block(self, seconds: float) -> None:
+        """Suspend la distribution de jetons pendant `seconds` (FloodWait)."""
+        self._refill()
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._schedule()
+
+    def try_take(self) -> bool:
+        """Prend un jeton sans attendre si aucun appelant ne précède."""
+        if self._waiters:
+            return False
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def take(self) -> None:
+        """Prend un jeton, en attendant son tour dans la file si nécessaire."""
+        if self.try_take():
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._schedule()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Jeton accordé mais appelant annulé avant de reprendre : le rendre
+            if future.done() and not future.cancelled():
+                self.refund()
+            raise
+
+    def refund(self) -> None:
+        """Rend un jeton non utilisé (acquisition abandonnée)."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + 1)
+        if self._waiters:
+            self._wake()
+
+    def _schedule(self) -> None:
+        """Programme le réveil du premier appelant en attente."""
+        if self._timer is not None or not self._waiters:
+            return
+        delay = max(0.0, (1 - self.tokens) / self.rate)
+        self._timer = asyncio.get_running_loop().call_later(delay, self._wake)
+
+    def _wake(self) -> None:
+        """Distribue les jetons disponibles aux appelants, dans l'ordre d'arrivée."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._refill()
+        while self._waiters and self.tokens >= 1:
+            future = self._waiters.popleft()
+            if future.done():
+                continue  # Appelant annulé
+            self.tokens -= 1
+            future.set_result(None)
+        while self._waiters and self._waiters[0].done():
+            self._waiters.popleft()
+        self._schedule()
+
+    @property
+    def waiting(self) -> int:
+        """Nombre d'appelants en attente."""
+        return len(self._waiters)
+
+    def available(self) -> float:
+        """Jetons disponibles (après régénération)."""
+        self._refill()
+        return self.tokens
+
+    def time_until_token(self) -> float:
+        """Secondes avant qu'un jeton soit disponible (0 si immédiat)."""
+        return max(0.0, (1 - self.available()) / self.rate)
+
+    def is_idle(self) -> bool:
+        """Indique si le seau est plein et sans attente (peut être oublié)."""
+        if self._waiters:
+            return False
+        self._refill()
+        return self.tokens >= self.capacity
+
 
 class RateLimiter:
     """
-    Rate limiter côté client pour les requêtes Telegram.
-    
-    Implémente l'algorithme du token bucket pour un contrôle précis
-    du débit de requêtes.
+    Rate limiter hiérarchique côté client pour les requêtes Telegram.
+
+    Niveaux (du plus spécifique au plus large) : méthode par compte, groupe,
+    compte, global. Chaque niveau est un seau à jetons ; l'acquisition est en
+    O(1) et les attentes sont servies dans l'ordre d'arrivée.
+
+    S'adapte automatiquement après un FloodWait en réduisant le débit du
+    compte concerné, puis le récupère progressivement.
     """
-    
-    # Limites par défaut (conservatrices pour éviter les bans)
+
+    # Limites par méthode et par compte (conservatrices pour éviter les bans)
     DEFAULT_LIMITS = {
         'send_message': (20, 60),      # 20 messages par minute
         'send_file': (10, 60),          # 10 fichiers par minute
@@ -35,119 +178,274 @@ class RateLimiter:
         'get_messages': (30, 60),       # 30 requêtes par minute
         'download_media': (15, 60),     # 15 téléchargements par minute
         'schedule_message': (20, 60),   # 20 messages programmés par minute
+        'get_scheduled_history': (10, 1),  # 10 scans de groupe par seconde
+        'edit_scheduled': (5, 1),       # 5 modifications de message programmé par seconde
+        'delete_scheduled': (5, 1),     # 5 suppressions groupées (100 IDs max) par seconde
     }
-    
-    def __init__(self, custom_limits: Optional[Dict[str, Tuple[int, int]]] = None):
+
+    # Pénalité adaptative après FloodWait
+    FLOOD_PENALTY_FACTOR = 1.5
+    MAX_FLOOD_PENALTY = 4.0
+    RECOVERY_THRESHOLD = 50  # Succès nécessaires pour réduire la pénalité de 20%
+
+    def __init__(
+        self,
+        custom_limits: Optional[Dict[str, Tuple[int, int]]] = None,
+        global_rate: float = TELEGRAM_GLOBAL_RATE_LIMIT * TELEGRAM_SAFETY_MARGIN,
+        account_rate: float = TELEGRAM_ACCOUNT_RATE_LIMIT * TELEGRAM_SAFETY_MARGIN,
+        chat_interval: float = TELEGRAM_MIN_DELAY_PER_CHAT,
+        burst: int = TELEGRAM_RATE_BURST
+    ):
         """
         Initialise le rate limiter.
-        
+
         Args:
-            custom_limits: Limites personnalisées {action: (max_requests, period_seconds)}
+            custom_limits: Limites par méthode {action: (max_requests, period_seconds)}
+            global_rate: Débit maximum tous comptes confondus (req/s)
+            account_rate: Débit maximum par compte (req/s)
+            chat_interval: Délai minimum entre deux requêtes d'un compte vers un même groupe
+            burst: Rafale tolérée pour les seaux global et par compte
         """
         self.limits = {**self.DEFAULT_LIMITS}
         if custom_limits:
             self.limits.update(custom_limits)
-        
-        # Historique des requêtes par action et identifiant
-        # Format: {action:identifier: [timestamp1, timestamp2, ...]}
-        self.requests: Dict[str, list] = defaultdict(list)
-        
-        # Verrouillage pour thread-safety
-        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
-        
-        logger.debug("Rate limiter initialisé avec limites conservatrices")
-    
+
+        self.account_rate = account_rate
+        self.chat_interval = chat_interval
+        self.burst = burst
+
+        self._global = TokenBucket(global_rate, burst)
+        self._accounts: Dict[str, TokenBucket] = {}
+        self._chats: Dict[Tuple[str, int], TokenBucket] = {}
+        self._methods: Dict[Tuple[str, str], TokenBucket] = {}
+        self._prune_at = CHAT_BUCKETS_PRUNE_THRESHOLD
+
+        # Système adaptatif par compte
+        self._flood_counts: Dict[str, int] = {}
+        self._penalties: Dict[str, float] = {}
+        self._successes_since_flood: Dict[str, int] = {}
+
+        logger.debug(
+            f"Rate limiter initialisé ({global_rate:.1f} req/s global, "
+            f"{account_rate:.1f} req/s par compte)"
+        )
+
+    def _account_bucket(self, account_id: str) -> TokenBucket:
+        """Récupère (ou crée) le seau d'un compte."""
+        bucket = self._accounts.get(account_id)
+        if bucket is None:
+            rate = self.account_rate / self._penalties.get(account_id, 1.0)
+            bucket = self._accounts[account_id] = TokenBucket(rate, self.burst)
+        return bucket
+
+    def _chat_bucket(self, account_id: str, chat_id: int) -> TokenBucket:
+        """Récupère (ou crée) le seau d'un groupe pour un compte."""
+        key = (account_id, chat_id)
+        bucket = self._chats.get(key)
+        if bucket is None:
+            if len(self._chats) >= self._prune_at:
+                self._prune_chats()
+            bucket = self._chats[key] = TokenBucket(1.0 / self.chat_interval, 1)
+        return bucket
+
+    def _method_bucket(
+        self,
+        account_id: str,
+        method: str,
+        create: bool = False
+    ) -> Optional[TokenBucket]:
+        """
+        Récupère (ou crée) le seau d'une méthode pour un compte.
+
+        Seules les méthodes présentes dans limits ont un seau d'office ;
+        create=True en crée un pour une autre méthode (blocage FloodWait).
+        """
+        key = (method, account_id)
+        bucket = self._methods.get(key)
+        if bucket is None:
+            if method in self.limits:
+                max_requests, period_seconds = self.limits[method]
+                bucket = TokenBucket(max_requests / period_seconds, max_requests)
+            elif create:
+                bucket = TokenBucket(self.account_rate, self.burst)
+            else:
+                return None
+            self._methods[key] = bucket
+        return bucket
+
+    def _prune_chats(self) -> None:
+        """Oublie les seaux de groupe pleins et sans attente."""
+        self._chats = {key: bucket for key, bucket in self._chats.items() if not bucket.is_idle()}
+        self._prune_at = max(CHAT_BUCKETS_PRUNE_THRESHOLD, 2 * len(self._chats))
+
+    def _buckets_for(
+        self,
+        account_id: str,
+        method: Optional[str],
+        chat_id: Optional[int]
+    ) -> List[TokenBucket]:
+        """Seaux à traverser, du plus spécifique au global."""
+        buckets = []
+        if method:
+            method_bucket = self._method_bucket(account_id, method)
+            if method_bucket is not None:
+                buckets.append(method_bucket)
+        if chat_id is not None and self.chat_interval > 0:
+            buckets.append(self._chat_bucket(account_id, chat_id))
+        buckets.append(self._account_bucket(account_id))
+        buckets.append(self._global)
+        return buckets
+
+    async def acquire(
+        self,
+        account_id: str,
+        method: Optional[str] = None,
+        chat_id: Optional[int] = None
+    ) -> None:
+        """
+        Attend qu'une requête soit autorisée à tous les niveaux.
+
+        Le seau global est pris en dernier : il n'est consommé que par des
+        requêtes déjà autorisées par leur compte, ce qui évite qu'un compte
+        ralenti bloque les autres.
+
+        Args:
+            account_id: ID de session du compte
+            method: Type d'action (ex: 'edit_scheduled'), limité si présent dans limits
+            chat_id: Groupe visé (limite par groupe)
+        """
+        taken: List[TokenBucket] = []
+        try:
+            for bucket in self._buckets_for(account_id, method, chat_id):
+                await bucket.take()
+                taken.append(bucket)
+        except asyncio.CancelledError:
+            for bucket in taken:
+                bucket.refund()
+            raise
+
+    @asynccontextmanager
+    async def request_slot(
+        self,
+        account_id: str,
+        method: Optional[str] = None,
+        chat_id: Optional[int] = None
+    ):
+        """
+        Context manager pour acquérir un slot de requête.
+
+        Usage:
+            async with rate_limiter.request_slot(account_id, chat_id=group_id):
+                await account.schedule_message(...)
+        """
+        await self.acquire(account_id, method, chat_id)
+        yield
+
+    def block(
+        self,
+        account_id: str,
+        seconds: float,
+        method: Optional[str] = None,
+        chat_id: Optional[int] = None
+    ) -> None:
+        """
+        Suspend un niveau pendant un FloodWait : le groupe si chat_id est
+        donné, sinon la méthode, sinon tout le compte. Les autres niveaux
+        continuent d'être servis.
+
+        Args:
+            account_id: ID de session du compte
+            seconds: Durée du blocage
+            method: Méthode bloquée
+            chat_id: Groupe bloqué (mode lent)
+        """
+        if chat_id is not None:
+            bucket = self._chat_bucket(account_id, chat_id)
+        elif method:
+            bucket = self._method_bucket(account_id, method, create=True)
+        else:
+            bucket = self._account_bucket(account_id)
+        bucket.block(seconds)
+
+    def report_flood(self, account_id: str) -> None:
+        """
+        Signale qu'un FloodWait a été détecté pour ce compte.
+
+        Ralentit automatiquement le débit du compte pour éviter les répétitions.
+        """
+        self._flood_counts[account_id] = self._flood_counts.get(account_id, 0) + 1
+        penalty = min(
+            self._penalties.get(account_id, 1.0) * self.FLOOD_PENALTY_FACTOR,
+            self.MAX_FLOOD_PENALTY
+        )
+        self._penalties[account_id] = penalty
+        self._successes_since_flood[account_id] = 0
+
+        new_rate = self.account_rate / penalty
+        self._account_bucket(account_id).set_rate(new_rate)
+        logger.warning(
+            f"FloodWait #{self._flood_counts[account_id]} détecté → "
+            f"Débit réduit: {new_rate:.1f} req/s "
+            f"(pénalité ×{penalty:.1f})"
+        )
+
+    def report_success(self, account_id: str) -> None:
+        """Signale un envoi réussi et récupère progressivement le débit."""
+        penalty = self._penalties.get(account_id, 1.0)
+        if penalty <= 1.0:
+            return
+
+        successes = self._successes_since_flood.get(account_id, 0) + 1
+        self._successes_since_flood[account_id] = successes
+
+        # Récupération progressive : tous les 50 succès, réduire de 20%
+        if successes >= self.RECOVERY_THRESHOLD:
+            penalty = max(penalty * 0.8, 1.0)
+            self._penalties[account_id] = penalty
+            self._successes_since_flood[account_id] = 0
+            self._account_bucket(account_id).set_rate(self.account_rate / penalty)
+
     async def check_rate_limit(
         self,
         action: str,
         identifier: str = "global"
     ) -> Tuple[bool, int]:
         """
-        Vérifie si une action est autorisée selon les limites de débit.
-        
+        Vérifie sans attendre si une action est autorisée (seau de la méthode
+        uniquement) et consomme un jeton si c'est le cas.
+
         Args:
             action: Type d'action (ex: 'send_message', 'get_dialogs')
             identifier: Identifiant unique (ex: chat_id, session_id)
-        
+
         Returns:
             Tuple[bool, int]: (is_allowed, wait_seconds)
-                - is_allowed: True si l'action est autorisée
-                - wait_seconds: Temps d'attente en secondes si refusé
         """
-        # Si l'action n'a pas de limite définie, autoriser
-        if action not in self.limits:
+        bucket = self._method_bucket(identifier, action)
+        if bucket is None:
             return True, 0
-        
-        max_requests, period_seconds = self.limits[action]
-        key = f"{action}:{identifier}"
-        
-        # Utiliser un lock pour éviter les race conditions
-        async with self._locks[key]:
-            now = datetime.now()
-            cutoff = now - timedelta(seconds=period_seconds)
-            
-            # Nettoyer les requêtes trop anciennes
-            self.requests[key] = [
-                ts for ts in self.requests[key]
-                if ts > cutoff
-            ]
-            
-            # Vérifier si la limite est atteinte
-            if len(self.requests[key]) >= max_requests:
-                # Calculer le temps d'attente
-                oldest_request = min(self.requests[key])
-                wait_until = oldest_request + timedelta(seconds=period_seconds)
-                wait_seconds = int((wait_until - now).total_seconds())
-                
-                logger.warning(
-                    f"Rate limit atteint pour {action} ({identifier}): "
-                    f"{len(self.requests[key])}/{max_requests} en {period_seconds}s. "
-                    f"Attendre {wait_seconds}s"
-                )
-                
-                return False, max(0, wait_seconds)
-            
-            # Enregistrer la requête
-            self.requests[key].append(now)
-            
-            logger.debug(
-                f"Rate limit OK pour {action} ({identifier}): "
-                f"{len(self.requests[key])}/{max_requests}"
-            )
-            
+        if bucket.try_take():
             return True, 0
-    
+        wait_seconds = math.ceil(bucket.time_until_token())
+        logger.debug(f"Rate limit atteint pour {action} ({identifier}): attendre {wait_seconds}s")
+        return False, wait_seconds
+
     async def wait_if_needed(
         self,
         action: str,
         identifier: str = "global"
     ) -> bool:
         """
-        Attend automatiquement si la limite de débit est atteinte.
-        
-        ATTENTION: Cette méthode peut bloquer pendant plusieurs secondes.
-        
-        Args:
-            action: Type d'action
-            identifier: Identifiant unique
-        
+        Attend son tour (file FIFO) pour une action limitée.
+
         Returns:
-            bool: True si l'action peut maintenant être effectuée
+            bool: True quand l'action peut être effectuée
         """
-        is_allowed, wait_seconds = await self.check_rate_limit(action, identifier)
-        
-        if not is_allowed and wait_seconds > 0:
-            logger.info(
-                f"⏳ Attente de {wait_seconds}s pour respecter le rate limit "
-                f"({action})"
-            )
-            await asyncio.sleep(wait_seconds)
-            
-            # Réessayer après l'attente
-            is_allowed, _ = await self.check_rate_limit(action, identifier)
-        
-        return is_allowed
-    
+        bucket = self._method_bucket(identifier, action)
+        if bucket is not None:
+            await bucket.take()
+        return True
+
     def get_remaining_requests(
         self,
         action: str,
@@ -155,85 +453,55 @@ class RateLimiter:
     ) -> int:
         """
         Retourne le nombre de requêtes restantes pour une action.
-        
-        Args:
-            action: Type d'action
-            identifier: Identifiant unique
-        
+
         Returns:
             int: Nombre de requêtes restantes (ou -1 si pas de limite)
         """
         if action not in self.limits:
             return -1
-        
-        max_requests, period_seconds = self.limits[action]
-        key = f"{action}:{identifier}"
-        
-        now = datetime.now()
-        cutoff = now - timedelta(seconds=period_seconds)
-        
-        # Nettoyer les requêtes anciennes
-        self.requests[key] = [
-            ts for ts in self.requests[key]
-            if ts > cutoff
-        ]
-        
-        current_count = len(self.requests[key])
-        remaining = max(0, max_requests - current_count)
-        
-        return remaining
-    
-    def reset_limit(self, action: str, identifier: str = "global"):
+        bucket = self._method_bucket(identifier, action)
+        return max(0, int(bucket.available()))
+
+    def reset_limit(self, action: str, identifier: str = "global") -> None:
         """
-        Réinitialise le compteur pour une action spécifique.
-        
+        Réinitialise le seau d'une action (quota plein).
+
         ATTENTION: Utiliser avec précaution. Peut causer des FloodWait.
-        
-        Args:
-            action: Type d'action
-            identifier: Identifiant unique
         """
-        key = f"{action}:{identifier}"
-        self.requests[key] = []
+        self._methods.pop((action, identifier), None)
         logger.warning(f"Rate limit réinitialisé pour {action} ({identifier})")
-    
+
+    def forget_account(self, account_id: str) -> None:
+        """Oublie les seaux d'un compte supprimé."""
+        self._accounts.pop(account_id, None)
+        self._chats = {key: bucket for key, bucket in self._chats.items() if key[0] != account_id}
+        self._methods = {key: bucket for key, bucket in self._methods.items() if key[1] != account_id}
+        self._flood_counts.pop(account_id, None)
+        self._penalties.pop(account_id, None)
+        self._successes_since_flood.pop(account_id, None)
+
     def get_stats(self) -> Dict[str, Dict]:
         """
         Retourne les statistiques du rate limiter.
-        
+
         Returns:
-            Dict: Statistiques par action
+            Dict: global (débit, attentes) et accounts (débit, pénalité, attentes par compte)
         """
-        stats = {}
-        
-        for action, (max_req, period) in self.limits.items():
-            stats[action] = {
-                'limit': max_req,
-                'period_seconds': period,
-                'active_identifiers': 0,
-                'total_requests_tracked': 0
-            }
-        
-        now = datetime.now()
-        
-        for key, timestamps in self.requests.items():
-            if ':' not in key:
-                continue
-            
-            action, _ = key.split(':', 1)
-            
-            if action in stats:
-                # Compter seulement les requêtes récentes
-                if action in self.limits:
-                    _, period = self.limits[action]
-                    cutoff = now - timedelta(seconds=period)
-                    recent_requests = [ts for ts in timestamps if ts > cutoff]
-                    
-                    if recent_requests:
-                        stats[action]['active_identifiers'] += 1
-                        stats[action]['total_requests_tracked'] += len(recent_requests)
-        
-        return stats
+        return {
+            'global': {
+                'rate': self._global.rate,
+                'waiting': self._global.waiting,
+            },
+            'accounts': {
+                account_id: {
+                    'rate': bucket.rate,
+                    'penalty': self._penalties.get(account_id, 1.0),
+                    'floods': self._flood_counts.get(account_id, 0),
+                    'waiting': bucket.waiting,
+                }
+                for account_id, bucket in self._accounts.items()
+            },
+        }
 
 
 # Instance globale (singleton)
@@ -243,15 +511,15 @@ _rate_limiter_instance: Optional[RateLimiter] = None
 def get_rate_limiter() -> RateLimiter:
     """
     Récupère l'instance globale du rate limiter.
-    
+
     Returns:
         RateLimiter: Instance du rate limiter
     """
     global _rate_limiter_instance
-    
+
     if _rate_limiter_instance is None:
         _rate_limiter_instance = RateLimiter()
-    
+
     return _rate_limiter_instance
 
 
@@ -259,4 +527,3 @@ def reset_rate_limiter():
     """Réinitialise l'instance globale (utile pour les tests)."""
     global _rate_limiter_instance
     _rate_limiter_instance = None
-
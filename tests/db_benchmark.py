@@ -0,0 +1,151 @@
+"""
+Benchmark des écritures de la base locale (TelegramDatabase).
+
+OBJECTIF: Mesurer le débit (lignes/seconde) de save_conversations
+avant/après le passage aux upserts groupés (executemany + ON CONFLICT).
+
+L'ancienne implémentation écrit des dates ISO : elle est mesurée sur une
+base au schéma d'origine, pas sur les colonnes en millisecondes epoch.
+Le schéma courant entretient en plus l'index plein texte, les compteurs
+et les index composites : l'insertion initiale fait plus de travail que
+l'ancienne, la resynchronisation (mise à jour) est nettement plus rapide.
+
+Usage:
+    python tests/db_benchmark.py [nb_conversations]
+"""
+import sqlite3
+import sys
+import time
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Ajouter le chemin src au PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from database.telegram_db import TelegramDatabase
+
+
+def make_conversations(count: int):
+    """Génère des conversations synthétiques (format API)."""
+    base_date = datetime(2025, 1, 1)
+    return [
+        {
+            'entity_id': i,
+            'title': f"Conversation {i}",
+            'type': 'user' if i % 3 else 'group',
+            'username': f"user_{i}",
+            'last_message': f"Dernier message {i}",
+            'last_message_date': base_date + timedelta(seconds=i),
+            'last_message_from_me': bool(i % 2),
+            'unread_count': i % 7,
+            'pinned': False,
+            'archived': False,
+            'profile_photo': None,
+            'has_photo': False,
+            'phone': None,
+        }
+        for i in range(count)
+    ]
+
+
+# Schéma d'origine de la table conversations (dates ISO, index d'origine)
+BASELINE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS conversations (
+        entity_id INTEGER NOT NULL,
+        session_id TEXT NOT NULL,
+        title TEXT NOT NULL,
+        type TEXT NOT NULL,
+        username TEXT,
+        last_message TEXT,
+        last_message_date TIMESTAMP,
+        last_message_from_me BOOLEAN DEFAULT 0,
+        unread_count INTEGER DEFAULT 0,
+        pinned BOOLEAN DEFAULT 0,
+        archived BOOLEAN DEFAULT 0,
+        profile_photo_path TEXT,
+        has_photo BOOLEAN DEFAULT 0,
+        phone TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (entity_id, session_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_conversations_session ON conversations(session_id);
+    CREATE INDEX IF NOT EXISTS idx_conversations_type ON conversations(type);
+    CREATE INDEX IF NOT EXISTS idx_conversations_date ON conversations(last_message_date DESC);
+    CREATE INDEX IF NOT EXISTS idx_conversations_title ON conversations(title COLLATE NOCASE);
+"""
+
+
+def open_baseline_db(path: Path) -> sqlite3.Connection:
+    """Ouvre une base au schéma d'origine (mêmes PRAGMA que TelegramDatabase)."""
+    conn = sqlite3.connect(str(path), isolation_level="DEFERRED")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.executescript(BASELINE_SCHEMA)
+    return conn
+
+
+def legacy_save_conversations(conn: sqlite3.Connection, session_id: str, conversations) -> int:
+    """Ancienne implémentation : un INSERT OR REPLACE par ligne."""
+    count = 0
+    for conv in conversations:
+        try:
+            last_msg_date = conv.get('last_message_date')
+            if last_msg_date and isinstance(last_msg_date, datetime):
+                last_msg_date = last_msg_date.isoformat()
+
+            conn.execute("""
+                INSERT OR REPLACE INTO conversations (
+                    entity_id, session_id, title, type, username,
+                    last_message, last_message_date, last_message_from_me,
+                    unread_count, pinned, archived,
+                    profile_photo_path, has_photo, phone, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            """, (
+                conv['entity_id'], session_id, conv.get('title', 'Sans nom'),
+                conv.get('type', 'user'), conv.get('username'),
+                conv.get('last_message', ''), last_msg_date,
+                conv.get('last_message_from_me', False), conv.get('unread_count', 0),
+                conv.get('pinned', False), conv.get('archived', False),
+                conv.get('profile_photo'), conv.get('has_photo', False), conv.get('phone')
+            ))
+            count += 1
+        except Exception:
+            pass
+    conn.commit()
+    return count
+
+
+def run(label: str, open_db, save, conversations) -> None:
+    """Mesure une passe d'insertion puis une passe de mise à jour."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = open_db(Path(tmpdir) / "bench.db")
+        try:
+            for phase in ("insertion", "mise à jour"):
+                start = time.perf_counter()
+                written = save(db, "bench_session", conversations)
+                elapsed = time.perf_counter() - start
+                print(f"  {label:<10} {phase:<12} {written:>8} lignes  "
+                      f"{elapsed:6.2f}s  {written / elapsed:>10.0f} lignes/s")
+        finally:
+            db.close()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    conversations = make_conversations(count)
+
+    print(f"\n{'='*60}")
+    print(f"  BENCHMARK save_conversations ({count} conversations)")
+    print(f"{'='*60}\n")
+
+    run("avant", open_baseline_db, legacy_save_conversations, conversations)
+    run("après", lambda path: TelegramDatabase(str(path)),
+        lambda db, sid, convs: db.save_conversations(sid, convs), conversations)
+    print()
+
+
+if __name__ == "__main__":
+    main()
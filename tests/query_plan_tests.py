@@ -0,0 +1,300 @@
+"""
+Tests des plans d'exécution des requêtes chaudes de TelegramDatabase.
+
+OBJECTIF: Détecter toute régression d'index (parcours complet de table
+ou tri dans un B-tree temporaire) sur les requêtes appelées à chaque
+affichage de la liste des conversations ou d'un chat.
+
+Chaque méthode est exécutée sur une base réelle ; les requêtes qu'elle
+envoie sont capturées puis passées à EXPLAIN QUERY PLAN.
+
+Usage:
+    python tests/query_plan_tests.py
+"""
+import sys
+import sqlite3
+import tempfile
+from pathlib import Path
+
+# Ajouter le chemin src au PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from database.telegram_db import TelegramDatabase
+from database.migrations import SCHEMA_VERSION_KEY
+
+
+class RecordingConnection:
+    """Connexion SQLite qui mémorise les requêtes exécutées."""
+    
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+        self.statements = []
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+    
+    def __enter__(self):
+        return self._conn.__enter__()
+    
+    def __exit__(self, *exc_info):
+        return self._conn.__exit__(*exc_info)
+    
+    def execute(self, sql, params=()):
+        self.statements.append((sql, params))
+        return self._conn.execute(sql, params)
+
+
+class QueryPlanTests:
+    """Vérification automatisée des plans d'exécution."""
+    
+    def __init__(self):
+        self.passed = 0
+        self.failed = 0
+    
+    def test(self, name: str, condition: bool, message: str = ""):
+        """Exécute un test."""
+        if condition:
+            print(f"[OK] {name}")
+            self.passed += 1
+        else:
+            print(f"[FAIL] {name}: {message}")
+            self.failed += 1
+    
+    def section(self, title: str):
+        """Affiche une section."""
+        print(f"\n{'='*60}")
+        print(f"  {title}")
+        print(f"{'='*60}\n")
+    
+    @staticmethod
+    def plan_problems(conn: sqlite3.Connection, sql: str, params, allow_sort: bool = False):
+        """
+        Liste les étapes coûteuses du plan d'une requête.
+        
+        Les parcours d'index virtuels FTS5 et de sous-requêtes matérialisées
+        sont acceptés : seuls les parcours de tables réelles sont signalés.
+        
+        Args:
+            conn: Connexion SQLite (non enregistrée)
+            sql: Requête
+            params: Paramètres de la requête
+            allow_sort: Accepter un tri temporaire (classement par pertinence)
+        
+        Returns:
+            List[str]: Étapes du plan en cause
+        """
+        problems = []
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params):
+            detail = row[3]
+            if detail.startswith("SCAN ") and "VIRTUAL TABLE" not in detail and "(subquery" not in detail:
+                problems.append(detail)
+            elif "AUTOMATIC" in detail:
+                problems.append(detail)
+            elif "TEMP B-TREE" in detail and not allow_sort:
+                problems.append(detail)
+        return problems
+    
+    def check(self, db: TelegramDatabase, name: str, call, allow_sort: bool = False):
+        """
+        Exécute un appel et vérifie le plan de chaque requête envoyée.
+        
+        Args:
+            db: Base de test
+            name: Nom du test
+            call: Fonction recevant la base
+            allow_sort: Accepter un tri temporaire
+        """
+        conn = db.conn
+        recorder = RecordingConnection(conn)
+        db.conn = recorder
+        try:
+            call(db)
+        finally:
+            db.conn = conn
+        
+        statements = [
+            (sql, params) for sql, params in recorder.statements
+            if sql.lstrip().upper().startswith("SELECT")
+        ]
+        if not statements:
+            self.test(name, False, "aucune requête capturée")
+            return
+        
+        problems = []
+        for sql, params in statements:
+            problems.extend(self.plan_problems(conn, sql, params, allow_sort))
+        
+        self.test(name, not problems, "; ".join(problems))
+    
+    @staticmethod
+    def populate(db: TelegramDatabase):
+        """Insère quelques lignes pour que le planificateur ait des statistiques."""
+        for session_id in ("session_a", "session_b"):
+            db.save_conversations(session_id, [
+                {
+                    'entity_id': i,
+                    'title': f"Conversation {i}",
+                    'type': 'user' if i % 3 else 'group',
+                    'last_message': f"Bonjour {i}",
+                    'last_message_date': 1_700_000_000_000 + i,
+                }
+                for i in range(200)
+            ])
+            db.save_messages(session_id, 1, [
+                {'id': i, 'text': f"Bonjour message {i}", 'date': 1_700_000_000_000 + i}
+                for i in range(500)
+            ])
+        for entity_id in range(0, 200, 2):
+            db.save_profile_photo(entity_id, f"photo_{entity_id}.jpg")
+        db.save_entities("session_a", [(i, 'channel', i * 7, None) for i in range(200)])
+        db.save_dialogs("session_a", [
+            {'id': i, 'title': f"Groupe {i}", 'participants_count': i, 'date': 1_700_000_000_000 + i}
+            for i in range(200)
+        ])
+        for chat_id in range(0, 200, 4):
+            db.replace_scheduled_chat("session_a", chat_id, [
+                {'chat_id': chat_id, 'message_id': j, 'text': f"Programmé {j}",
+                 'date': 1_800_000_000_000 + j * 3_600_000}
+                for j in range(5)
+            ], chat_id)
+        db.conn.execute("ANALYZE")
+        db.conn.commit()
+    
+    def run_hot_queries(self, db: TelegramDatabase, label: str):
+        """Vérifie toutes les requêtes chaudes sur une base."""
+        sessions = ["session_a", "session_b"]
+        
+        self.check(db, f"[{label}] get_conversations (utilisateurs)",
+                   lambda d: d.get_conversations(sessions, limit=100))
+        self.check(db, f"[{label}] get_conversations (avec groupes)",
+                   lambda d: d.get_conversations(sessions, include_groups=True))
+        self.check(db, f"[{label}] get_conversations (une session)",
+                   lambda d: d.get_conversations(sessions[:1], include_groups=True, limit=50))
+        
+        # Plus de sessions que de branches UNION ALL permises : lots fusionnés
+        many = sessions + [f"session_{i}" for i in range(600)]
+        self.check(db, f"[{label}] get_conversations (600 sessions)",
+                   lambda d: d.get_conversations(many, include_groups=True, limit=100))
+        expected = db.get_conversations(sessions, include_groups=True, limit=100)
+        merged = db.get_conversations(many, include_groups=True, limit=100)
+        self.test(f"[{label}] get_conversations (600 sessions) : fusion des lots",
+                  merged == expected, f"{len(merged)} conversation(s) au lieu de {len(expected)}")
+        self.check(db, f"[{label}] get_conversation_by_id",
+                   lambda d: d.get_conversation_by_id(1, "session_a"))
+        self.check(db, f"[{label}] get_messages",
+                   lambda d: d.get_messages(1, "session_a", limit=50))
+        self.check(db, f"[{label}] get_messages_before",
+                   lambda d: d.get_messages_before(1, "session_a", (1_700_000_000_250, 250)))
+        self.check(db, f"[{label}] get_messages_after",
+                   lambda d: d.get_messages_after(1, "session_a", (1_700_000_000_250, 250)))
+        self.check(db, f"[{label}] get_message_count",
+                   lambda d: d.get_message_count(1, "session_a"))
+        self.check(db, f"[{label}] is_history_complete",
+                   lambda d: d.is_history_complete(1, "session_a"))
+        self.check(db, f"[{label}] get_profile_photo",
+                   lambda d: d.get_profile_photo(1))
+        self.check(db, f"[{label}] get_entity",
+                   lambda d: d.get_entity("session_a", 42))
+        self.check(db, f"[{label}] get_dialogs",
+                   lambda d: d.get_dialogs("session_a"))
+        self.check(db, f"[{label}] get_scheduled_messages",
+                   lambda d: d.get_scheduled_messages("session_a"))
+        # Un groupe : au plus 100 messages programmés (limite Telegram), tri accepté
+        self.check(db, f"[{label}] get_scheduled_messages (un groupe)",
+                   lambda d: d.get_scheduled_messages("session_a", 8), allow_sort=True)
+        self.check(db, f"[{label}] get_stats",
+                   lambda d: d.get_stats())
+        self.check(db, f"[{label}] get_unread_totals",
+                   lambda d: d.get_unread_totals(sessions))
+        
+        if db.has_fts:
+            # Classement bm25 : le tri par pertinence est inévitable
+            self.check(db, f"[{label}] search", lambda d: d.search("bonjour", sessions),
+                       allow_sort=True)
+    
+    # ==================== TESTS ====================
+    
+    def test_new_database(self):
+        """Test 1: Base créée avec le schéma courant."""
+        self.section("TEST 1: Nouvelle base")
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db = TelegramDatabase(str(Path(tmpdir) / "plans.db"))
+            try:
+                self.populate(db)
+                self.run_hot_queries(db, "nouvelle")
+            finally:
+                db.close()
+    
+    def test_migrated_database(self):
+        """Test 2: Base existante migrée depuis les anciens index."""
+        self.section("TEST 2: Base migrée")
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = str(Path(tmpdir) / "plans.db")
+            
+            # Reproduire le schéma v1 : index mono-colonne d'origine
+            db = TelegramDatabase(db_path)
+            db.conn.executescript(f"""
+                DROP INDEX idx_conversations_session_type_date;
+                DROP INDEX idx_conversations_session_date;
+                DROP INDEX idx_messages_chat_date_id;
+                DROP INDEX idx_scheduled_session_date;
+                CREATE INDEX idx_conversations_session ON conversations(session_id);
+                CREATE INDEX idx_conversations_type ON conversations(type);
+                CREATE INDEX idx_conversations_date ON conversations(last_message_date DESC);
+                CREATE INDEX idx_messages_chat ON messages(chat_id, session_id, date DESC);
+                CREATE INDEX idx_messages_date ON messages(date DESC);
+                UPDATE metadata SET value = '1' WHERE key = '{SCHEMA_VERSION_KEY}';
+            """)
+            self.populate(db)
+            db.close()
+            
+            db = TelegramDatabase(db_path)
+            try:
+                legacy = db.conn.execute("""
+                    SELECT COUNT(*) FROM sqlite_master
+                    WHERE type = 'index' AND name IN (
+                        'idx_conversations_session', 'idx_conversations_type',
+                        'idx_conversations_date', 'idx_messages_chat', 'idx_messages_date'
+                    )
+                """).fetchone()[0]
+                self.test("Anciens index supprimés", legacy == 0, f"{legacy} index restant(s)")
+                
+                self.run_hot_queries(db, "migrée")
+            finally:
+                db.close()
+    
+    # ==================== RÉSUMÉ ====================
+    
+    def print_summary(self) -> bool:
+        """Affiche le résumé des tests."""
+        print(f"\n{'='*60}")
+        print("  RÉSUMÉ DES TESTS DE PLANS D'EXÉCUTION")
+        print(f"{'='*60}\n")
+        
+        print(f"[+] Tests reussis:  {self.passed}")
+        print(f"[-] Tests echoues:  {self.failed}")
+        
+        print(f"\n{'='*60}\n")
+        
+        if self.failed == 0:
+            print("*** AUCUN PARCOURS COMPLET NI TRI TEMPORAIRE ***")
+            return True
+        
+        print(f"[!] {self.failed} TEST(S) ONT ECHOUE")
+        return False
+
+
+def main() -> bool:
+    """Exécute tous les tests de plans d'exécution."""
+    tests = QueryPlanTests()
+    
+    tests.test_new_database()
+    tests.test_migrated_database()
+    
+    return tests.print_summary()
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)